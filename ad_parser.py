@@ -0,0 +1,170 @@
+import argparse
+import csv
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin
+from lxml import html as lxml_html
+from ad_selectors import (AD_CARD_XPATH, ADVERTISER_XPATH, AD_LINK_XPATH, AD_TEXT_XPATH,
+                          ACTIVE_TIME_XPATH, IMAGE_XPATH, VIDEO_XPATH)
+from run_metrics import get_logger
+
+log = get_logger("ad_parser")
+
+# SETTINGS
+BASE_URL = "https://www.facebook.com/"
+PARSE_WORKERS = os.cpu_count() or 2
+MIN_CARDS_PER_WORKER = 50  # Below this, parsing in-process beats process startup
+RAW_ADS_FILE = "reparsed_ads.csv"
+
+def extract_page_id(ad_link):
+    """Extract page ID from ad link."""
+    if not ad_link:
+        return "N/A"
+    match = re.search(r'facebook\.com/(\d+)/', ad_link)
+    if match:
+        return match.group(1)
+    match = re.search(r'facebook\.com/([^/?]+)', ad_link)
+    if match:
+        return match.group(1)
+    return "N/A"
+
+def build_raw_ad(advertiser_texts, ad_link, ad_text, active_time, image_urls, video_urls, advertiser_cache):
+    """Build a raw ad dict from extracted field values, resolving advertiser and page ID."""
+    advertiser = "Unknown Advertiser"
+    for text in advertiser_texts:
+        text = (text or "").strip()
+        if text and len(text) > 2:
+            advertiser = text
+            break
+
+    # Extract page ID and update advertiser
+    page_id = extract_page_id(ad_link)
+    if page_id != "N/A":
+        advertiser = page_id
+        advertiser_cache[page_id] = advertiser
+
+    # Fallback to cached advertiser
+    if advertiser == "Unknown Advertiser" and page_id in advertiser_cache:
+        advertiser = advertiser_cache[page_id]
+
+    return {
+        "Advertiser": advertiser,
+        "Ad Text": ad_text.replace("\n", " ").strip() if ad_text is not None else "...",
+        "Ad Link": ad_link or "",
+        "Active Time": active_time if active_time is not None else "Unknown",
+        "Image URLs": [url for url in image_urls if url and not url.endswith('.gif')],
+        "Video URLs": [url for url in video_urls if url],
+        "Page ID": page_id
+    }
+
+def element_text(elem):
+    """Approximate the browser's rendered text for an lxml element."""
+    parts = []
+    for node in elem.iter():
+        if node.tag in ("script", "style") or not isinstance(node.tag, str):
+            continue
+        if node.text:
+            parts.append(node.text)
+        if node is not elem and node.tail:
+            parts.append(node.tail)
+    return re.sub(r'[ \t]+', ' ', "".join(parts)).strip()
+
+def extract_card_fields(card, base_url=BASE_URL):
+    """Extract raw field values from one ad card element, mirroring extract_ad_data."""
+    try:
+        links = [urljoin(base_url, a.get("href", "")) for a in card.xpath(AD_LINK_XPATH)]
+        texts = [element_text(elem) for elem in card.xpath(AD_TEXT_XPATH)]
+        active_times = [element_text(elem) for elem in card.xpath(ACTIVE_TIME_XPATH)]
+        return {
+            "advertiser_texts": [element_text(elem) for elem in card.xpath(ADVERTISER_XPATH)],
+            "ad_link": links[0] if links else "",
+            "ad_text": texts[0] if texts else None,
+            "active_time": active_times[0] if active_times else None,
+            "image_urls": [urljoin(base_url, img.get("src")) if img.get("src") else None for img in card.xpath(IMAGE_XPATH)],
+            "video_urls": [urljoin(base_url, vid.get("src")) for vid in card.xpath(VIDEO_XPATH) if vid.get("src")]
+        }
+    except Exception as e:
+        return {"error": str(e), "raw_html": lxml_html.tostring(card, encoding="unicode")[:500]}
+
+def _parse_card_chunk(chunk):
+    """Extract fields from a pool worker's share of serialized ad cards."""
+    card_htmls, base_url = chunk
+    return [extract_card_fields(lxml_html.fragment_fromstring(card_html), base_url) for card_html in card_htmls]
+
+def parse_ads_from_html(page_html, advertiser_cache=None, base_url=BASE_URL, max_workers=PARSE_WORKERS):
+    """Parse every ad card in an HTML snapshot into raw ad dicts, matching extract_ad_data output."""
+    advertiser_cache = {} if advertiser_cache is None else advertiser_cache
+    doc = lxml_html.fromstring(page_html)
+    cards = doc.xpath(AD_CARD_XPATH)
+    workers = min(max_workers or 1, len(cards) // MIN_CARDS_PER_WORKER)
+    if workers > 1:
+        # Workers get only their cards' HTML, so the page is parsed and searched once, here
+        chunk_size = -(-len(cards) // workers)
+        chunks = [([lxml_html.tostring(card, encoding="unicode", with_tail=False) for card in cards[start:start + chunk_size]],
+                   base_url) for start in range(0, len(cards), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            fields = [card for chunk in executor.map(_parse_card_chunk, chunks) for card in chunk]
+    else:
+        fields = [extract_card_fields(card, base_url) for card in cards]
+
+    raw_ads = []
+    for index, card in enumerate(fields, 1):
+        if card.get("error"):
+            log.warning(f"⚠️ Error collecting raw ad data for ad #{index}: {card['error']}")
+            raw_ads.append({
+                "Advertiser": "Unknown Advertiser",
+                "Ad Text": "...",
+                "Ad Link": "",
+                "Active Time": "Unknown",
+                "Image URLs": [],
+                "Video URLs": [],
+                "Page ID": "N/A",
+                "Error": card["error"],
+                "Raw HTML": card.get("raw_html", "N/A")
+            })
+            continue
+        raw_ads.append(build_raw_ad(card["advertiser_texts"], card["ad_link"], card["ad_text"], card["active_time"],
+                                    card["image_urls"], card["video_urls"], advertiser_cache))
+    return raw_ads
+
+def parse_html_file(path, advertiser_cache=None, base_url=BASE_URL, max_workers=PARSE_WORKERS):
+    """Parse a saved HTML snapshot file into raw ad dicts."""
+    with open(path, "r", encoding="utf-8") as f:
+        page_html = f.read()
+    raw_ads = parse_ads_from_html(page_html, advertiser_cache, base_url, max_workers)
+    log.info(f"📄 Parsed {len(raw_ads)} ad(s) from {path}")
+    return raw_ads
+
+def save_raw_ads_to_csv(raw_ads, filename):
+    """Save raw parsed ads to CSV, keeping media URLs as space-separated lists."""
+    if not raw_ads:
+        log.warning("⚠️ No data to save.")
+        return
+    fieldnames = ["Source", "Advertiser", "Ad Text", "Ad Link", "Page ID", "Active Time", "Image URLs", "Video URLs", "Error"]
+    with open(filename, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore", quoting=csv.QUOTE_MINIMAL)
+        writer.writeheader()
+        for ad in raw_ads:
+            row = dict(ad)
+            row["Image URLs"] = " ".join(ad["Image URLs"])
+            row["Video URLs"] = " ".join(ad["Video URLs"])
+            writer.writerow(row)
+    log.info(f"📁 Saved {len(raw_ads)} parsed ads to {filename}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-parse saved Ad Library HTML snapshots without a browser.")
+    parser.add_argument("paths", nargs="+", help="HTML snapshot files or glob patterns")
+    parser.add_argument("--output", default=RAW_ADS_FILE, help="CSV file for the parsed ads")
+    parser.add_argument("--workers", type=int, default=PARSE_WORKERS, help="Process pool size per snapshot")
+    args = parser.parse_args()
+
+    all_ads = []
+    advertiser_cache = {}
+    for pattern in args.paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            for ad in parse_html_file(path, advertiser_cache, max_workers=args.workers):
+                ad["Source"] = os.path.basename(path)
+                all_ads.append(ad)
+    save_raw_ads_to_csv(all_ads, args.output)
@@ -0,0 +1,101 @@
+import hashlib
+import sys
+
+# CSV column name -> AdRecord attribute, in CSV column order
+FIELDS = {
+    "Advertiser": "advertiser",
+    "Ad Text": "ad_text",
+    "Ad Link": "ad_link",
+    "Page ID": "page_id",
+    "Active Time": "active_time",
+    "Days Active": "days_active",
+    "Ad Variations": "variations",
+    "Image URLs": "image_urls",
+    "Video URLs": "video_urls",
+    "Ad Archive ID": "archive_id",
+    "Start Date": "start_date",
+    "End Date": "end_date",
+    "Collation Count": "collation_count",
+    "Page Name": "page_name",
+    "Seen Before": "seen_before",
+    "Hours Active": "hours_active",
+    "Keyword": "keyword",
+    "Country": "country"
+}
+REQUIRED_FIELDS = ("Advertiser", "Ad Text", "Ad Link", "Page ID", "Active Time", "Days Active", "Ad Variations",
+                   "Image URLs", "Video URLs")  # Optional fields only appear in CSV rows once they are set
+INTERNED_FIELDS = ("Advertiser", "Page ID", "Keyword", "Country")  # Repeated across many ads, so one copy is shared
+
+def intern_value(value):
+    """Intern strings so ads from the same advertiser/page share one copy."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+def normalized_text_hash(text):
+    """Return a 64-bit hash of the stripped, lowercased ad text that is stable across processes."""
+    return int.from_bytes(hashlib.blake2b(text.strip().lower().encode("utf-8"), digest_size=8).digest(), "big")
+
+class AdRecord:
+    """One scraped ad, stored in slots instead of a per-ad dict.
+
+    Hot paths use the attributes; ad["Column Name"], get() and `in` keep working for code that
+    indexes ads by CSV column name. to_dict() is only needed when writing CSV rows.
+    """
+
+    __slots__ = tuple(FIELDS.values()) + ("text_hash",)
+
+    def __init__(self, advertiser, ad_text, ad_link="", page_id="N/A", active_time="", days_active=1, variations=1,
+                 image_urls=(), video_urls=(), archive_id=None, start_date=None, end_date=None, collation_count=None,
+                 page_name=None, seen_before=None, hours_active=None, keyword=None, country=None, text_hash=None):
+        self.advertiser = intern_value(advertiser)
+        self.ad_text = ad_text
+        self.ad_link = ad_link
+        self.page_id = intern_value(page_id)
+        self.active_time = active_time
+        self.days_active = days_active
+        self.variations = variations
+        self.image_urls = image_urls if image_urls is not None else ()
+        self.video_urls = video_urls if video_urls is not None else ()
+        self.archive_id = archive_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.collation_count = collation_count
+        self.page_name = page_name
+        self.seen_before = seen_before
+        self.hours_active = hours_active
+        self.keyword = intern_value(keyword)
+        self.country = intern_value(country)
+        self.text_hash = normalized_text_hash(ad_text) if text_hash is None else text_hash
+
+    @classmethod
+    def from_dict(cls, row):
+        """Build a record from a row dict keyed by CSV column names (e.g. read back from Parquet)."""
+        return cls(**{attr: row[key] for key, attr in FIELDS.items() if key in row})
+
+    def __getitem__(self, key):
+        value = getattr(self, FIELDS[key])
+        if value is None and key not in REQUIRED_FIELDS:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        setattr(self, FIELDS[key], intern_value(value) if key in INTERNED_FIELDS else value)
+
+    def __contains__(self, key):
+        return key in FIELDS and (key in REQUIRED_FIELDS or getattr(self, FIELDS[key]) is not None)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return [key for key in FIELDS if key in self]
+
+    def to_dict(self):
+        """Return the ad as a CSV row dict."""
+        return {key: getattr(self, FIELDS[key]) for key in self.keys()}
+
+    def __repr__(self):
+        return f"AdRecord({self.advertiser!r}, {self.ad_text[:40]!r}, page_id={self.page_id!r})"
+
+def as_record(ad):
+    """Return ad as an AdRecord, converting row dicts once at the boundary."""
+    return ad if isinstance(ad, AdRecord) else AdRecord.from_dict(ad)
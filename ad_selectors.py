@@ -0,0 +1,8 @@
+# XPath selectors shared by every ad extraction path (WebDriver, injected JS, offline HTML)
+AD_CARD_XPATH = '//div[.//span[contains(text(), "Sponsored")]]'
+ADVERTISER_XPATH = './/span[contains(@class, "x1lliihq") or contains(@class, "x193iq5w") or contains(@class, "page")] | .//a[contains(@href, "facebook.com") and not(contains(@href, "fbclid"))] | .//div[contains(@class, "advertiser")]'
+AD_LINK_XPATH = './/a[contains(@href, "facebook.com") or contains(@href, "fbclid")]'
+AD_TEXT_XPATH = './/div[contains(@class, "body") or contains(@class, "text") or contains(@class, "content") or contains(@class, "_7jyr") or contains(@class, "description") or contains(@class, "ad-text")]'
+ACTIVE_TIME_XPATH = './/span[contains(text(), "Started running on") or contains(text(), " - ")]'
+IMAGE_XPATH = './/img[@src] | .//div[contains(@style, "background-image")]'
+VIDEO_XPATH = './/video[@src] | .//source[@src]'
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from run_metrics import get_logger
+
+log = get_logger("ad_store")
+
+# SETTINGS
+AD_STORE_DB = "ad_store.db"
+
+def ad_identity(ad):
+    """Return the (page ID, normalized ad text, ad link) identity used to deduplicate ads."""
+    return (ad["Page ID"], ad["Ad Text"].strip().lower(), ad["Ad Link"])
+
+def ad_store_key(ad):
+    """Return a compact hash of an ad's identity for use as the store's primary key."""
+    return hashlib.sha1("\x1f".join(ad_identity(ad)).encode("utf-8")).hexdigest()
+
+class AdStore:
+    """SQLite store of every ad ever scraped, with first/last-seen times and cached downstream results."""
+
+    def __init__(self, path=AD_STORE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ads (
+                ad_key TEXT PRIMARY KEY,
+                page_id TEXT,
+                advertiser TEXT,
+                ad_text TEXT,
+                ad_link TEXT,
+                active_time TEXT,
+                days_active REAL,
+                variations INTEGER,
+                image_urls TEXT,
+                video_urls TEXT,
+                first_seen TEXT,
+                last_seen TEXT,
+                times_seen INTEGER DEFAULT 1,
+                industry TEXT,
+                confidence REAL,
+                note TEXT,
+                media_paths TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def record_ads(self, ads):
+        """Insert new ads and refresh active time/variations of known ones; flags each ad with "Seen Before"."""
+        now = datetime.now().isoformat(timespec="seconds")
+        new_count = 0
+        with self._lock:
+            keys = [ad_store_key(ad) for ad in ads]
+            known = set()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                known.update(row[0] for row in self.conn.execute(
+                    f"SELECT ad_key FROM ads WHERE ad_key IN ({placeholders})", chunk))
+            for key, ad in zip(keys, ads):
+                ad["Seen Before"] = key in known
+                if key in known:
+                    self.conn.execute(
+                        "UPDATE ads SET active_time = ?, days_active = ?, variations = ?, last_seen = ?, "
+                        "times_seen = times_seen + 1 WHERE ad_key = ?",
+                        (ad["Active Time"], ad["Days Active"], ad["Ad Variations"], now, key))
+                else:
+                    new_count += 1
+                    known.add(key)
+                    self.conn.execute(
+                        "INSERT INTO ads (ad_key, page_id, advertiser, ad_text, ad_link, active_time, days_active, "
+                        "variations, image_urls, video_urls, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, ad["Page ID"], ad["Advertiser"], ad["Ad Text"], ad["Ad Link"], ad["Active Time"],
+                         ad["Days Active"], ad["Ad Variations"], json.dumps(ad["Image URLs"]),
+                         json.dumps(ad["Video URLs"]), now, now))
+            self.conn.commit()
+        log.debug(f"🗃️ Ad store: {new_count} new ad(s), {len(ads) - new_count} already known.")
+        return new_count
+
+    def get_classification(self, ad):
+        """Return the stored industry classification for an ad, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT industry, confidence, note FROM ads WHERE ad_key = ? AND industry IS NOT NULL",
+                                    (ad_store_key(ad),)).fetchone()
+        if row is None:
+            return None
+        return {"Industry": row[0], "Confidence": row[1], "Note": row[2] or ""}
+
+    def save_classification(self, ad, industry_info):
+        """Store the industry classification of an ad."""
+        with self._lock:
+            self.conn.execute("UPDATE ads SET industry = ?, confidence = ?, note = ? WHERE ad_key = ?",
+                              (industry_info["Industry"], industry_info["Confidence"], industry_info.get("Note", ""),
+                               ad_store_key(ad)))
+            self.conn.commit()
+
+    def get_media_paths(self, ad):
+        """Return previously downloaded media paths for an ad if they all still exist, else None."""
+        with self._lock:
+            row = self.conn.execute("SELECT media_paths FROM ads WHERE ad_key = ?", (ad_store_key(ad),)).fetchone()
+        if row is None or not row[0]:
+            return None
+        paths = json.loads(row[0])
+        return paths if paths and all(os.path.exists(path) for path in paths) else None
+
+    def save_media_paths(self, ad, paths):
+        """Record where an ad's media was downloaded."""
+        with self._lock:
+            self.conn.execute("UPDATE ads SET media_paths = ? WHERE ad_key = ?", (json.dumps(paths), ad_store_key(ad)))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,106 @@
+"""Compare accuracy and throughput of the zero-shot and embedding industry classifiers.
+
+Usage: python benchmarks/benchmark_classifier.py [--labels labelled_ads.csv] [--runtime torch|quantized|onnx] [--repeat N]
+
+A labelled CSV needs "Ad Text" and "Industry" columns; without one a small built-in sample is used.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estimate_metrics import INDUSTRIES, CLASSIFIER_MODEL, CONFIDENCE_THRESHOLD
+from industry_embeddings import EmbeddingClassifier, EMBEDDING_RUNTIME
+
+SAMPLE_ADS = [
+    ("New summer collection: linen shirts and dresses, 30% off this week only.", "Apparel"),
+    ("Sneakers, hoodies and joggers for every season. Free returns on all orders.", "Apparel"),
+    ("Compare term life insurance quotes in minutes and protect your family.", "Finance & Insurance"),
+    ("Open a zero-fee savings account and get 7% interest on your deposits.", "Finance & Insurance"),
+    ("Automate invoicing and payroll with our cloud platform. Start a free 14-day trial.", "B2B SaaS"),
+    ("The CRM your sales team will actually use. Book a demo today.", "B2B SaaS"),
+    ("Book a teleconsultation with a certified dermatologist from home.", "Healthcare"),
+    ("Full body health checkup at our clinic with 60+ lab tests included.", "Healthcare"),
+    ("Shop electronics, home goods and groceries with next-day delivery.", "E-commerce"),
+    ("Mega sale on our online store: smartphones, laptops and accessories.", "E-commerce"),
+    ("Enroll in our online MBA program, accredited and flexible for working professionals.", "Education"),
+    ("Prepare for IELTS with expert tutors and live mock tests.", "Education"),
+    ("All-inclusive Bali holiday packages with flights and 5-star resorts.", "Travel & Hospitality"),
+    ("Book your beachfront hotel stay in Goa with free breakfast.", "Travel & Hospitality"),
+    ("Luxury 3BHK apartments in the city center, possession in 2026.", "Real Estate"),
+    ("Plots for sale near the new airport. Site visits every weekend.", "Real Estate"),
+    ("Grow your brand with our SEO, social media and performance marketing experts.", "Digital Marketing Services"),
+    ("We run Facebook and Google ads that bring you qualified leads.", "Digital Marketing Services"),
+    ("Hire pre-vetted Java and React developers within 48 hours.", "IT Staffing & Recruitment"),
+    ("We are hiring: remote DevOps engineers, apply through our recruitment portal.", "IT Staffing & Recruitment"),
+    ("Learn Python, Data Science and AWS with hands-on projects and placement support.", "Software Training"),
+    ("Become a certified Salesforce developer with our 8-week bootcamp.", "Software Training"),
+    ("Fast SSD web hosting with a free domain and SSL certificate.", "Web Hosting & Domains"),
+    ("Register your .com domain for just $1 the first year.", "Web Hosting & Domains"),
+    ("Freelance full-stack developer available to build your web app or MVP.", "Freelance Software Development"),
+    ("Need a mobile app? I build iOS and Android apps on a fixed budget.", "Freelance Software Development"),
+    ("Incorporate your company in Dubai with visa, bank account and tax advisory.", "Business Consulting & Services"),
+    ("Start your business in Spain: company setup, EU VAT and residency support.", "Business Consulting & Services"),
+    ("Custom enterprise software development for logistics and manufacturing.", "Software Development"),
+    ("Our engineering team builds scalable web platforms and APIs for startups.", "Software Development"),
+]
+
+def load_labelled(filename):
+    """Load (text, industry) pairs from a labelled CSV."""
+    with open(filename, newline="", encoding="utf-8-sig") as f:
+        return [(row["Ad Text"], row["Industry"]) for row in csv.DictReader(f) if row.get("Ad Text") and row.get("Industry")]
+
+def run_backend(name, classifier, texts, repeat):
+    """Classify texts repeat times and return top labels, confidences and throughput."""
+    classifier(texts[:2], candidate_labels=INDUSTRIES, multi_label=False)  # Warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = classifier(texts, candidate_labels=INDUSTRIES, multi_label=False)
+    elapsed = time.perf_counter() - start
+    if isinstance(results, dict):
+        results = [results]
+    print(f"⏱️ {name}: {len(texts) * repeat / elapsed:.1f} ads/s")
+    return {
+        "labels": [result["labels"][0] for result in results],
+        "scores": [result["scores"][0] for result in results],
+        "ads_per_second": len(texts) * repeat / elapsed,
+        "seconds": elapsed
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", help="CSV with Ad Text and Industry columns")
+    parser.add_argument("--runtime", default=EMBEDDING_RUNTIME, choices=["torch", "quantized", "onnx"])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the sample")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    samples = load_labelled(args.labels) if args.labels else SAMPLE_ADS
+    texts = [text for text, _ in samples]
+    expected = [label for _, label in samples]
+
+    from transformers import pipeline
+    backends = {
+        "zero-shot": pipeline("zero-shot-classification", model=CLASSIFIER_MODEL, tokenizer=CLASSIFIER_MODEL),
+        f"embedding-{args.runtime}": EmbeddingClassifier(INDUSTRIES, runtime=args.runtime)
+    }
+    report = {"samples": len(samples), "backends": {}}
+    outputs = {}
+    for name, classifier in backends.items():
+        outputs[name] = run_backend(name, classifier, texts, args.repeat)
+    reference = outputs["zero-shot"]["labels"]
+    for name, output in outputs.items():
+        report["backends"][name] = {
+            "accuracy": sum(a == b for a, b in zip(output["labels"], expected)) / len(samples),
+            "agreement_with_zero_shot": sum(a == b for a, b in zip(output["labels"], reference)) / len(samples),
+            "low_confidence_rate": sum(score < CONFIDENCE_THRESHOLD for score in output["scores"]) / len(samples),
+            "ads_per_second": round(output["ads_per_second"], 2)
+        }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
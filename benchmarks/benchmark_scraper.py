@@ -0,0 +1,183 @@
+"""Benchmark the scraping pipeline offline against synthetic Ad Library fixtures.
+
+Usage: python benchmarks/benchmark_scraper.py [--sizes 10,100,1000,10000] [--browser] [--output report.json] [--compare baseline.json]
+
+Offline stages (HTML parsing, parse_active_time, dedup, save_to_csv, predict_industry with a stub classifier,
+estimate_metrics) always run. --browser also drives headless Chrome against the local mock server to time
+scrape_ads end to end and the in-browser extract_ad_data/JS extraction paths.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import estimate_metrics
+import scrape
+from ad_parser import parse_ads_from_html, PARSE_WORKERS
+from mock_ad_library import MockAdLibrary, synthetic_cards, render_page
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+XPATH_MAX_CARDS = 1000  # extract_ad_data makes several WebDriver calls per card; larger pages take minutes
+
+class StubClassifier:
+    """Deterministic stand-in for the zero-shot pipeline: picks a label from a hash of the text."""
+
+    def __call__(self, texts, candidate_labels, multi_label=False):
+        single = isinstance(texts, str)
+        results = []
+        for text in [texts] if single else texts:
+            first = zlib.crc32(text.encode("utf-8")) % len(candidate_labels)
+            labels = candidate_labels[first:] + candidate_labels[:first]
+            results.append({"sequence": text, "labels": labels, "scores": [0.9] + [0.1 / (len(labels) - 1)] * (len(labels) - 1)})
+        return results[0] if single else results
+
+class IdentityTranslator:
+    """Translator backend that returns texts unchanged, so no request leaves the machine."""
+
+    def translate_batch(self, texts):
+        return list(texts)
+
+def use_offline_models():
+    """Swap the classifier, translator and text cache for in-process stubs."""
+    estimate_metrics.classifier = StubClassifier()
+    estimate_metrics.classifier_loaded = True
+    estimate_metrics.translator_backend = IdentityTranslator()
+    estimate_metrics.USE_TEXT_CACHE = False
+
+def measure(name, items, fn, trace_memory=True, rerun_for_memory=True):
+    """Time fn() and record its peak Python allocation; returns (result, stats).
+
+    Offline stages are timed without tracemalloc and re-run under it for the memory figure, so its
+    overhead does not skew throughput. Browser stages run once, traced.
+    """
+    sink = io.StringIO()
+    if trace_memory and not rerun_for_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        result = fn()
+    elapsed = time.perf_counter() - start
+    if trace_memory and rerun_for_memory:
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+    count = items(result) if callable(items) else items
+    stats = {"seconds": round(elapsed, 4), "items": count,
+             "items_per_second": round(count / elapsed, 1) if elapsed > 0 else None, "peak_python_bytes": peak}
+    print(f"⏱️ {name}: {count} item(s) in {elapsed:.3f}s ({stats['items_per_second']}/s), "
+          f"peak {peak / 1e6:.1f} MB" if peak is not None else f"⏱️ {name}: {count} item(s) in {elapsed:.3f}s")
+    return result, stats
+
+def run_offline_stages(cards, workdir, base_url):
+    """Benchmark every stage that runs without a browser on one fixture size."""
+    stages = {}
+    page_html = render_page(cards, rendered=len(cards))
+    raw_ads, stages["parse_html"] = measure(f"parse_ads_from_html ({PARSE_WORKERS} worker(s))", len,
+                                            lambda: parse_ads_from_html(page_html, base_url=base_url))
+    if PARSE_WORKERS > 1:
+        _, stages["parse_html_in_process"] = measure("parse_ads_from_html (in process)", len,
+                                                     lambda: parse_ads_from_html(page_html, base_url=base_url, max_workers=1))
+        print(f"ℹ️ Process pool speedup: {stages['parse_html_in_process']['seconds'] / stages['parse_html']['seconds']:.2f}x")
+    active_times = [ad["Active Time"] for ad in raw_ads]
+    _, stages["parse_active_time"] = measure("parse_active_time", len(active_times),
+                                             lambda: [scrape.parse_active_time(text) for text in active_times])
+    debug_log = os.path.join(workdir, "errors.csv")
+    ads, stages["dedup"] = measure("process_raw_ads", len(raw_ads), lambda: scrape.process_raw_ads(raw_ads, debug_log))
+    csv_file = os.path.join(workdir, "ads.csv")
+    _, stages["save_to_csv"] = measure("save_to_csv", len(ads), lambda: scrape.save_to_csv(ads, csv_file))
+    texts = [ad.ad_text for ad in ads]
+    advertisers = [ad.advertiser for ad in ads]
+    _, stages["predict_industry"] = measure("predict_industry (stub)", len(ads),
+                                            lambda: estimate_metrics.predict_industry(texts, advertisers))
+    low_confidence = os.path.join(workdir, "low_confidence.csv")
+    _, stages["estimate_metrics"] = measure("estimate_metrics", len(ads),
+                                            lambda: estimate_metrics.estimate_metrics(ads, low_confidence))
+    return stages, len(ads)
+
+def run_browser_stages(cards, workdir, library):
+    """Benchmark scrape_ads end to end and the in-browser extraction paths against the mock server."""
+    stages = {}
+    scrape.AD_LIBRARY_URL = library.library_url
+    debug_log = os.path.join(workdir, "errors_e2e.csv")
+    _, stages["scrape_ads"] = measure("scrape_ads (js, end to end)", len,
+                                      lambda: scrape.scrape_ads("benchmark", "ALL", "js", debug_log=debug_log),
+                                      rerun_for_memory=False)
+    driver = scrape.init_driver()
+    try:
+        driver.get(library.library_url + "?static=1")
+        raw_ads, stages["extract_js"] = measure("extract_ads_via_js", len,
+                                                lambda: scrape.extract_ads_via_js(driver, {}), rerun_for_memory=False)
+        if len(cards) <= XPATH_MAX_CARDS:
+            _, stages["extract_ad_data"] = measure("extract_ad_data (xpath)", len,
+                                                   lambda: scrape.extract_ads_via_xpath(driver, {}), rerun_for_memory=False)
+        else:
+            print(f"ℹ️ Skipping extract_ad_data above {XPATH_MAX_CARDS} cards (use --xpath-max-cards to raise).")
+    finally:
+        driver.quit()
+    return stages
+
+def git_commit():
+    """Return the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_reports(report, baseline):
+    """Print per-stage throughput and memory ratios against a baseline report."""
+    print(f"\n📊 Compared with {baseline.get('commit') or 'baseline'}:")
+    for size, stages in report["sizes"].items():
+        for stage, stats in stages["stages"].items():
+            old = baseline.get("sizes", {}).get(size, {}).get("stages", {}).get(stage)
+            if not old or not old.get("items_per_second") or not stats.get("items_per_second"):
+                continue
+            speed = stats["items_per_second"] / old["items_per_second"]
+            memory = (stats["peak_python_bytes"] / old["peak_python_bytes"]
+                      if stats.get("peak_python_bytes") and old.get("peak_python_bytes") else None)
+            marker = "🟢" if speed >= 1.05 else "🔴" if speed <= 0.95 else "⚪"
+            memory_text = f", memory x{memory:.2f}" if memory is not None else ""
+            print(f"{marker} {size:>6} cards {stage}: throughput x{speed:.2f}{memory_text}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated ad card counts")
+    parser.add_argument("--browser", action="store_true", help="Also run headless Chrome against the mock server")
+    parser.add_argument("--xpath-max-cards", type=int, default=XPATH_MAX_CARDS)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare throughput and memory against")
+    args = parser.parse_args()
+
+    XPATH_MAX_CARDS = args.xpath_max_cards
+    use_offline_models()
+    report = {"commit": git_commit(), "python": platform.python_version(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "cpus": os.cpu_count(), "browser": args.browser, "sizes": {}}
+    for size in [int(size) for size in args.sizes.split(",")]:
+        print(f"\n🧪 {size} ad cards")
+        cards = synthetic_cards(size)
+        with tempfile.TemporaryDirectory() as workdir, MockAdLibrary(cards) as library:
+            stages, kept = run_offline_stages(cards, workdir, library.base_url)
+            if args.browser:
+                stages.update(run_browser_stages(cards, workdir, library))
+        report["sizes"][str(size)] = {"ads_after_dedup": kept, "stages": stages}
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_reports(report, json.load(f))
@@ -0,0 +1,163 @@
+"""Local stand-in for the Meta Ad Library results page, serving synthetic ad cards scaled from recorded fixtures.
+
+Usage: python benchmarks/mock_ad_library.py [--cards 1000] [--port 8765]
+
+The results page renders its first chunk of cards and loads the rest as JSON-wrapped HTML on scroll,
+like the real infinite list, so scrape_ads can run against it unchanged (set scrape.AD_LIBRARY_URL).
+"""
+import argparse
+import html
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ad_library_cards.json")
+SCROLL_CHUNKS = 40  # Cards load in about this many chunks, so any size finishes within scrape.MAX_SCROLLS
+MIN_CHUNK_SIZE = 30
+EXACT_REPEAT_EVERY = 10  # Every Nth card repeats the previous card's text, like the same creative run twice
+PIXEL_GIF = (b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+             b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;")
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Ad Library</title>
+<style>.card {{ min-height: 240px; margin: 8px; border: 1px solid #ddd; }}</style></head>
+<body>
+<button onclick="this.remove()">Allow all cookies</button>
+<main id="results">{cards}</main>
+<script>
+let next = {rendered}, loading = false;
+const total = {total}, chunk = {chunk};
+window.addEventListener("scroll", () => {{
+    if (loading || next >= total) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 600) return;
+    loading = true;
+    fetch(`/ads/library/cards?offset=${{next}}&limit=${{chunk}}`).then((r) => r.json()).then((data) => {{
+        document.getElementById("results").insertAdjacentHTML("beforeend", data.html);
+        next = data.next;
+        loading = false;
+    }});
+}});
+</script>
+</body></html>
+"""
+
+def load_fixture_cards(filename=FIXTURE_FILE):
+    """Load the recorded seed cards."""
+    with open(filename, encoding="utf-8") as f:
+        return json.load(f)
+
+def synthetic_cards(count, seeds=None):
+    """Scale seed cards to count cards with unique links and lightly varied text."""
+    seeds = seeds or load_fixture_cards()
+    cards = []
+    for i in range(count):
+        seed = seeds[i % len(seeds)]
+        card = dict(seed, index=i)
+        if seed["text"] == "...":
+            pass  # Incomplete cards stay incomplete so the filters have something to drop
+        elif i % EXACT_REPEAT_EVERY == EXACT_REPEAT_EVERY - 1 and cards:
+            card["text"] = cards[-1]["text"]
+        else:
+            card["text"] = f"{seed['text']} Offer code AD{i // len(seeds)}."
+        cards.append(card)
+    return cards
+
+def render_card(card):
+    """Render one card with the markup the selectors in ad_selectors.py expect."""
+    i = card["index"]
+    media = "".join(f'<img loading="lazy" src="/media/{i}_{j}.jpg">' for j in range(card["images"]))
+    media += "".join(f'<video src="/media/{i}_{j}.mp4"></video>' for j in range(card["videos"]))
+    return (
+        f'<div class="card"><span class="page">{html.escape(card["advertiser"])}</span><span>Sponsored</span>'
+        f'<a href="https://www.facebook.com/{card["page_id"]}/?ad_id={i}">Library ID {i}</a>'
+        f'<div class="body">{html.escape(card["text"])}</div>'
+        f'<span>{html.escape(card["active_time"])}</span>{media}</div>'
+    )
+
+def chunk_size(total):
+    return max(MIN_CHUNK_SIZE, -(-total // SCROLL_CHUNKS))
+
+def render_page(cards, rendered=None):
+    """Render the results page with its first chunk of cards (or all of them for offline parsing)."""
+    rendered = chunk_size(len(cards)) if rendered is None else rendered
+    rendered = min(rendered, len(cards))
+    return PAGE_TEMPLATE.format(cards="".join(render_card(card) for card in cards[:rendered]), rendered=rendered,
+                                total=len(cards), chunk=chunk_size(len(cards)))
+
+class MockAdLibrary:
+    """Threaded HTTP server for /ads/library/ (results page), /ads/library/cards (JSON chunks) and /media/*."""
+
+    def __init__(self, cards, host="127.0.0.1", port=0):
+        self.cards = cards
+        self.rendered_cards = [render_card(card) for card in cards]
+        library = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/ads/library/":
+                    query = parse_qs(url.query)
+                    rendered = len(library.cards) if query.get("static") else None
+                    self.respond(200, "text/html; charset=utf-8", render_page(library.cards, rendered).encode("utf-8"))
+                elif url.path == "/ads/library/cards":
+                    query = parse_qs(url.query)
+                    offset = int(query.get("offset", ["0"])[0])
+                    limit = int(query.get("limit", [str(MIN_CHUNK_SIZE)])[0])
+                    body = {"html": "".join(library.rendered_cards[offset:offset + limit]),
+                            "next": min(offset + limit, len(library.cards))}
+                    self.respond(200, "application/json", json.dumps(body).encode("utf-8"))
+                elif url.path.startswith("/media/"):
+                    self.respond(200, "image/gif", PIXEL_GIF)  # Same bytes for every .jpg/.mp4; content is never decoded
+                else:
+                    self.respond(404, "text/plain", b"Not found")
+
+            def respond(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-ad-library", daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def library_url(self):
+        return self.base_url + "ads/library/"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    library = MockAdLibrary(synthetic_cards(args.cards), port=args.port).start()
+    print(f"🧪 Serving {args.cards} ad cards at {library.library_url} (Ctrl+C to stop)")
+    try:
+        library.thread.join()
+    except KeyboardInterrupt:
+        library.stop()
@@ -0,0 +1,174 @@
+import argparse
+import csv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from scrape import init_driver, scrape_page, save_to_csv, EXTRACTION_MODE, RECYCLE_AD_NODES
+from run_metrics import get_logger
+
+log = get_logger("browser_pool")
+
+# SETTINGS
+POOL_SIZE = 3
+MAX_JOB_ATTEMPTS = 2
+MERGED_OUTPUT_FILE = "meta_ads_merged.csv"
+
+class BrowserPool:
+    """Pool of reusable undetected-Chrome drivers shared by concurrent scrape jobs."""
+
+    def __init__(self, size=POOL_SIZE, capture_network=False):
+        self.size = size
+        self.capture_network = capture_network
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)  # Signalled when a driver is returned or a launch slot frees up
+        self._launch_lock = threading.Lock()  # undetected_chromedriver patches its binary on launch, so launches are serialized
+        self._live = 0
+        self._closed = False
+
+    def acquire(self):
+        """Return an idle driver, launching a new one while the pool is below its size.
+
+        When the pool is full, waits until a driver is returned or a broken one is quit and can be replaced.
+        """
+        with self._available:
+            while not self._idle and self._live >= self.size and not self._closed:
+                self._available.wait()
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            if self._idle:
+                return self._idle.pop()
+            self._live += 1
+        try:
+            with self._launch_lock:
+                return init_driver(capture_network=self.capture_network)
+        except Exception:
+            with self._available:
+                self._live -= 1
+                self._available.notify()
+            raise
+
+    def release(self, driver, broken=False):
+        """Return a driver to the pool, or quit it so a fresh one replaces it."""
+        if broken or self._closed or not is_driver_alive(driver):
+            quit_driver(driver)
+            with self._available:
+                self._live -= 1
+                self._available.notify()
+            log.info("♻️ Recycled a crashed Chrome driver.")
+            return
+        with self._available:
+            self._idle.append(driver)
+            self._available.notify()
+
+    def close(self):
+        """Quit every idle driver in the pool and wake any thread waiting for one."""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+            self._available.notify_all()
+        for driver in idle:
+            quit_driver(driver)
+        log.info("✅ Browser pool closed.")
+
+    def snapshot(self):
+        """Pool size, launched drivers and idle drivers, for status reports."""
+        with self._lock:
+            return {"size": self.size, "live": self._live, "idle": len(self._idle)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def is_driver_alive(driver):
+    """Check whether a driver's browser still responds."""
+    try:
+        driver.window_handles
+        return True
+    except Exception:
+        return False
+
+def quit_driver(driver):
+    """Quit a driver, ignoring errors from an already dead browser."""
+    try:
+        driver.quit()
+    except Exception as e:
+        log.info(f"ℹ️ Non-critical error during driver cleanup: {e}. Continuing execution.")
+
+def job_debug_log(keyword, country):
+    """Return a per-job error log filename so concurrent jobs do not overwrite each other."""
+    safe_keyword = "".join(c for c in keyword if c.isalnum() or c in (' ', '_', '-')).strip().replace(' ', '_')
+    return f"scrape_errors_{safe_keyword}_{country}.csv"
+
+def run_job(pool, keyword, country, extraction_mode=EXTRACTION_MODE, recycle_nodes=RECYCLE_AD_NODES):
+    """Scrape one (keyword, country) job on a pooled driver, retrying on a fresh driver if it crashes."""
+    for attempt in range(1, MAX_JOB_ATTEMPTS + 1):
+        driver = None
+        try:
+            driver = pool.acquire()  # A failed Chrome launch counts as a failed attempt too
+            ads = scrape_page(driver, keyword, country, extraction_mode, recycle_nodes, job_debug_log(keyword, country))
+        except Exception as e:
+            log.warning(f"⚠️ Job ({keyword}, {country}) failed on attempt {attempt}/{MAX_JOB_ATTEMPTS}: {e}")
+            if driver is not None:
+                pool.release(driver, broken=True)
+            continue
+        pool.release(driver)
+        for ad in ads:
+            ad.keyword = keyword
+            ad.country = country
+        return ads
+    log.warning(f"⚠️ Giving up on job ({keyword}, {country}).")
+    return []
+
+def merge_ads(results):
+    """Merge per-job ad lists into one dataset deduplicated on (page ID, ad text, ad link)."""
+    merged = []
+    seen_ads = set()
+    for ads in results:
+        for ad in ads:
+            ad_key = (ad.page_id, ad.text_hash, ad.ad_link)
+            if ad_key in seen_ads:
+                continue
+            seen_ads.add(ad_key)
+            merged.append(ad)
+    return merged
+
+def run_jobs(jobs, pool_size=POOL_SIZE, extraction_mode=EXTRACTION_MODE, recycle_nodes=RECYCLE_AD_NODES):
+    """Run (keyword, country) jobs in parallel on a shared browser pool and merge the results."""
+    start = time.time()
+    results = []
+    with BrowserPool(pool_size, capture_network=extraction_mode == "network") as pool:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            futures = {executor.submit(run_job, pool, keyword, country, extraction_mode, recycle_nodes): (keyword, country)
+                       for keyword, country in jobs}
+            for future in as_completed(futures):
+                keyword, country = futures[future]
+                try:
+                    ads = future.result()
+                except Exception as e:
+                    log.warning(f"⚠️ Job ({keyword}, {country}) aborted: {e}")
+                    continue
+                log.info(f"✅ Job ({keyword}, {country}) finished with {len(ads)} ad(s).")
+                results.append(ads)
+    merged = merge_ads(results)
+    log.info(f"ℹ️ Ran {len(jobs)} job(s) in {time.time() - start:.1f}s: {len(merged)} unique ad(s).")
+    return merged
+
+def load_jobs(filename):
+    """Load (keyword, country) jobs from a CSV file with keyword and country columns."""
+    with open(filename, newline="", encoding="utf-8-sig") as f:
+        return [(row["keyword"].strip(), (row.get("country") or "ALL").strip()) for row in csv.DictReader(f) if row.get("keyword")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape many keyword/country pairs on a pool of reusable browsers.")
+    parser.add_argument("jobs_file", help="CSV file with keyword and country columns")
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE, help="Number of concurrent Chrome instances")
+    parser.add_argument("--mode", default=EXTRACTION_MODE, choices=["js", "html", "xpath", "network"], help="Extraction mode")
+    parser.add_argument("--output", default=MERGED_OUTPUT_FILE, help="CSV file for the merged ads")
+    args = parser.parse_args()
+
+    merged_ads = run_jobs(load_jobs(args.jobs_file), args.pool_size, args.mode)
+    save_to_csv(merged_ads, args.output)
@@ -0,0 +1,187 @@
+import argparse
+import csv
+import os
+import time
+import uuid
+from urllib.parse import quote
+from ad_record import AdRecord
+from run_metrics import get_logger
+
+log = get_logger("columnar_output")
+
+# SETTINGS
+DATASET_ROOT = "ads_dataset"  # One sub-folder per table, hive-partitioned as keyword=/country=/run=
+ADS_TABLE = "ads"
+METRICS_TABLE = "metrics"
+PARQUET_COMPRESSION = "zstd"
+PARTITION_KEYS = ["keyword", "country", "run"]
+# Columns each downstream step reads back; Parquet only decodes these
+# "Seen Before" lets both steps reuse media and classifications stored by earlier runs (see ad_store.py)
+RANKING_COLUMNS = ["Page ID", "Advertiser", "Ad Text", "Ad Link", "Active Time", "Days Active", "Ad Variations",
+                   "Image URLs", "Video URLs", "Seen Before"]
+ESTIMATION_COLUMNS = ["Page ID", "Advertiser", "Ad Text", "Ad Link", "Days Active", "Ad Variations", "Seen Before"]
+LIST_SEPARATOR = " | "  # How list-valued media columns are flattened in CSV exports
+
+def get_pyarrow():
+    """Import pyarrow on first use so CSV-only runs do not need it installed."""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+def table_schema(table_name):
+    """Return the fixed Arrow schema of a table, so partitions from different runs stay compatible."""
+    pa = get_pyarrow()
+    if table_name == ADS_TABLE:
+        return pa.schema([
+            ("Advertiser", pa.string()),
+            ("Ad Text", pa.string()),
+            ("Ad Link", pa.string()),
+            ("Page ID", pa.string()),
+            ("Active Time", pa.string()),
+            ("Days Active", pa.float64()),  # Fractional for ads active less than a day
+            ("Ad Variations", pa.int64()),
+            ("Image URLs", pa.list_(pa.string())),
+            ("Video URLs", pa.list_(pa.string())),
+            ("Ad Archive ID", pa.string()),
+            ("Start Date", pa.string()),
+            ("End Date", pa.string()),
+            ("Collation Count", pa.int64()),
+            ("Page Name", pa.string()),
+            ("Seen Before", pa.bool_())
+        ])
+    if table_name == METRICS_TABLE:
+        return pa.schema([
+            ("Advertiser", pa.string()),
+            ("Industry", pa.string()),
+            ("CPC", pa.float64()),
+            ("CTR", pa.float64()),
+            ("Conversion Rate", pa.float64()),
+            ("Estimated Spend (INR)", pa.float64()),
+            ("Estimated Reach", pa.float64()),
+            ("ROAS", pa.float64()),
+            ("Note", pa.string())
+        ])
+    raise ValueError(f"Unknown table: {table_name}")
+
+def new_run_id():
+    """Return a sortable, unique ID for one run's partition."""
+    return time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+def partition_path(table_name, keyword, country, run_id, root=DATASET_ROOT):
+    """Return the hive-style folder of one run's partition of a table."""
+    return os.path.join(root, table_name, f"keyword={quote(keyword, safe='')}",
+                        f"country={quote(country, safe='')}", f"run={quote(run_id, safe='')}")
+
+def rows_to_table(rows, table_name):
+    """Build an Arrow table column by column from row dicts; keys outside the schema are dropped."""
+    pa = get_pyarrow()
+    schema = table_schema(table_name)
+    columns = {}
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pa.types.is_string(field.type):
+            values = [None if value is None else str(value) for value in values]
+        columns[field.name] = pa.array(values, type=field.type)
+    return pa.Table.from_pydict(columns, schema=schema)
+
+def write_partition(rows, table_name, keyword, country, run_id, root=DATASET_ROOT):
+    """Append rows as a new Parquet file in the run's partition; returns the file path, or None if nothing was written."""
+    if not rows:
+        log.warning(f"⚠️ No {table_name} rows to save.")
+        return None
+    pa = get_pyarrow()
+    folder = partition_path(table_name, keyword, country, run_id, root)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"part-{uuid.uuid4().hex}.parquet")
+    temp_path = path + ".tmp"
+    pa.parquet.write_table(rows_to_table(rows, table_name), temp_path, compression=PARQUET_COMPRESSION)
+    os.replace(temp_path, path)  # Readers never see a half-written part file
+    log.info(f"📦 Saved {len(rows)} {table_name} rows to {path}")
+    return path
+
+def save_ads_parquet(ads, keyword, country, run_id, root=DATASET_ROOT):
+    """Append scraped ads, including their image and video URL lists, to the ads dataset."""
+    return write_partition(ads, ADS_TABLE, keyword, country, run_id, root)
+
+def save_metrics_parquet(metrics, keyword, country, run_id, root=DATASET_ROOT):
+    """Append metric estimates to the metrics dataset."""
+    return write_partition(metrics, METRICS_TABLE, keyword, country, run_id, root)
+
+def read_table(table_name, columns=None, keyword=None, country=None, run_id=None, root=DATASET_ROOT):
+    """Read selected columns of a table, pruning partitions by keyword, country and run."""
+    pa = get_pyarrow()
+    folder = os.path.join(root, table_name)
+    schema = table_schema(table_name)
+    if not os.path.isdir(folder):
+        return schema.empty_table() if columns is None else pa.schema([schema.field(c) for c in columns]).empty_table()
+    partitioning = pa.dataset.partitioning(pa.schema([(key, pa.string()) for key in PARTITION_KEYS]), flavor="hive")
+    dataset = pa.dataset.dataset(folder, schema=pa.unify_schemas([schema, partitioning.schema]), format="parquet",
+                                 partitioning=partitioning, exclude_invalid_files=True)
+    condition = None
+    for key, value in zip(PARTITION_KEYS, (keyword, country, run_id)):
+        if value is not None:
+            expression = pa.dataset.field(key) == value
+            condition = expression if condition is None else condition & expression
+    return dataset.to_table(columns=columns, filter=condition)
+
+def read_rows(table_name, columns=None, keyword=None, country=None, run_id=None, root=DATASET_ROOT):
+    """Read selected columns of a table as row dicts."""
+    return read_table(table_name, columns, keyword, country, run_id, root).to_pylist()
+
+def latest_run_id(table_name, keyword, country, root=DATASET_ROOT):
+    """Return the newest run ID stored for a keyword and country, or None."""
+    folder = os.path.dirname(partition_path(table_name, keyword, country, "", root))
+    if not os.path.isdir(folder):
+        return None
+    runs = sorted(name[len("run="):] for name in os.listdir(folder) if name.startswith("run="))
+    return runs[-1] if runs else None
+
+def load_ads_for_ranking(keyword, country, run_id=None, root=DATASET_ROOT):
+    """Read back only the columns show_top_5_ads needs, as AdRecords."""
+    return [AdRecord.from_dict(row) for row in read_rows(ADS_TABLE, RANKING_COLUMNS, keyword, country, run_id, root)]
+
+def load_ads_for_estimation(keyword, country, run_id=None, root=DATASET_ROOT):
+    """Read back only the columns estimate_metrics needs, as AdRecords."""
+    return [AdRecord.from_dict(row) for row in read_rows(ADS_TABLE, ESTIMATION_COLUMNS, keyword, country, run_id, root)]
+
+def export_csv(table_name, filename, columns=None, keyword=None, country=None, run_id=None, root=DATASET_ROOT):
+    """Export a table (or a slice of it) to CSV, flattening list columns with LIST_SEPARATOR."""
+    rows = read_rows(table_name, columns, keyword, country, run_id, root)
+    if not rows:
+        log.warning("⚠️ No data to export.")
+        return 0
+    with open(filename, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()), quoting=csv.QUOTE_MINIMAL)
+        writer.writeheader()
+        for row in rows:
+            for key, value in row.items():
+                if isinstance(value, list):
+                    row[key] = LIST_SEPARATOR.join(value)
+                elif isinstance(value, str):
+                    row[key] = value.replace('\n', ' ').replace('\r', ' ')
+            writer.writerow(row)
+    log.info(f"📁 Exported {len(rows)} {table_name} rows to {filename}")
+    return len(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Parquet ads/metrics datasets to CSV.")
+    parser.add_argument("table", choices=[ADS_TABLE, METRICS_TABLE])
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("--keyword")
+    parser.add_argument("--country")
+    parser.add_argument("--run", help="Run ID, or 'latest' (needs --keyword and --country)")
+    parser.add_argument("--columns", help="Comma-separated columns to export")
+    parser.add_argument("--root", default=DATASET_ROOT)
+    args = parser.parse_args()
+
+    run_id = args.run
+    if run_id == "latest":
+        if not (args.keyword and args.country):
+            parser.error("--run latest needs --keyword and --country")
+        run_id = latest_run_id(args.table, args.keyword, args.country, args.root)
+    export_csv(args.table, args.output, args.columns.split(",") if args.columns else None,
+               args.keyword, args.country, run_id, args.root)
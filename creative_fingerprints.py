@@ -0,0 +1,278 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
+from run_metrics import get_logger
+
+log = get_logger("creative_fingerprints")
+
+# SETTINGS
+CREATIVE_INDEX_DB = "creative_index.db"
+FINGERPRINT_WORKERS = os.cpu_count() or 2
+SAME_CREATIVE_DISTANCE = 6  # Max Hamming distance between 64-bit pHashes of the same creative at different sizes
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
+VIDEO_EXTENSIONS = {".mp4", ".webm", ".mov", ".mkv", ".avi"}
+HASH_SIZE = 8
+DCT_SIZE = 32
+HASH_CHUNKS = 8  # pHash split into indexed 8-bit chunks; any match within 7 bits shares at least one chunk
+
+def dct_matrix(size=DCT_SIZE):
+    """Return the orthonormal DCT-II matrix used for pHash."""
+    k = np.arange(size)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(size)[None, :] + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+def phash_pixels(gray):
+    """Compute a 64-bit pHash from a DCT_SIZE x DCT_SIZE grayscale array."""
+    matrix = dct_matrix()
+    low = (matrix @ gray @ matrix.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    bits = low > np.median(low[1:])  # The DC term only encodes overall brightness
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def image_fingerprint(path):
+    """Return (pHash, width, height) of an image, using its first frame for GIFs."""
+    from PIL import Image
+    with Image.open(path) as image:
+        width, height = image.size
+        gray = image.convert("L").resize((DCT_SIZE, DCT_SIZE), Image.LANCZOS)
+        return phash_pixels(np.asarray(gray, dtype=np.float64)), width, height
+
+def video_fingerprint(path):
+    """Return (pHash of the middle frame, width, height, duration in seconds) of a video via OpenCV."""
+    import cv2
+    capture = cv2.VideoCapture(path)
+    try:
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        capture.set(cv2.CAP_PROP_POS_FRAMES, max(frames // 2, 0))
+        ok, frame = capture.read()
+        if not ok:
+            return None, width, height, frames / fps if fps else None
+        gray = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (DCT_SIZE, DCT_SIZE), interpolation=cv2.INTER_AREA)
+        return phash_pixels(gray.astype(np.float64)), width, height, frames / fps if fps else None
+    finally:
+        capture.release()
+
+def file_digest(path):
+    """Return the SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint_file(path, digest=None):
+    """Fingerprint one creative in a worker process; returns a result dict (phash None if it could not be decoded)."""
+    extension = os.path.splitext(path)[1].lower()
+    result = {"Path": path, "Digest": digest or file_digest(path), "Bytes": os.path.getsize(path), "Kind": "other",
+              "PHash": None, "Width": None, "Height": None, "Duration": None, "Error": ""}
+    try:
+        if extension in IMAGE_EXTENSIONS:
+            result["Kind"] = "image"
+            result["PHash"], result["Width"], result["Height"] = image_fingerprint(path)
+        elif extension in VIDEO_EXTENSIONS:
+            result["Kind"] = "video"
+            result["PHash"], result["Width"], result["Height"], result["Duration"] = video_fingerprint(path)
+    except ImportError as e:
+        result["Error"] = f"Missing decoder: {e.name}"
+    except Exception as e:
+        result["Error"] = str(e)
+    return result
+
+def hash_chunks(phash):
+    """Split a 64-bit hash into HASH_CHUNKS indexed chunks."""
+    bits = 64 // HASH_CHUNKS
+    return [(phash >> (i * bits)) & ((1 << bits) - 1) for i in range(HASH_CHUNKS)]
+
+def to_signed(value):
+    """Store unsigned 64-bit hashes in SQLite's signed INTEGER."""
+    return value - (1 << 64) if value is not None and value >= 1 << 63 else value
+
+def to_unsigned(value):
+    return value + (1 << 64) if value is not None and value < 0 else value
+
+class CreativeIndex:
+    """SQLite index of creative fingerprints, keyed by content hash, with per-file records to skip known files."""
+
+    def __init__(self, path=CREATIVE_INDEX_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        chunk_columns = ", ".join(f"chunk_{i} INTEGER" for i in range(HASH_CHUNKS))
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS creatives (
+                digest TEXT PRIMARY KEY,
+                kind TEXT,
+                phash INTEGER,
+                {chunk_columns},
+                width INTEGER,
+                height INTEGER,
+                duration REAL,
+                bytes INTEGER,
+                first_path TEXT,
+                fingerprinted_at REAL
+            )
+        """)
+        for i in range(HASH_CHUNKS):
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS creatives_chunk_{i} ON creatives (chunk_{i})")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, digest TEXT)")
+        self.conn.commit()
+
+    def is_fingerprinted(self, path):
+        """Check whether a file with the same path, size and mtime was fingerprinted before."""
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def add(self, result):
+        """Record a fingerprint result for its file and, if the content is new, for its creative."""
+        stat = os.stat(result["Path"])
+        phash = result["PHash"]
+        chunks = hash_chunks(phash) if phash is not None else [None] * HASH_CHUNKS
+        self.conn.execute(f"INSERT OR IGNORE INTO creatives VALUES ({', '.join('?' * (9 + HASH_CHUNKS))})",
+                          (result["Digest"], result["Kind"], to_signed(phash), *chunks, result["Width"],
+                           result["Height"], result["Duration"], result["Bytes"], os.path.abspath(result["Path"]),
+                           time.time()))
+        self.add_file(result["Path"], result["Digest"], stat)
+
+    def add_file(self, path, digest, stat=None):
+        """Record that a file holds an indexed creative, so it is skipped until it changes."""
+        stat = stat or os.stat(path)
+        self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                          (os.path.abspath(path), stat.st_size, stat.st_mtime, digest))
+
+    def has_creative(self, digest):
+        """Check whether content with this hash was fingerprinted before."""
+        return self.conn.execute("SELECT 1 FROM creatives WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def commit(self):
+        self.conn.commit()
+
+    def digest_of(self, path):
+        """Return the content hash recorded for a file, or None."""
+        row = self.conn.execute("SELECT digest FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return row[0] if row else None
+
+    def phash_of(self, path):
+        """Return the pHash recorded for a file, or None."""
+        row = self.conn.execute("SELECT c.phash FROM files f JOIN creatives c ON c.digest = f.digest WHERE f.path = ?",
+                                (os.path.abspath(path),)).fetchone()
+        return to_unsigned(row[0]) if row else None
+
+    def find_same_creative(self, phash, max_distance=SAME_CREATIVE_DISTANCE, exclude_digest=None):
+        """Return [(digest, first_path, distance)] of indexed creatives within max_distance bits of phash."""
+        if max_distance < HASH_CHUNKS:
+            # Pigeonhole: a match differs in fewer bits than there are chunks, so one chunk is identical
+            where = " OR ".join(f"chunk_{i} = ?" for i in range(HASH_CHUNKS))
+            rows = self.conn.execute(f"SELECT digest, first_path, phash FROM creatives WHERE {where}",
+                                     hash_chunks(phash)).fetchall()
+        else:
+            rows = self.conn.execute("SELECT digest, first_path, phash FROM creatives WHERE phash IS NOT NULL").fetchall()
+        matches = []
+        for digest, first_path, other in rows:
+            distance = bin(phash ^ to_unsigned(other)).count("1")
+            if distance <= max_distance and digest != exclude_digest:
+                matches.append((digest, first_path, distance))
+        return sorted(matches, key=lambda match: match[2])
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+def iter_media_files(folder):
+    """Yield every image/video file under a folder."""
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS:
+                yield os.path.join(dirpath, filename)
+
+def fingerprint_media(paths, index=None, max_workers=FINGERPRINT_WORKERS):
+    """Fingerprint creatives in a process pool, decoding only content not in the index yet; returns the new results.
+
+    Files are skipped by path, size and mtime first, then by content hash, so a known creative saved
+    under another name (e.g. linked from the media cache) is recorded without being decoded again.
+    """
+    own_index = index is None
+    index = index or CreativeIndex()
+    changed = [path for path in paths if os.path.exists(path) and not index.is_fingerprinted(path)]
+    pending = {}  # digest -> paths holding that content; each new digest is decoded once
+    if changed:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(changed))) as executor:
+            for path, digest in zip(changed, executor.map(file_digest, changed)):
+                if index.has_creative(digest):
+                    index.add_file(path, digest)
+                else:
+                    pending.setdefault(digest, []).append(path)
+    skipped = len(paths) - sum(len(group) for group in pending.values())
+    results = []
+    if pending:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = {executor.submit(fingerprint_file, group[0], digest): group for digest, group in pending.items()}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    log.warning(f"⚠️ Fingerprinting failed: {e}")
+                    continue
+                if result["Error"]:
+                    log.warning(f"⚠️ Could not decode {result['Path']}: {result['Error']}")
+                    if result["Error"].startswith("Missing decoder"):
+                        continue  # Retried once Pillow/OpenCV is installed
+                index.add(result)
+                for path in futures[future][1:]:
+                    index.add_file(path, result["Digest"])
+                results.append(result)
+    index.commit()
+    log.info(f"🖼️ Fingerprinted {len(results)} creative(s), skipped {skipped} already indexed")
+    if own_index:
+        index.close()
+    return results
+
+def report_same_creatives(results, index, max_distance=SAME_CREATIVE_DISTANCE):
+    """Log newly fingerprinted files that match a creative already in the index."""
+    duplicates = 0
+    for result in results:
+        if result["PHash"] is None:
+            continue
+        matches = index.find_same_creative(result["PHash"], max_distance, exclude_digest=result["Digest"])
+        if matches:
+            duplicates += 1
+            digest, first_path, distance = matches[0]
+            log.info(f"🔁 {os.path.basename(result['Path'])} looks like {first_path} (distance {distance})")
+    return duplicates
+
+def fingerprint_folder(folder, index_path=CREATIVE_INDEX_DB, max_workers=FINGERPRINT_WORKERS):
+    """Post-download stage: fingerprint new creatives in a media folder and report reused ones."""
+    index = CreativeIndex(index_path)
+    try:
+        results = fingerprint_media(list(iter_media_files(folder)), index, max_workers)
+        report_same_creatives(results, index)
+        return results
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint downloaded creatives and find reused ones.")
+    parser.add_argument("folder", nargs="?", default="ad_media", help="Media folder to fingerprint")
+    parser.add_argument("--index", default=CREATIVE_INDEX_DB)
+    parser.add_argument("--workers", type=int, default=FINGERPRINT_WORKERS)
+    parser.add_argument("--lookup", help="Find indexed creatives that match this file")
+    args = parser.parse_args()
+
+    if args.lookup:
+        index = CreativeIndex(args.index)
+        result = fingerprint_file(args.lookup)
+        if result["PHash"] is None:
+            log.warning(f"⚠️ Could not fingerprint {args.lookup}: {result['Error'] or 'unsupported file type'}")
+        else:
+            for digest, first_path, distance in index.find_same_creative(result["PHash"], exclude_digest=result["Digest"]):
+                log.info(f"🔁 {first_path} (distance {distance})")
+        index.close()
+    else:
+        fingerprint_folder(args.folder, args.index, args.workers)
@@ -1,10 +1,18 @@
+import argparse
+import atexit
 import csv
 import os
 import tempfile
 import shutil
-from transformers import pipeline
-from deep_translator import GoogleTranslator
-from langdetect import detect
+import threading
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from ad_record import as_record
+from run_metrics import get_logger, set_log_level, timed, metrics as run_metrics
+from rate_limiter import get_scheduler, JobBudget, RetryableError, ThrottledError
+
+log = get_logger("estimate_metrics")
 
 # Benchmark Lookup Table (in INR)
 BENCHMARKS = {
@@ -31,18 +39,254 @@ DEFAULT_CTR = 0.01
 DEFAULT_CONVERSION_RATE = 0.02
 DEFAULT_AOV = 60000
 OUTPUT_FILE = "ad_metrics_estimates.csv"
+LOW_CONFIDENCE_FILE = "low_confidence_ads.csv"
 CONFIDENCE_THRESHOLD = 0.3
 DEFAULT_ACTIVE_DAYS = 1.0
+IMPRESSIONS_PER_VARIATION_DAY = 223
+CLASSIFIER_MODEL = "valhalla/distilbart-mnli-12-3"
+TRANSLATION_BATCH_SIZE = 25
+TRANSLATION_WORKERS = 4  # Upper bound; the share actually in flight is tuned by rate_limiter.py
+TRANSLATION_RETRIES = 2
+TRANSLATION_MAX_CHARS = 4500  # Google's web endpoint rejects requests over 5000 characters
+TRANSLATION_SEPARATOR = "\n###\n"  # Joins a batch into one request; Google leaves the marker untranslated
+TRANSLATION_HOST = "translate.google.com"  # Rate-limit key shared by every translation request
+USE_TEXT_CACHE = True  # Persist language detection, translation and classification results in text_cache.db
+CLASSIFIER_BACKEND = "zero-shot"  # "zero-shot" (NLI pass per label) or "embedding" (one embedding per ad, see industry_embeddings.py)
+INDUSTRIES = list(BENCHMARKS.keys())
 translation_cache = {}
 
-try:
-    classifier = pipeline("zero-shot-classification", 
-                         model="valhalla/distilbart-mnli-12-3", 
-                         tokenizer="valhalla/distilbart-mnli-12-3")
-    INDUSTRIES = list(BENCHMARKS.keys())
-except Exception as e:
-    print(f"⚠️ Error loading HuggingFace model: {e}. Falling back to default metrics.")
-    classifier = None
+# The classifier, translator and language detector are heavy imports, so they are loaded on first use
+classifier = None
+classifier_loaded = False
+classifier_lock = threading.Lock()
+
+def get_classifier():
+    """Load the zero-shot classifier on first use; returns None if it cannot be loaded."""
+    global classifier, classifier_loaded
+    with classifier_lock:
+        if not classifier_loaded:
+            try:
+                if CLASSIFIER_BACKEND == "embedding":
+                    from industry_embeddings import EmbeddingClassifier
+                    classifier = EmbeddingClassifier(INDUSTRIES)
+                else:
+                    from transformers import pipeline
+                    classifier = pipeline("zero-shot-classification", 
+                                          model=CLASSIFIER_MODEL, 
+                                          tokenizer=CLASSIFIER_MODEL)
+            except Exception as e:
+                log.warning(f"⚠️ Error loading HuggingFace model: {e}. Falling back to default metrics.")
+                classifier = None
+            classifier_loaded = True
+    return classifier
+
+text_cache = None
+text_cache_lock = threading.Lock()
+
+def get_text_cache():
+    """Open the persistent text cache on first use; returns None when caching is disabled."""
+    global text_cache
+    if not USE_TEXT_CACHE:
+        return None
+    with text_cache_lock:
+        if text_cache is None:
+            from text_cache import TextCache
+            text_cache = TextCache()
+            atexit.register(text_cache.close)  # Writes the buffered access times of cache hits
+    return text_cache
+
+def classifier_version():
+    """Identify the classifier configuration so cached classifications are invalidated when it changes."""
+    if CLASSIFIER_BACKEND == "embedding":
+        from industry_embeddings import EMBEDDING_MODEL, EMBEDDING_RUNTIME
+        model = f"{EMBEDDING_MODEL}:{EMBEDDING_RUNTIME}"
+    else:
+        model = CLASSIFIER_MODEL
+    return f"{CLASSIFIER_BACKEND}:{model}:{hashlib.sha1('|'.join(INDUSTRIES).encode('utf-8')).hexdigest()[:8]}"
+
+def warm_up_classifier():
+    """Start loading the classifier in a background thread so it is ready when estimation starts."""
+    thread = threading.Thread(target=get_classifier, name="classifier-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def detect_language(text):
+    """Detect the language of a text, importing langdetect on first use."""
+    cache = get_text_cache()
+    if cache is not None:
+        lang = cache.get("detect", text, version="langdetect")
+        if lang is not None:
+            return lang
+    from langdetect import detect
+    lang = detect(text)
+    if cache is not None:
+        cache.set("detect", text, lang, version="langdetect")
+    return lang
+
+def translate_to_english(text):
+    """Translate a text to English, importing deep_translator on first use."""
+    cache = get_text_cache()
+    if cache is not None:
+        translated = cache.get("translate", text, version="google:en")
+        if translated is not None:
+            return translated
+    from deep_translator import GoogleTranslator
+    translated = GoogleTranslator(source='auto', target='en').translate(text)
+    if cache is not None and translated:
+        cache.set("translate", text, translated, version="google:en")
+    return translated
+
+ENGLISH_HINT_WORDS = {"the", "and", "your", "you", "for", "with", "our", "now", "get", "to", "of", "in", "is", "free", "book"}
+NON_LATIN_RE = re.compile(r"[^\W\d_a-zA-Z\u00C0-\u024F]")
+SEPARATOR_RE = re.compile(r"\s*###\s*")
+
+class GoogleBatchTranslator:
+    """Default translator backend: packs a batch into as few GoogleTranslator requests as the length limit allows.
+
+    deep_translator's own translate_batch sends one request per text, so texts are joined with
+    TRANSLATION_SEPARATOR instead and split again after translation. A chunk whose translation does not
+    split back into one part per text is retried text by text.
+    """
+
+    def translate_batch(self, texts):
+        from deep_translator import GoogleTranslator
+        translator = GoogleTranslator(source='auto', target='en')
+        results = []
+        for chunk in self.chunks(texts):
+            results.extend(self.translate_chunk(translator, chunk))
+        return results
+
+    @staticmethod
+    def chunks(texts, max_chars=TRANSLATION_MAX_CHARS):
+        """Group texts into chunks whose joined length stays under max_chars; texts containing the marker go alone."""
+        chunk, size = [], 0
+        for text in texts:
+            if "###" in text:
+                if chunk:
+                    yield chunk
+                    chunk, size = [], 0
+                yield [text]
+                continue
+            text_size = len(text) + len(TRANSLATION_SEPARATOR)
+            if chunk and size + text_size > max_chars:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(text)
+            size += text_size
+        if chunk:
+            yield chunk
+
+    def translate_chunk(self, translator, chunk):
+        if len(chunk) > 1:
+            run_metrics.count("translation_requests")
+            parts = SEPARATOR_RE.split((translator.translate(TRANSLATION_SEPARATOR.join(chunk)) or "").strip())
+            if len(parts) == len(chunk):
+                return parts
+            log.debug("Joined translation split into %d part(s) for %d text(s); translating one by one",
+                      len(parts), len(chunk))
+            run_metrics.count("translation_split_fallbacks")
+        results = []
+        for text in chunk:
+            run_metrics.count("translation_requests")
+            # Only the start of an over-long ad is needed to classify it
+            results.append(translator.translate(text[:TRANSLATION_MAX_CHARS]))
+        return results
+
+# Any object with translate_batch(texts) -> list of English texts can replace the default backend
+translator_backend = GoogleBatchTranslator()
+
+def translate_batch_limited(translator, batch, budget=None):
+    """Translate one batch under the shared rate limits, retrying quota and connection errors."""
+    def attempt():
+        try:
+            return translator.translate_batch(batch)
+        except Exception as e:
+            # deep_translator raises TooManyRequests on quota errors and RequestError on failed requests
+            if "TooManyRequests" in type(e).__name__:
+                raise ThrottledError(str(e))
+            if isinstance(e, OSError) or type(e).__name__ == "RequestError":
+                raise RetryableError(str(e))
+            raise
+    return get_scheduler().call(TRANSLATION_HOST, attempt, TRANSLATION_RETRIES, budget,
+                                label=f"translation of {len(batch)} text(s)")
+
+def script_language_hint(text):
+    """Cheap language guess: "en" for plain-ASCII English, "other" for non-Latin scripts, None when unsure."""
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return None
+    if sum(1 for c in letters if NON_LATIN_RE.match(c)) > len(letters) * 0.3:
+        return "other"
+    if all(c.isascii() for c in letters):
+        words = set(re.findall(r"[a-z]+", text.lower()))
+        if len(words & ENGLISH_HINT_WORDS) >= 2:
+            return "en"
+    return None
+
+@timed("translation")
+def translate_texts(texts, translator=None, batch_size=TRANSLATION_BATCH_SIZE, max_workers=TRANSLATION_WORKERS):
+    """Translate the non-English texts among texts to English; returns {text: english_text}.
+
+    Texts are deduplicated, obvious English skips language detection, cached translations are reused,
+    and the rest go to the translator in batches on a bounded thread pool.
+    """
+    translator = translator or translator_backend
+    cache = get_text_cache()
+    translations = {}
+    to_translate = []
+    for text in dict.fromkeys(texts):
+        hint = script_language_hint(text)
+        try:
+            lang = hint if hint is not None else detect_language(text)
+        except Exception as e:
+            log.warning(f"⚠️ Language detection error for text '{text[:50]}...': {e}")
+            lang = "en"
+        if lang == "en":
+            translations[text] = text
+            continue
+        cached = cache.get("translate", text, version="google:en") if cache is not None else None
+        if cached is not None:
+            translations[text] = cached
+        else:
+            to_translate.append(text)
+
+    batches = [to_translate[i:i + batch_size] for i in range(0, len(to_translate), batch_size)]
+    budget = JobBudget()
+
+    def run_batch(batch):
+        try:
+            return batch, translate_batch_limited(translator, batch, budget)
+        except Exception as e:
+            log.warning(f"⚠️ Translation error for a batch of {len(batch)} text(s): {e}")
+            return batch, None
+
+    if batches:
+        run_metrics.count("translation_chars_sent", sum(len(text) for text in to_translate))
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            for batch, translated in executor.map(run_batch, batches):
+                for text, english in zip(batch, translated or batch):
+                    english = (english or text).strip()
+                    translations[text] = english
+                    if cache is not None and translated is not None:
+                        cache.set("translate", text, english, version="google:en")
+        log.info(f"🌐 Translated {len(to_translate)} unique text(s) in {len(batches)} batch(es)")
+    return translations
+
+def preprocess_texts(texts, advertisers, translator=None):
+    """Batch version of preprocess_text: translate all texts in one stage, then add advertiser context."""
+    valid = [text for text in texts if text and text.strip() != "..." and len(text.strip()) >= 10]
+    translations = translate_texts(valid, translator) if valid else {}
+    results = []
+    for text, advertiser in zip(texts, advertisers):
+        has_advertiser = advertiser and advertiser != "Unknown Advertiser"
+        if text in translations:
+            english = translations[text].strip()
+            result = f"{english} by {advertiser}" if has_advertiser else english
+        else:
+            result = f"Business consulting ad by {advertiser}" if has_advertiser else "Generic business consulting ad"
+        translation_cache[(text, advertiser)] = result
+        results.append(result)
+    return results
 
 def preprocess_text(text, advertiser=""):
     """Preprocess ad text, translate non-English text, and handle short/empty text."""
@@ -53,122 +297,105 @@ def preprocess_text(text, advertiser=""):
         result = f"Business consulting ad by {advertiser}" if advertiser and advertiser != "Unknown Advertiser" else "Generic business consulting ad"
     else:
         try:
-            lang = detect(text)
+            lang = detect_language(text)
             if lang != 'en':
-                translated = GoogleTranslator(source='auto', target='en').translate(text)
+                translated = translate_to_english(text)
                 result = f"{translated.strip()} by {advertiser}" if advertiser and advertiser != "Unknown Advertiser" else translated.strip()
             else:
                 result = f"{text.strip()} by {advertiser}" if advertiser and advertiser != "Unknown Advertiser" else text.strip()
         except Exception as e:
-            print(f"⚠️ Translation error for text '{text[:50]}...': {e}")
+            log.warning(f"⚠️ Translation error for text '{text[:50]}...': {e}")
             result = f"{text.strip()} by {advertiser}" if advertiser and advertiser != "Unknown Advertiser" else text.strip()
     translation_cache[cache_key] = result
     return result
 
-def predict_industry(ad_texts, advertisers):
+def industry_result(industry, confidence):
+    """Build a classification result with the low-confidence note."""
+    return {
+        "Industry": industry, 
+        "Confidence": confidence,
+        "Note": f"Low confidence ({confidence:.2f}) - Manual review needed" if confidence < CONFIDENCE_THRESHOLD else ""
+    }
+
+def predict_industry(ad_texts, advertisers, translator=None):
     """Classify ad texts into industries using zero-shot classification."""
-    ad_texts = [preprocess_text(text, adv) for text, adv in zip(ad_texts, advertisers)]
+    cache = get_text_cache()
+    version = classifier_version()
+    cached = [cache.get("classify", text, adv, version) if cache is not None else None
+              for text, adv in zip(ad_texts, advertisers)]
+    pending = [i for i, hit in enumerate(cached) if hit is None]
+    if not pending:
+        return [industry_result(hit["Industry"], hit["Confidence"]) for hit in cached]
+    texts = preprocess_texts([ad_texts[i] for i in pending], [advertisers[i] for i in pending], translator)
+    with run_metrics.stage("classifier_load_wait"):
+        classifier = get_classifier()
     if classifier is None:
         return [{"Industry": "Software Development", "Confidence": 0.0, "Note": "Manual review needed - No classifier"}] * len(ad_texts)
     try:
-        results = classifier(ad_texts, candidate_labels=INDUSTRIES, multi_label=False)
+        with run_metrics.stage("classification"):
+            results = classifier(texts, candidate_labels=INDUSTRIES, multi_label=False)
+        run_metrics.count("texts_classified", len(texts))
         if isinstance(results, dict):
             results = [results]
-        return [{
-            "Industry": result["labels"][0], 
-            "Confidence": result["scores"][0],
-            "Note": f"Low confidence ({result['scores'][0]:.2f}) - Manual review needed" if result["scores"][0] < CONFIDENCE_THRESHOLD else ""
-        } for result in results]
+        for i, result in zip(pending, results):
+            cached[i] = {"Industry": result["labels"][0], "Confidence": float(result["scores"][0])}
+            if cache is not None:
+                cache.set("classify", ad_texts[i], cached[i], advertisers[i], version)
+        return [industry_result(hit["Industry"], hit["Confidence"]) for hit in cached]
     except Exception as e:
-        print(f"⚠️ Error classifying ad texts: {e}")
+        log.warning(f"⚠️ Error classifying ad texts: {e}")
         return [{"Industry": "Software Development", "Confidence": 0.0, "Note": "Manual review needed - Classification error"}] * len(ad_texts)
 
-def estimate_metrics(ads):
+@timed("estimation")
+def estimate_metrics(ads, low_confidence_file=LOW_CONFIDENCE_FILE, store=None):
     """Estimate performance metrics for each ad based on industry benchmarks."""
     if not ads:
-        print("⚠️ No ads to estimate metrics for.")
+        log.warning("⚠️ No ads to estimate metrics for.")
         return []
-    print(f"ℹ️ Estimating metrics for {len(ads)} unique ads")
-    results = []
-    low_confidence_ads = []
-    seen_ads = set()
+    log.info(f"ℹ️ Estimating metrics for {len(ads)} unique ads")
+    ads = [as_record(ad) for ad in ads]
     
-    ad_texts = [ad.get("Ad Text", "Business consulting ad by {ad['Advertiser']}") for ad in ads]
-    advertisers = [ad.get("Advertiser", "Unknown Advertiser") for ad in ads]
-    industry_infos = predict_industry(ad_texts, advertisers)
+    # Ads already classified in a previous run reuse their stored industry
+    industry_infos = [store.get_classification(ad) if store is not None and ad.seen_before else None for ad in ads]
+    pending = [i for i, info in enumerate(industry_infos) if info is None]
+    if len(pending) < len(ads):
+        log.info(f"🗃️ Reusing stored classification for {len(ads) - len(pending)} ad(s)")
+    if pending:
+        ad_texts = [ads[i].ad_text or f"Business consulting ad by {ads[i].advertiser}" for i in pending]
+        advertisers = [ads[i].advertiser or "Unknown Advertiser" for i in pending]
+        predictions = predict_industry(ad_texts, advertisers)
+        if len(predictions) != len(pending):
+            predictions = [None] * len(pending)
+        for i, info in zip(pending, predictions):
+            industry_infos[i] = info
+            if store is not None and info is not None and info["Confidence"] > 0:
+                store.save_classification(ads[i], info)
+    if any(info is None for info in industry_infos):
+        industry_infos = []
     
     if len(industry_infos) != len(ads):
-        print(f"⚠️ Mismatch in industry_infos ({len(industryInfos)}) and ads ({len(ads)}). Using default industry.")
+        log.warning(f"⚠️ Mismatch in industry_infos ({len(industry_infos)}) and ads ({len(ads)}). Using default industry.")
         industry_infos = [{"Industry": "Software Development", "Confidence": 0.0, "Note": "Manual review needed - Classification error"}] * len(ads)
     
-    for i, ad in enumerate(ads):
-        print(f"Processing ad {i+1}: Advertiser={ad.get('Advertiser', 'Unknown')}, Ad Text={ad.get('Ad Text', '...')[:50]}...")
-        if ad.get("Advertiser") == "Unknown Advertiser":
-            print(f"Skipping ad {i+1}: Invalid advertiser")
-            continue
-        
-        ad_key = (ad.get("Advertiser"), ad.get("Ad Text", "...")[:100])
-        if ad_key in seen_ads:
-            print(f"Skipping ad {i+1}: Duplicate ad")
-            continue
-        seen_ads.add(ad_key)
-        
-        industry_info = industry_infos[i]
-        industry = industry_info["Industry"]
-        
-        if industry in BENCHMARKS and industry != "Unclassified":
-            cpc = BENCHMARKS[industry]["CPC"]
-            ctr = BENCHMARKS[industry]["CTR"]
-            conv_rate = BENCHMARKS[industry]["ConvRate"]
-            aov = BENCHMARKS[industry]["AOV"]
-        else:
-            cpc = DEFAULT_CPC
-            ctr = DEFAULT_CTR
-            conv_rate = DEFAULT_CONVERSION_RATE
-            aov = DEFAULT_AOV
-            low_confidence_ads.append({
-                "Advertiser": ad.get("Advertiser"),
-                "Ad Text": ad.get("Ad Text", "..."),
-                "Confidence": industry_info["Confidence"],
-                "Note": industry_info["Note"]
-            })
-        
-        days_active = ad.get("Days Active", DEFAULT_ACTIVE_DAYS)
-        impressions = days_active * ad.get("Ad Variations", 1) * 223  # Rule-based estimation
-        clicks = impressions * ctr
-        spend = clicks * cpc
-        conversions = clicks * conv_rate
-        revenue = conversions * aov
-        roas = revenue / spend if spend > 0 else 0
-        
-        result = {
-            "Advertiser": ad.get("Advertiser"),
-            "Industry": industry,
-            "CPC": round(cpc, 2),
-            "CTR": round(ctr * 100, 2),
-            "Conversion Rate": round(conv_rate * 100, 2),
-            "Estimated Spend (INR)": round(spend, 2),
-            "Estimated Reach": round(impressions, 2),
-            "ROAS": round(roas, 2),
-            "Note": industry_info.get("Note", "")
-        }
-        results.append(result)
-        print(f"Added result for ad {i+1}: Industry={industry}, Spend=₹{spend:.2f}")
-    
-    if low_confidence_ads:
-        with open("low_confidence_ads.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=["Advertiser", "Ad Text", "Confidence", "Note"])
-            writer.writeheader()
-            writer.writerows(low_confidence_ads)
-        print(f"📁 Saved {len(low_confidence_ads)} low-confidence ads to low_confidence_ads.csv")
+    # Imported here because metrics_engine builds its benchmark table from this module
+    from metrics_engine import estimate_metrics_columnar
+    results = estimate_metrics_columnar(ads, industry_infos, low_confidence_file=low_confidence_file)
     
-    print(f"ℹ️ Total valid estimates: {len(results)}")
+    log.info(f"ℹ️ Total valid estimates: {len(results)}")
     return results
 
+def save_low_confidence_ads(rows, filename=LOW_CONFIDENCE_FILE):
+    """Save ads estimated with default benchmarks for manual review."""
+    with open(filename, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=["Advertiser", "Ad Text", "Confidence", "Note"])
+        writer.writeheader()
+        writer.writerows(rows)
+    log.info(f"📁 Saved {len(rows)} low-confidence ads to {filename}")
+
 def save_metrics_to_csv(data, filename):
     """Save enriched ad data to CSV."""
     if not data:
-        print("⚠️ No data to save.")
+        log.warning("⚠️ No data to save.")
         return
     fieldnames = ["Advertiser", "Industry", "CPC", "CTR", "Conversion Rate", 
                   "Estimated Spend (INR)", "Estimated Reach", "ROAS", "Note"]
@@ -177,9 +404,9 @@ def save_metrics_to_csv(data, filename):
             writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL)
             writer.writeheader()
             writer.writerows(data)
-        print(f"📁 Saved {len(data)} estimates to {filename}")
+        log.info(f"📁 Saved {len(data)} estimates to {filename}")
     except PermissionError as e:
-        print(f"⚠️ Permission denied when writing to {filename}: {e}")
+        log.warning(f"⚠️ Permission denied when writing to {filename}: {e}")
         temp_fd, temp_path = tempfile.mkstemp(suffix=".csv", text=True)
         try:
             with os.fdopen(temp_fd, "w", newline="", encoding="utf-8-sig") as temp_file:
@@ -187,9 +414,9 @@ def save_metrics_to_csv(data, filename):
                 writer.writeheader()
                 writer.writerows(data)
             shutil.move(temp_path, filename)
-            print(f"📁 Successfully saved to {filename} via temporary file")
+            log.info(f"📁 Successfully saved to {filename} via temporary file")
         except Exception as temp_error:
-            print(f"⚠️ Failed to save via temporary file: {temp_error}")
+            log.warning(f"⚠️ Failed to save via temporary file: {temp_error}")
         finally:
             if os.path.exists(temp_path):
                 try:
@@ -197,32 +424,53 @@ def save_metrics_to_csv(data, filename):
                 except:
                     pass
 
-def run_estimation(ads):
+def run_estimation(ads, output_file=OUTPUT_FILE, low_confidence_file=LOW_CONFIDENCE_FILE, store=None):
     """Main function to run estimation and save results."""
-    print(f"ℹ️ Running estimation for {len(ads)} ads")
-    metrics = estimate_metrics(ads)
-    print(f"ℹ️ Metrics calculated: {len(metrics)} entries")
-    save_metrics_to_csv(metrics, OUTPUT_FILE)
-    print("\n📊 Ad Metrics Estimates:")
+    log.info(f"ℹ️ Running estimation for {len(ads)} ads")
+    metrics = estimate_metrics(ads, low_confidence_file, store)
+    log.info(f"ℹ️ Metrics calculated: {len(metrics)} entries")
+    save_metrics_to_csv(metrics, output_file)
+    if text_cache is not None:
+        text_cache.report()
+    log.info("\n📊 Ad Metrics Estimates:")
     for i, metric in enumerate(metrics, 1):
         try:
-            print(f"Ad #{i}:")
-            print(f"  Advertiser: {metric['Advertiser']}")
-            print(f"  Industry: {metric['Industry']}")
-            print(f"  CPC: ₹{metric['CPC']:.2f}")
-            print(f"  CTR: {metric['CTR']:.2f}%")
-            print(f"  Conversion Rate: {metric['Conversion Rate']:.2f}%")
-            print(f"  Estimated Spend: ₹{metric['Estimated Spend (INR)']:.2f}")
-            print(f"  Estimated Reach: {metric['Estimated Reach']:.2f}")
-            print(f"  ROAS: {metric['ROAS']:.2f}x")
+            log.info(f"Ad #{i}:")
+            log.info(f"  Advertiser: {metric['Advertiser']}")
+            log.info(f"  Industry: {metric['Industry']}")
+            log.info(f"  CPC: ₹{metric['CPC']:.2f}")
+            log.info(f"  CTR: {metric['CTR']:.2f}%")
+            log.info(f"  Conversion Rate: {metric['Conversion Rate']:.2f}%")
+            log.info(f"  Estimated Spend: ₹{metric['Estimated Spend (INR)']:.2f}")
+            log.info(f"  Estimated Reach: {metric['Estimated Reach']:.2f}")
+            log.info(f"  ROAS: {metric['ROAS']:.2f}x")
             if metric["Note"]:
-                print(f"  Note: {metric['Note']}")
-            print()
+                log.info(f"  Note: {metric['Note']}")
+            log.info("")
         except KeyError as e:
-            print(f"⚠️ Error displaying metric for Ad #{i}: Missing key {e}")
+            log.warning(f"⚠️ Error displaying metric for Ad #{i}: Missing key {e}")
     return metrics
 
 if __name__ == "__main__":
-    from scrape import scrape_ads
-    ads = scrape_ads("Fermented durian", "ALL")
-    run_estimation(ads)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Estimate ad metrics for a keyword.")
+    parser.add_argument("--keyword", default="Fermented durian")
+    parser.add_argument("--country", default="ALL")
+    parser.add_argument("--from-dataset", action="store_true",
+                        help="Re-estimate the latest Parquet run for the keyword instead of scraping again")
+    parser.add_argument("--log-level", default=None, help="DEBUG, INFO or WARNING (default from run_metrics.LOG_LEVEL)")
+    parser.add_argument("--report", default=None, help="Write a JSON run report with stage timings to this file")
+    args = parser.parse_args()
+
+    if args.log_level:
+        set_log_level(args.log_level.upper())
+    run_metrics.set_info(keyword=args.keyword, country=args.country)
+
+    if args.from_dataset:
+        from columnar_output import load_ads_for_estimation, latest_run_id, ADS_TABLE
+        ads = load_ads_for_estimation(args.keyword, args.country, latest_run_id(ADS_TABLE, args.keyword, args.country))
+    else:
+        from scrape import scrape_ads
+        ads = scrape_ads(args.keyword, args.country)
+    run_estimation(ads)
+    if args.report:
+        run_metrics.save(args.report)
\ No newline at end of file
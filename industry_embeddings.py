@@ -0,0 +1,92 @@
+import hashlib
+import os
+import numpy as np
+from run_metrics import get_logger
+
+log = get_logger("industry_embeddings")
+
+# SETTINGS
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_RUNTIME = "torch"  # "torch", "quantized" (dynamic int8 on CPU) or "onnx" (needs optimum[onnxruntime])
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_MAX_LENGTH = 256
+EMBEDDING_TEMPERATURE = 0.05  # Softmax temperature turning cosine similarities into label scores
+LABEL_TEMPLATE = "This ad is about {}."
+LABEL_CACHE_DIR = "model_cache"
+
+class EmbeddingClassifier:
+    """Industry classifier that embeds each text once and compares it with cached label embeddings.
+
+    Called like the zero-shot pipeline and returns the same {"labels", "scores"} results, with labels
+    sorted by score, so predict_industry can use either backend.
+    """
+
+    def __init__(self, labels, model_name=EMBEDDING_MODEL, runtime=EMBEDDING_RUNTIME,
+                 batch_size=EMBEDDING_BATCH_SIZE, cache_dir=LABEL_CACHE_DIR):
+        import torch
+        from transformers import AutoTokenizer, AutoModel
+        self.torch = torch
+        self.model_name = model_name
+        self.runtime = runtime
+        self.batch_size = batch_size
+        self.cache_dir = cache_dir
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if runtime == "onnx":
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            self.model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        else:
+            self.model = AutoModel.from_pretrained(model_name)
+            self.model.eval()
+            if runtime == "quantized":
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.labels = list(labels)
+        self.label_vectors = self.load_label_vectors(self.labels)
+
+    def embed(self, texts):
+        """Return L2-normalized mean-pooled embeddings for texts, computed in batches."""
+        vectors = []
+        with self.torch.inference_mode():
+            for start in range(0, len(texts), self.batch_size):
+                batch = self.tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                                       max_length=EMBEDDING_MAX_LENGTH, return_tensors="pt")
+                hidden = self.model(**batch).last_hidden_state
+                mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                vectors.append(self.torch.nn.functional.normalize(pooled, dim=-1).cpu().numpy())
+        return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def load_label_vectors(self, labels):
+        """Return label embeddings, computing them once per model/runtime/label set and caching them on disk.
+
+        The runtime is part of the key because quantized and ONNX models embed slightly differently.
+        """
+        key_parts = [self.model_name, self.runtime, str(EMBEDDING_MAX_LENGTH), LABEL_TEMPLATE] + list(labels)
+        key = hashlib.sha1("\x1f".join(key_parts).encode("utf-8")).hexdigest()[:16]
+        path = os.path.join(self.cache_dir, f"label_vectors_{key}.npy")
+        if os.path.exists(path):
+            return np.load(path)
+        vectors = self.embed([LABEL_TEMPLATE.format(label) for label in labels])
+        os.makedirs(self.cache_dir, exist_ok=True)
+        np.save(path, vectors)
+        log.info(f"💾 Cached {len(labels)} label embeddings to {path}")
+        return vectors
+
+    def __call__(self, texts, candidate_labels=None, multi_label=False):
+        if isinstance(texts, str):
+            texts = [texts]
+        labels = self.labels
+        label_vectors = self.label_vectors
+        if candidate_labels is not None and list(candidate_labels) != self.labels:
+            labels = list(candidate_labels)
+            label_vectors = self.load_label_vectors(labels)
+        logits = self.embed(list(texts)) @ label_vectors.T / EMBEDDING_TEMPERATURE
+        if multi_label:
+            scores = 1 / (1 + np.exp(-logits))
+        else:
+            scores = np.exp(logits - logits.max(axis=1, keepdims=True))
+            scores /= scores.sum(axis=1, keepdims=True)
+        results = []
+        for text, row in zip(texts, scores):
+            order = np.argsort(-row)
+            results.append({"sequence": text, "labels": [labels[i] for i in order], "scores": [float(row[i]) for i in order]})
+        return results
@@ -0,0 +1,249 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from browser_pool import load_jobs
+from scrape import scrape_ads, save_to_csv, show_top_5_ads, EXTRACTION_MODE
+from estimate_metrics import run_estimation
+from run_metrics import get_logger
+
+log = get_logger("job_runner")
+
+# SETTINGS
+STATE_DIR = "crawl_state"
+QUEUE_DB = "jobs.db"
+NUM_WORKERS = 2
+MAX_ATTEMPTS = 3
+LEASE_SECONDS = 120  # A running job whose lease is not renewed within this time is assumed crashed and requeued
+HEARTBEAT_SECONDS = 30  # How often a worker renews the lease of the job it is running
+IDLE_POLL_SECONDS = 15  # How often an idle worker checks for expired leases while other workers still run jobs
+MERGED_OUTPUT_FILE = "crawl_ads_merged.csv"
+
+def connect(state_dir):
+    """Open the shared SQLite job queue, creating it if needed."""
+    os.makedirs(state_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(state_dir, QUEUE_DB), timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT NOT NULL,
+            country TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            claimed_at REAL,
+            finished_at REAL,
+            ads INTEGER,
+            error TEXT,
+            UNIQUE (keyword, country)
+        )
+    """)
+    return conn
+
+def enqueue_jobs(conn, jobs):
+    """Add (keyword, country) jobs to the queue; jobs already queued or finished are left alone."""
+    before = conn.total_changes
+    conn.executemany("INSERT OR IGNORE INTO jobs (keyword, country) VALUES (?, ?)", jobs)
+    added = conn.total_changes - before
+    log.info(f"📋 Queued {added} new job(s) ({len(jobs) - added} already known).")
+    return added
+
+def is_local_worker_dead(worker):
+    """Check whether a worker ID ("host:pid") belongs to a process on this host that no longer exists."""
+    host, _, pid = (worker or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # Exists but owned by another user
+    return False
+
+def requeue_stale_jobs(conn, lease_seconds=LEASE_SECONDS):
+    """Requeue running jobs whose lease has expired or whose worker process on this host is gone.
+
+    Jobs out of attempts are failed instead.
+    """
+    cutoff = time.time() - lease_seconds
+    conn.execute("BEGIN IMMEDIATE")
+    running = conn.execute("SELECT id, worker, claimed_at, attempts FROM jobs WHERE status = 'running'").fetchall()
+    stale = [(job_id, attempts) for job_id, worker, claimed_at, attempts in running
+             if (claimed_at or 0) < cutoff or is_local_worker_dead(worker)]
+    conn.executemany("UPDATE jobs SET status = 'failed', worker = NULL, error = 'Lease expired too many times' WHERE id = ?",
+                     [(job_id,) for job_id, attempts in stale if attempts >= MAX_ATTEMPTS])
+    conn.executemany("UPDATE jobs SET status = 'pending', worker = NULL WHERE id = ?",
+                     [(job_id,) for job_id, attempts in stale if attempts < MAX_ATTEMPTS])
+    conn.execute("COMMIT")
+    if stale:
+        log.info(f"♻️ Requeued {len(stale)} job(s) from crashed workers.")
+    return len(stale)
+
+def renew_lease(state_dir, job_id, worker, stop, interval=HEARTBEAT_SECONDS):
+    """Refresh a running job's lease every interval seconds until stop is set."""
+    conn = connect(state_dir)
+    try:
+        while not stop.wait(interval):
+            conn.execute("UPDATE jobs SET claimed_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                         (time.time(), job_id, worker))
+    finally:
+        conn.close()
+
+def claim_job(conn, worker):
+    """Atomically claim the next pending job for this worker."""
+    conn.execute("BEGIN IMMEDIATE")
+    row = conn.execute("SELECT id, keyword, country FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+    if row is None:
+        conn.execute("COMMIT")
+        return None
+    conn.execute("UPDATE jobs SET status = 'running', worker = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                 (worker, time.time(), row[0]))
+    conn.execute("COMMIT")
+    return row
+
+def finish_job(conn, job_id, worker, ads_count):
+    """Checkpoint a job as done; False if the worker's lease was lost and another worker now owns the job."""
+    updated = conn.execute("UPDATE jobs SET status = 'done', finished_at = ?, ads = ?, error = NULL "
+                           "WHERE id = ? AND worker = ? AND status = 'running'",
+                           (time.time(), ads_count, job_id, worker)).rowcount
+    if not updated:
+        log.warning(f"⚠️ [{worker}] Lost the lease on job #{job_id}; not checkpointing it.")
+    return bool(updated)
+
+def fail_job(conn, job_id, worker, error):
+    """Return a failed job to the queue, or mark it failed once it is out of attempts.
+
+    False if the worker's lease was lost and another worker now owns the job.
+    """
+    updated = conn.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                           "worker = NULL, error = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                           (MAX_ATTEMPTS, str(error)[:500], job_id, worker)).rowcount
+    if not updated:
+        log.warning(f"⚠️ [{worker}] Lost the lease on job #{job_id}; leaving it to its current owner.")
+    return bool(updated)
+
+def job_dir(state_dir, job_id):
+    """Return the output directory of one job."""
+    return os.path.join(state_dir, "jobs", f"{job_id:06d}")
+
+def run_job(state_dir, job_id, keyword, country, extraction_mode=EXTRACTION_MODE):
+    """Scrape and estimate one job, writing its outputs into the job's own directory."""
+    output_dir = job_dir(state_dir, job_id)
+    os.makedirs(output_dir, exist_ok=True)
+    ads = scrape_ads(keyword, country, extraction_mode, debug_log=os.path.join(output_dir, "scrape_errors.csv"))
+    # Write to a temporary name first so a crash never leaves a half-written checkpoint behind
+    ads_file = os.path.join(output_dir, "meta_ads_ranked.csv")
+    save_to_csv(ads, ads_file + ".tmp")
+    if os.path.exists(ads_file + ".tmp"):
+        os.replace(ads_file + ".tmp", ads_file)
+    top_ads = show_top_5_ads(ads, os.path.join(output_dir, "ad_media"))
+    run_estimation(top_ads, os.path.join(output_dir, "ad_metrics_estimates.csv"),
+                   os.path.join(output_dir, "low_confidence_ads.csv"))
+    return len(ads)
+
+def count_running(conn):
+    """Return the number of jobs currently held by a worker."""
+    return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+
+def worker_loop(state_dir, extraction_mode=EXTRACTION_MODE, poll_interval=IDLE_POLL_SECONDS):
+    """Claim and run jobs until no job is pending or running.
+
+    While other workers still hold jobs, an idle worker keeps reclaiming expired leases, so jobs of a node that
+    crashes mid-crawl are picked up without re-running the command.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect(state_dir)
+    while True:
+        job = claim_job(conn, worker)
+        if job is None:
+            if requeue_stale_jobs(conn):
+                continue
+            if not count_running(conn):
+                break
+            time.sleep(poll_interval)
+            continue
+        job_id, keyword, country = job
+        log.info(f"🚚 [{worker}] Running job #{job_id}: ({keyword}, {country})")
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=renew_lease, args=(state_dir, job_id, worker, stop_heartbeat),
+                                     name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            ads_count = run_job(state_dir, job_id, keyword, country, extraction_mode)
+        except Exception as e:
+            log.warning(f"⚠️ [{worker}] Job #{job_id} failed: {e}")
+            fail_job(conn, job_id, worker, e)
+            continue
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+        if finish_job(conn, job_id, worker, ads_count):
+            log.info(f"✅ [{worker}] Job #{job_id} checkpointed with {ads_count} ad(s).")
+    conn.close()
+
+def print_status(conn):
+    """Log job counts per status."""
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+    log.info("📊 Jobs: " + ", ".join(f"{status}={counts.get(status, 0)}" for status in ("pending", "running", "done", "failed")))
+    return counts
+
+def merge_outputs(conn, state_dir, filename):
+    """Merge the ranked ads of every finished job into one CSV deduplicated on (page ID, ad text, ad link)."""
+    rows = []
+    seen_ads = set()
+    for job_id, keyword, country in conn.execute("SELECT id, keyword, country FROM jobs WHERE status = 'done' ORDER BY id"):
+        ads_file = os.path.join(job_dir(state_dir, job_id), "meta_ads_ranked.csv")
+        if not os.path.exists(ads_file):
+            continue
+        with open(ads_file, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                ad_key = (row["Page ID"], row["Ad Text"].strip().lower(), row["Ad Link"])
+                if ad_key in seen_ads:
+                    continue
+                seen_ads.add(ad_key)
+                row["Keyword"] = keyword
+                row["Country"] = country
+                rows.append(row)
+    save_to_csv(rows, filename)
+    return rows
+
+def run_crawl(jobs_file=None, state_dir=STATE_DIR, num_workers=NUM_WORKERS, extraction_mode=EXTRACTION_MODE):
+    """Queue jobs, requeue crashed ones and run local workers until the queue is drained."""
+    conn = connect(state_dir)
+    if jobs_file:
+        enqueue_jobs(conn, load_jobs(jobs_file))
+    requeue_stale_jobs(conn)
+    print_status(conn)
+    workers = [multiprocessing.Process(target=worker_loop, args=(state_dir, extraction_mode)) for _ in range(num_workers)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    counts = print_status(conn)
+    conn.close()
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumable crawl over a queue of keyword/country jobs. "
+                                                 "Re-running the same command resumes where a crashed crawl stopped; "
+                                                 "nodes sharing --state-dir share the queue.")
+    parser.add_argument("jobs_file", nargs="?", help="CSV file with keyword and country columns to add to the queue")
+    parser.add_argument("--state-dir", default=STATE_DIR, help="Directory holding the job queue and checkpoints")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Worker processes on this node")
+    parser.add_argument("--mode", default=EXTRACTION_MODE, choices=["js", "html", "xpath", "network"], help="Extraction mode")
+    parser.add_argument("--status", action="store_true", help="Only print queue status")
+    parser.add_argument("--merge", nargs="?", const=MERGED_OUTPUT_FILE, help="Merge finished job outputs into one CSV")
+    args = parser.parse_args()
+
+    if args.status:
+        print_status(connect(args.state_dir))
+    else:
+        run_crawl(args.jobs_file, args.state_dir, args.workers, args.mode)
+    if args.merge:
+        merge_outputs(connect(args.state_dir), args.state_dir, args.merge)
@@ -0,0 +1,272 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+import requests
+from rate_limiter import RetryableError, parse_retry_after, current_attempt
+from run_metrics import get_logger
+
+log = get_logger("media_cache")
+
+# SETTINGS
+MEDIA_CACHE_DIR = "media_cache"
+MEDIA_CACHE_MAX_BYTES = 2 * 1024 ** 3  # Least recently used creatives are evicted above this size
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+LINK_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP}  # Hard links unsupported here, not a missing object
+PARTIAL_LOCK_SECONDS = 600  # A partial download locked for longer than this is assumed abandoned by a crashed process
+
+class RetryableDownloadError(RetryableError):
+    """A download failure worth retrying (throttling, server errors, dropped connections)."""
+
+def report_time_to_first_byte(response):
+    """Feed a response's time to first byte to the rate limiter instead of the full transfer time.
+
+    Videos and thumbnails share one CDN host, so whole-body download times would read as congestion.
+    """
+    attempt = current_attempt()
+    if attempt is not None:
+        attempt.latency = response.elapsed.total_seconds()
+
+class MediaCache:
+    """Content-addressed media store shared across runs.
+
+    Objects live under objects/<sha256[:2]>/<sha256> and an SQLite index maps each URL to its content hash
+    and HTTP validators. Identical creatives behind different URLs are stored once, re-fetches are
+    conditional (ETag/Last-Modified), interrupted downloads resume with Range requests, and the store is
+    trimmed to max_bytes by evicting the least recently used objects. Concurrent fetches of one URL share a
+    single download; a URL another process is downloading is fetched into a private temp file instead.
+    """
+
+    def __init__(self, root=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "partial"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.conn = sqlite3.connect(os.path.join(root, "index.db"), timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, size INTEGER, "
+                          "content_type TEXT, last_access REAL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT, etag TEXT, "
+                          "last_modified TEXT, fetched_at REAL)")
+        self.conn.commit()
+
+    def object_path(self, digest):
+        """Return the path of a stored object."""
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def lookup(self, url):
+        """Return (hash, etag, last_modified, content_type) for a cached URL whose object still exists, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT u.hash, u.etag, u.last_modified, o.content_type FROM urls u "
+                                    "JOIN objects o ON o.hash = u.hash WHERE u.url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(self.object_path(row[0])):
+            return None
+        return row
+
+    def _touch(self, digest):
+        with self._lock:
+            self.conn.execute("UPDATE objects SET last_access = ? WHERE hash = ?", (time.time(), digest))
+            self.conn.commit()
+
+    def fetch(self, session, url, timeout=10):
+        """Return (object path, content type, bytes downloaded) for a URL, downloading only what is missing.
+
+        Callers arriving while the same URL is already being fetched wait for that download and get its
+        result with 0 bytes downloaded (or its exception).
+        """
+        with self._lock:
+            future = self._in_flight.get(url)
+            leader = future is None
+            if leader:
+                future = self._in_flight[url] = Future()
+        if not leader:
+            attempt = current_attempt()
+            if attempt is not None:
+                attempt.outcome = None  # Waited on another caller's request, so says nothing about the host
+            object_path, content_type, _ = future.result()
+            return object_path, content_type, 0
+        try:
+            result = self._fetch(session, url, timeout)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[url]
+
+    def _claim_partial(self, lock_path):
+        """Take the cross-process lock on a URL's resumable partial file; False if another process holds it."""
+        for _ in range(2):
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) < PARTIAL_LOCK_SECONDS:
+                        return False
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def _fetch(self, session, url, timeout):
+        url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        part_path = os.path.join(self.root, "partial", url_hash + ".part")
+        lock_path = part_path + ".lock"
+        if self._claim_partial(lock_path):
+            try:
+                return self._download(session, url, timeout, part_path, resumable=True)
+            finally:
+                os.remove(lock_path)
+        # Another process owns the resumable file, so download into a private one that is never resumed
+        private_path = os.path.join(self.root, "partial", f"{url_hash}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            return self._download(session, url, timeout, private_path, resumable=False)
+        finally:
+            for path in (private_path, private_path + ".json"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _download(self, session, url, timeout, part_path, resumable):
+        cached = self.lookup(url)
+        meta_path = part_path + ".json"
+        headers = {}
+        offset = 0
+        part_meta = {}
+        if cached is not None:
+            if cached[1]:
+                headers["If-None-Match"] = cached[1]
+            if cached[2]:
+                headers["If-Modified-Since"] = cached[2]
+        elif resumable and os.path.exists(part_path) and os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                part_meta = json.load(f)
+            offset = os.path.getsize(part_path)
+            if offset and (part_meta.get("etag") or part_meta.get("last_modified")):
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = part_meta.get("etag") or part_meta.get("last_modified")
+            else:
+                offset = 0
+
+        try:
+            response = session.get(url, headers=headers, stream=True, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableDownloadError(str(e))
+        report_time_to_first_byte(response)
+        with response:
+            if response.status_code == 304 and cached is not None:
+                self._touch(cached[0])
+                log.debug(f"♻️ Media unchanged, using cache: {url[:80]}")
+                return self.object_path(cached[0]), cached[3], 0
+            if response.status_code in RETRY_STATUS_CODES:
+                raise RetryableDownloadError(f"Status code {response.status_code}", response.status_code,
+                                             parse_retry_after(response.headers.get("Retry-After")))
+            if response.status_code not in (200, 206):
+                raise ValueError(f"Status code {response.status_code}")
+
+            resuming = response.status_code == 206 and offset > 0
+            etag = response.headers.get("ETag") or part_meta.get("etag")
+            last_modified = response.headers.get("Last-Modified") or part_meta.get("last_modified")
+            content_type = response.headers.get("Content-Type") or part_meta.get("content_type") or "application/octet-stream"
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"etag": etag, "last_modified": last_modified, "content_type": content_type}, f)
+
+            hasher = hashlib.sha256()
+            if resuming:
+                with open(part_path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        hasher.update(block)
+                log.debug(f"⏯️ Resuming download at {offset} bytes: {url[:80]}")
+            downloaded = 0
+            try:
+                with open(part_path, "ab" if resuming else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        if chunk:
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            downloaded += len(chunk)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise RetryableDownloadError(f"Interrupted after {downloaded} bytes, will resume: {e}")
+
+        digest = hasher.hexdigest()
+        object_path = self.object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        if os.path.exists(object_path):
+            os.remove(part_path)  # Same creative already stored under another URL
+        else:
+            os.replace(part_path, object_path)
+        os.remove(meta_path)
+        now = time.time()
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO objects (hash, size, content_type, last_access) VALUES (?, ?, ?, ?)",
+                              (digest, os.path.getsize(object_path), content_type, now))
+            self.conn.execute("INSERT OR REPLACE INTO urls (url, hash, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                              (url, digest, etag, last_modified, now))
+            self.conn.commit()
+        self.evict()
+        return object_path, content_type, downloaded
+
+    def evict(self):
+        """Delete least recently used objects until the store fits in max_bytes."""
+        with self._lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            evicted = 0
+            for digest, size in self.conn.execute("SELECT hash, size FROM objects ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self.object_path(digest))
+                except FileNotFoundError:
+                    pass
+                self.conn.execute("DELETE FROM objects WHERE hash = ?", (digest,))
+                self.conn.execute("DELETE FROM urls WHERE hash = ?", (digest,))
+                total -= size
+                evicted += 1
+            self.conn.commit()
+        log.info(f"🧹 Evicted {evicted} cached creative(s) to stay under {self.max_bytes / 1e6:.0f} MB.")
+        return evicted
+
+def link_into(object_path, folder, filename_base, ext):
+    """Expose a cached object under a per-ad filename (hard link, falling back to symlink or copy).
+
+    Raises FileNotFoundError if the object was evicted since it was fetched, so the caller can fetch it again.
+    """
+    os.makedirs(folder, exist_ok=True)
+    filename_base = "".join(c for c in filename_base if c.isalnum() or c in (' ', '_', '-')).strip().replace(' ', '_')
+    filepath = os.path.join(folder, f"{filename_base}.{ext}")
+    counter = 1
+    while True:
+        try:
+            os.link(object_path, filepath)
+            return filepath
+        except FileExistsError:
+            pass
+        except OSError as e:
+            if e.errno not in LINK_FALLBACK_ERRNOS:
+                raise
+            try:
+                os.symlink(os.path.abspath(object_path), filepath)
+                return filepath
+            except FileExistsError:
+                pass
+            except OSError:
+                try:
+                    with open(object_path, "rb") as src, open(filepath, "xb") as dst:
+                        shutil.copyfileobj(src, dst)
+                    return filepath
+                except FileExistsError:
+                    pass
+        filepath = os.path.join(folder, f"{filename_base}_{counter}.{ext}")
+        counter += 1
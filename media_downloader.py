@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from media_cache import MediaCache, RetryableDownloadError, RETRY_STATUS_CODES, link_into, report_time_to_first_byte
+from rate_limiter import get_scheduler, parse_retry_after, JobBudget
+from run_metrics import get_logger, metrics
+
+log = get_logger("media_downloader")
+
+# SETTINGS
+MAX_DOWNLOAD_WORKERS = 16  # Upper bound across hosts; each CDN host's share is tuned by rate_limiter.py
+DOWNLOAD_RETRIES = 3
+AD_RETRY_BUDGET = 8  # Retries shared by all creatives of one ad
+DOWNLOAD_TIMEOUT = 10
+USE_MEDIA_CACHE = True  # Store creatives once in the content-addressed media cache and link them per ad
+
+def get_extension_from_content_type(content_type):
+    """Map content type to file extension."""
+    mime_to_ext = {
+        "image/jpeg": "jpg",
+        "image/png": "png",
+        "image/gif": "gif",
+        "video/mp4": "mp4",
+        "video/webm": "webm",
+        "video/ogg": "ogv",
+        "application/octet-stream": "bin"
+    }
+    content_type = content_type.lower()
+    for mime, ext in mime_to_ext.items():
+        if mime in content_type:
+            return ext
+    log.warning(f"⚠️ Unknown Content-Type '{content_type}'. Defaulting to 'bin'.")
+    return "bin"
+
+def open_unique_file(folder, filename_base, ext):
+    """Create and open a new file named after filename_base, adding _1, _2 suffixes on collisions."""
+    filename_base = "".join(c for c in filename_base if c.isalnum() or c in (' ', '_', '-')).strip().replace(' ', '_')
+    filepath = os.path.join(folder, f"{filename_base}.{ext}")
+    counter = 1
+    while True:
+        try:
+            return filepath, open(filepath, 'xb')
+        except FileExistsError:
+            filepath = os.path.join(folder, f"{filename_base}_{counter}.{ext}")
+            counter += 1
+
+def fetch_media(session, url, folder, filename_base):
+    """Download one media file with a session and return (filepath, bytes written)."""
+    os.makedirs(folder, exist_ok=True)
+    try:
+        response = session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise RetryableDownloadError(str(e))
+    report_time_to_first_byte(response)
+    with response:
+        if response.status_code in RETRY_STATUS_CODES:
+            raise RetryableDownloadError(f"Status code {response.status_code}", response.status_code,
+                                         parse_retry_after(response.headers.get("Retry-After")))
+        if response.status_code != 200:
+            raise ValueError(f"Status code {response.status_code}")
+        content_type = response.headers.get("Content-Type", "application/octet-stream")
+        filepath, f = open_unique_file(folder, filename_base, get_extension_from_content_type(content_type))
+        size = 0
+        try:
+            with f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    if chunk:
+                        f.write(chunk)
+                        size += len(chunk)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            os.remove(filepath)
+            raise RetryableDownloadError(str(e))
+    log.debug(f"📥 Saved media: {filepath} (Content-Type: {content_type})")
+    return filepath, size
+
+def download_media(url, folder, filename_base, media_type="image", session=None):
+    """Download media (image/video) and save to folder, retrying under the shared per-host rate limits."""
+    try:
+        return get_scheduler().call(url, lambda: fetch_media(session or requests, url, folder, filename_base),
+                                    DOWNLOAD_RETRIES, label=url)[0]
+    except Exception as e:
+        log.warning(f"⚠️ Error downloading media from {url}: {e}")
+        return False
+
+class MediaDownloader:
+    """Run-wide media download queue with a pooled session, adaptive per-host limits, retries and throughput stats."""
+
+    def __init__(self, max_workers=MAX_DOWNLOAD_WORKERS, retries=DOWNLOAD_RETRIES, use_cache=USE_MEDIA_CACHE,
+                 cache=None, scheduler=None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="media")
+        self.retries = retries
+        self.cache = cache if cache is not None else (MediaCache() if use_cache else None)
+        self.scheduler = scheduler or get_scheduler()
+        self._lock = threading.Lock()
+        self._futures = []
+        self.started = None
+        self.bytes = 0
+        self.failures = 0
+        self.latencies = []
+
+    def _download(self, url, folder, filename_base, budget=None):
+        """Download one file under the scheduler's adaptive limit for its host, retrying with jittered backoff."""
+        def fetch():
+            start = time.perf_counter()
+            if self.cache is None:
+                filepath, size = fetch_media(self.session, url, folder, filename_base)
+            else:
+                object_path, content_type, size = self.cache.fetch(self.session, url, DOWNLOAD_TIMEOUT)
+                try:
+                    filepath = link_into(object_path, folder, filename_base, get_extension_from_content_type(content_type))
+                except FileNotFoundError:
+                    # Evicted by another download before it could be linked; fetching again restores it
+                    object_path, content_type, refetched = self.cache.fetch(self.session, url, DOWNLOAD_TIMEOUT)
+                    filepath = link_into(object_path, folder, filename_base, get_extension_from_content_type(content_type))
+                    size += refetched
+                log.debug(f"📥 Saved media: {filepath} (Content-Type: {content_type})")
+            return filepath, size, time.perf_counter() - start
+
+        try:
+            filepath, size, latency = self.scheduler.call(url, fetch, self.retries, budget, label=url)
+        except RetryableDownloadError as e:
+            log.warning(f"⚠️ Giving up on {url}: {e}")
+        except Exception as e:
+            log.warning(f"⚠️ Error downloading media from {url}: {e}")
+        else:
+            with self._lock:
+                self.bytes += size
+                self.latencies.append(latency)
+            metrics.add_time("download", latency)
+            metrics.count("http_bytes_media", size)
+            return filepath
+        with self._lock:
+            self.failures += 1
+        metrics.count("download_failures")
+        return None
+
+    def submit(self, url, folder, filename_base, budget=None):
+        """Queue one media download and return its future (resolving to the saved path or None)."""
+        with self._lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+            future = self.executor.submit(self._download, url, folder, filename_base, budget)
+            self._futures.append(future)
+        return future
+
+    def download_ad(self, ad, ad_index, folder, on_done=None):
+        """Queue every image and video of an ad; on_done(paths) runs once all of them finish."""
+        jobs = [(url, f"ad_{ad_index}_{ad['Advertiser']}_image_{j}") for j, url in enumerate(ad["Image URLs"], 1)]
+        jobs += [(url, f"ad_{ad_index}_{ad['Advertiser']}_video_{j}") for j, url in enumerate(ad["Video URLs"], 1)]
+        budget = JobBudget(AD_RETRY_BUDGET)
+        futures = [self.submit(url, folder, filename_base, budget) for url, filename_base in jobs]
+        if on_done is not None and futures:
+            remaining = len(futures)
+            lock = threading.Lock()
+
+            def finished(_):
+                nonlocal remaining
+                with lock:
+                    remaining -= 1
+                    last = remaining == 0
+                if last:
+                    on_done([path for path in (future.result() for future in futures) if path])
+            for future in futures:
+                future.add_done_callback(finished)
+        return futures
+
+    def report(self):
+        """Log throughput and per-file latency for the downloads so far."""
+        elapsed = time.perf_counter() - self.started if self.started is not None else 0
+        latencies = sorted(self.latencies)
+        if not latencies:
+            log.info(f"📦 Media downloads: 0 file(s), {self.failures} failure(s)")
+            return
+        rate = self.bytes / elapsed if elapsed > 0 else 0
+        log.info(f"📦 Media downloads: {len(latencies)} file(s), {self.failures} failure(s), "
+                 f"{self.bytes / 1e6:.2f} MB in {elapsed:.1f}s ({rate / 1e6:.2f} MB/s)")
+        log.info(f"   Latency per file: avg {sum(latencies) / len(latencies):.2f}s, "
+                 f"p50 {latencies[len(latencies) // 2]:.2f}s, p95 {latencies[int(len(latencies) * 0.95)]:.2f}s, "
+                 f"max {latencies[-1]:.2f}s")
+
+    def close(self):
+        """Wait for queued downloads, release connections and log the report."""
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        self.report()
+
+default_downloader = None
+default_downloader_lock = threading.Lock()
+
+def get_default_downloader():
+    """Return the process-wide downloader shared by synchronous callers."""
+    global default_downloader
+    with default_downloader_lock:
+        if default_downloader is None:
+            default_downloader = MediaDownloader()
+        return default_downloader
@@ -0,0 +1,181 @@
+import argparse
+import copy
+import csv
+import json
+import sqlite3
+import numpy as np
+from estimate_metrics import (BENCHMARKS, DEFAULT_CPC, DEFAULT_CTR, DEFAULT_CONVERSION_RATE, DEFAULT_AOV,
+                              DEFAULT_ACTIVE_DAYS, IMPRESSIONS_PER_VARIATION_DAY, save_low_confidence_ads)
+from ad_store import AD_STORE_DB
+from run_metrics import get_logger
+
+log = get_logger("metrics_engine")
+
+# SETTINGS
+SWEEP_OUTPUT_FILE = "metrics_sweep.csv"
+METRIC_ROWS = ("CPC", "CTR", "ConvRate", "AOV")
+
+def benchmark_table(benchmarks=BENCHMARKS):
+    """Return (industry -> code, 4 x (K + 1) array of CPC/CTR/ConvRate/AOV); the last column holds the defaults."""
+    industries = [industry for industry in benchmarks if industry != "Unclassified"]
+    codes = {industry: code for code, industry in enumerate(industries)}
+    table = np.empty((len(METRIC_ROWS), len(industries) + 1), dtype=np.float64)
+    for code, industry in enumerate(industries):
+        table[:, code] = [benchmarks[industry][metric] for metric in METRIC_ROWS]
+    table[:, -1] = [DEFAULT_CPC, DEFAULT_CTR, DEFAULT_CONVERSION_RATE, DEFAULT_AOV]
+    return codes, table
+
+def encode_industries(industries, codes):
+    """Map industry names to benchmark codes; unknown industries map to the default column."""
+    default_code = len(codes)
+    return np.fromiter((codes.get(industry, default_code) for industry in industries), dtype=np.intp, count=len(industries))
+
+def compute_metrics(days_active, variations, industry_codes, tables, impression_multipliers=IMPRESSIONS_PER_VARIATION_DAY):
+    """Compute every metric for all ads in one vectorized pass.
+
+    tables is one benchmark table (4, K + 1) or a stack of scenario tables (S, 4, K + 1), with a matching
+    scalar or (S,) array of impression multipliers. Results have shape (N,) or (S, N). The operation order
+    matches estimate_metrics, so values are bit-for-bit identical.
+    """
+    tables = np.asarray(tables, dtype=np.float64)
+    per_ad = tables[..., industry_codes]
+    cpc, ctr, conv_rate, aov = (per_ad[..., i, :] for i in range(len(METRIC_ROWS)))
+    multipliers = np.asarray(impression_multipliers, dtype=np.float64)
+    if multipliers.ndim:
+        multipliers = multipliers[:, None]
+    impressions = np.asarray(days_active, dtype=np.float64) * np.asarray(variations, dtype=np.float64) * multipliers
+    clicks = impressions * ctr
+    spend = clicks * cpc
+    conversions = clicks * conv_rate
+    revenue = conversions * aov
+    roas = np.divide(revenue, spend, out=np.zeros_like(revenue), where=spend > 0)
+    return {"CPC": cpc, "CTR": ctr, "ConvRate": conv_rate, "Impressions": impressions, "Clicks": clicks,
+            "Spend": spend, "Conversions": conversions, "Revenue": revenue, "ROAS": roas}
+
+def metrics_to_rows(advertisers, industries, notes, metrics, integer_reach=None):
+    """Format vectorized metrics as estimate_metrics result dicts (rounding with Python's round, as it does)."""
+    columns = {key: values.tolist() for key, values in metrics.items()}
+    rows = []
+    for i, advertiser in enumerate(advertisers):
+        impressions = columns["Impressions"][i]
+        if integer_reach is not None and integer_reach[i]:
+            impressions = int(impressions)  # estimate_metrics keeps int reach when days and variations are ints
+        rows.append({
+            "Advertiser": advertiser,
+            "Industry": industries[i],
+            "CPC": round(columns["CPC"][i], 2),
+            "CTR": round(columns["CTR"][i] * 100, 2),
+            "Conversion Rate": round(columns["ConvRate"][i] * 100, 2),
+            "Estimated Spend (INR)": round(columns["Spend"][i], 2),
+            "Estimated Reach": round(impressions, 2),
+            "ROAS": round(columns["ROAS"][i], 2),
+            "Note": notes[i]
+        })
+    return rows
+
+def estimate_metrics_columnar(ads, industry_infos, benchmarks=BENCHMARKS, low_confidence_file=None):
+    """Estimate metrics for already classified ads in one vectorised pass.
+
+    Ads whose industry has no benchmarks use the defaults and, given low_confidence_file, are saved there for review.
+    """
+    kept = []
+    seen_ads = set()
+    for ad, info in zip(ads, industry_infos):
+        if ad.get("Advertiser") == "Unknown Advertiser":
+            continue
+        ad_key = (ad.get("Advertiser"), ad.get("Ad Text", "...")[:100])
+        if ad_key in seen_ads:
+            continue
+        seen_ads.add(ad_key)
+        kept.append((ad, info))
+    if not kept:
+        return []
+    codes, table = benchmark_table(benchmarks)
+    days_active = [ad.get("Days Active", DEFAULT_ACTIVE_DAYS) for ad, _ in kept]
+    variations = [ad.get("Ad Variations", 1) for ad, _ in kept]
+    industries = [info["Industry"] for _, info in kept]
+    industry_codes = encode_industries(industries, codes)
+    if low_confidence_file:
+        low_confidence_ads = [{"Advertiser": ad.get("Advertiser"), "Ad Text": ad.get("Ad Text"),
+                               "Confidence": info["Confidence"], "Note": info.get("Note", "")}
+                              for (ad, info), code in zip(kept, industry_codes) if code == len(codes)]
+        if low_confidence_ads:
+            save_low_confidence_ads(low_confidence_ads, low_confidence_file)
+    metrics = compute_metrics(days_active, variations, industry_codes, table)
+    integer_reach = [isinstance(d, int) and isinstance(v, int) for d, v in zip(days_active, variations)]
+    return metrics_to_rows([ad.get("Advertiser") for ad, _ in kept], industries,
+                           [info.get("Note", "") for _, info in kept], metrics, integer_reach)
+
+def scenario_tables(scenarios, benchmarks=BENCHMARKS):
+    """Stack scenario benchmark tables; each scenario may override metrics per industry and the impression multiplier."""
+    codes = None
+    tables = []
+    multipliers = []
+    for scenario in scenarios:
+        scenario_benchmarks = copy.deepcopy(benchmarks)
+        for industry, overrides in scenario.get("benchmarks", {}).items():
+            scenario_benchmarks.setdefault(industry, dict(benchmarks.get(industry, {}))).update(overrides)
+        scenario_codes, table = benchmark_table(scenario_benchmarks)
+        if codes is not None and scenario_codes != codes:
+            raise ValueError(f"Scenario '{scenario.get('name')}' changes the industry list; only metric overrides are supported")
+        codes = scenario_codes
+        tables.append(table)
+        multipliers.append(scenario.get("impression_multiplier", IMPRESSIONS_PER_VARIATION_DAY))
+    return codes, np.stack(tables), np.array(multipliers, dtype=np.float64)
+
+def load_store_columns(path=AD_STORE_DB):
+    """Load the columns needed for estimation from the persistent ad store."""
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT advertiser, COALESCE(days_active, ?), COALESCE(variations, 1), COALESCE(industry, '') "
+                        "FROM ads", (DEFAULT_ACTIVE_DAYS,)).fetchall()
+    conn.close()
+    if not rows:
+        return {"Advertiser": [], "Days Active": np.zeros(0), "Ad Variations": np.zeros(0), "Industry": []}
+    advertisers, days_active, variations, industries = zip(*rows)
+    return {
+        "Advertiser": list(advertisers),
+        "Days Active": np.array(days_active, dtype=np.float64),
+        "Ad Variations": np.array(variations, dtype=np.float64),
+        "Industry": list(industries)
+    }
+
+def run_sweep(columns, scenarios, output_file=None):
+    """Evaluate every scenario over all ads at once and log per-scenario totals."""
+    codes, tables, multipliers = scenario_tables(scenarios)
+    industry_codes = encode_industries(columns["Industry"], codes)
+    metrics = compute_metrics(columns["Days Active"], columns["Ad Variations"], industry_codes, tables, multipliers)
+    summary = []
+    for s, scenario in enumerate(scenarios):
+        spend = float(metrics["Spend"][s].sum())
+        revenue = float(metrics["Revenue"][s].sum())
+        summary.append({"Scenario": scenario.get("name", f"scenario_{s + 1}"), "Ads": len(industry_codes),
+                        "Estimated Spend (INR)": round(spend, 2), "Estimated Revenue (INR)": round(revenue, 2),
+                        "Estimated Reach": round(float(metrics["Impressions"][s].sum()), 2),
+                        "ROAS": round(revenue / spend, 2) if spend > 0 else 0})
+        log.info(f"📊 {summary[-1]['Scenario']}: spend ₹{spend:,.2f}, ROAS {summary[-1]['ROAS']:.2f}x over {len(industry_codes)} ads")
+    if output_file:
+        with open(output_file, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Scenario", "Advertiser", "Industry", "Estimated Spend (INR)", "Estimated Reach", "ROAS"])
+            for s, scenario in enumerate(scenarios):
+                name = scenario.get("name", f"scenario_{s + 1}")
+                for advertiser, industry, spend, reach, roas in zip(columns["Advertiser"], columns["Industry"],
+                                                                    metrics["Spend"][s].tolist(),
+                                                                    metrics["Impressions"][s].tolist(),
+                                                                    metrics["ROAS"][s].tolist()):
+                    writer.writerow([name, advertiser, industry, round(spend, 2), round(reach, 2), round(roas, 2)])
+        log.info(f"📁 Saved {len(scenarios) * len(industry_codes)} scenario rows to {output_file}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run metric estimates over the ad store under several benchmark scenarios.")
+    parser.add_argument("--store", default=AD_STORE_DB, help="Ad store database")
+    parser.add_argument("--scenarios", help='JSON list of {"name", "benchmarks": {industry: {metric: value}}, "impression_multiplier"}')
+    parser.add_argument("--output", default=SWEEP_OUTPUT_FILE, help="CSV file for per-ad scenario results")
+    args = parser.parse_args()
+
+    scenarios = [{"name": "baseline"}]
+    if args.scenarios:
+        with open(args.scenarios, encoding="utf-8") as f:
+            scenarios += json.load(f)
+    run_sweep(load_store_columns(args.store), scenarios, args.output)
@@ -0,0 +1,196 @@
+import argparse
+import csv
+import re
+import zlib
+from collections import Counter
+import numpy as np
+from text_cache import normalize_text
+from run_metrics import get_logger
+
+log = get_logger("near_duplicates")
+
+# SETTINGS
+NUM_PERMUTATIONS = 192
+LSH_BANDS = 64  # 64 bands x 3 rows: texts with Jaccard 0.4 become candidates ~98.5% of the time, 0.5 ~99.98%
+SIMILARITY_THRESHOLD = 0.4  # Jaccard similarity to a cluster's representative needed to join it, checked exactly
+SHINGLE_SIZE = 1  # Words per shingle; reworded variants of one ad share content words far more often than word pairs
+STOP_WORDS = frozenset("""a about after again all also am an and any are as at be because been before being between both
+but by can could did do does doing down during each few for from further had has have having he her here him his
+how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours out over
+own same she should so some such than that the their them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you your yours get got us via
+per""".split())  # Function words every ad shares; left in, they make unrelated ads of one advertiser look alike
+ESTIMATE_MARGIN = 0.1  # Candidates whose MinHash estimate is this far below the threshold skip the exact check
+CREATIVE_HASH_DISTANCE = 3  # Max Hamming distance between 64-bit perceptual hashes of the same creative
+CREATIVE_HASH_BANDS = 4  # Pigeonhole: hashes within 3 bits share at least one of 4 16-bit chunks
+MERSENNE_PRIME = (1 << 61) - 1
+SEED = 1
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Return the set of word 1..size-grams of normalized text without stop words, hashed to 32 bits."""
+    words = [word for word in re.findall(r"\w+", normalize_text(text)) if word not in STOP_WORDS]
+    grams = set(words)
+    for n in range(2, size + 1):
+        grams.update(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+class NearDuplicateIndex:
+    """Incremental MinHash/LSH index that clusters near-duplicate ad texts with a weighted union-find.
+
+    Each distinct text is MinHashed once and only compared with clusters it shares an LSH band with, so
+    adding n texts costs roughly O(n). A new text joins the cluster whose representative (its first text)
+    it is most similar to by exact Jaccard similarity, so clusters never chain through intermediate texts.
+    Cluster sizes count every occurrence added, like the exact-text Counter did.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERMUTATIONS, bands=LSH_BANDS, exact=False):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.exact = exact  # Only merge identical texts, matching the old Counter behaviour
+        rng = np.random.default_rng(SEED)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.band_buckets = [{} for _ in range(bands)]
+        self.creative_buckets = [{} for _ in range(CREATIVE_HASH_BANDS)]
+        self.item_ids = {}
+        self.signatures = []
+        self.shingle_sets = []
+        self.creative_hashes = []
+        self.parent = []
+        self.weight = []
+        self.representative = []  # Per cluster root: the text new texts are compared with
+
+    def signature(self, text_shingles):
+        """Return the MinHash signature of a text's shingle set."""
+        values = np.fromiter(text_shingles, dtype=np.uint64)
+        if not len(values):
+            values = np.zeros(1, dtype=np.uint64)
+        # a*x wraps at 2**64 like datasketch's MinHash; masking to 32 bits keeps the permutations independent
+        return (((np.outer(self.a, values) + self.b[:, None]) % MERSENNE_PRIME) & np.uint64(0xFFFFFFFF)).min(axis=1)
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return first
+        if self.weight[first] < self.weight[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.weight[first] += self.weight[second]
+        return first
+
+    def item_key(self, text):
+        return text if self.exact else normalize_text(text)
+
+    def add(self, text, count=1, creative_hashes=()):
+        """Add count occurrences of a text (and optional 64-bit creative hashes); returns its item ID."""
+        key = self.item_key(text)
+        item = self.item_ids.get(key)
+        if item is None:
+            item = len(self.parent)
+            self.item_ids[key] = item
+            self.parent.append(item)
+            self.weight.append(count)
+            self.representative.append(item)
+            self.creative_hashes.append([])
+            if not self.exact:
+                self.add_signature(item, shingles(text))
+        else:
+            self.weight[self.find(item)] += count
+        for creative_hash in creative_hashes:
+            self.add_creative_hash(item, creative_hash)
+        return item
+
+    def add_signature(self, item, text_shingles):
+        signature = self.signature(text_shingles)
+        self.signatures.append(signature)
+        self.shingle_sets.append(text_shingles)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self.band_buckets[band].get(key, ()))
+        best_root, best_similarity = None, self.threshold
+        for root in {self.find(other) for other in candidates} if text_shingles else ():
+            representative = self.representative[root]
+            if np.mean(signature == self.signatures[representative]) < self.threshold - ESTIMATE_MARGIN:
+                continue
+            other_shingles = self.shingle_sets[representative]
+            similarity = len(text_shingles & other_shingles) / len(text_shingles | other_shingles)
+            if similarity >= best_similarity:
+                best_root, best_similarity = root, similarity
+        if best_root is not None:
+            representative = self.representative[best_root]
+            self.representative[self.union(item, best_root)] = representative
+        # A bucket keeps one member per cluster, so a family of many variants does not make every later text
+        # compare against all of them
+        root = self.find(item)
+        for band, key in enumerate(keys):
+            bucket = self.band_buckets[band].setdefault(key, [])
+            if not any(self.find(other) == root for other in bucket):
+                bucket.append(item)
+
+    def add_creative_hash(self, item, creative_hash):
+        """Join the item with every item whose creative is within CREATIVE_HASH_DISTANCE bits."""
+        self.creative_hashes[item].append(creative_hash)
+        chunk_bits = 64 // CREATIVE_HASH_BANDS
+        for band in range(CREATIVE_HASH_BANDS):
+            chunk = (creative_hash >> (band * chunk_bits)) & ((1 << chunk_bits) - 1)
+            bucket = self.creative_buckets[band].setdefault(chunk, [])
+            for other in bucket:
+                if self.find(other) != self.find(item) and any(
+                        bin(creative_hash ^ other_hash).count("1") <= CREATIVE_HASH_DISTANCE
+                        for other_hash in self.creative_hashes[other]):
+                    self.union(item, other)
+            bucket.append(item)
+
+    def cluster_of(self, text):
+        """Return the cluster ID of a previously added text, or None."""
+        item = self.item_ids.get(self.item_key(text))
+        return None if item is None else self.find(item)
+
+    def cluster_size(self, text):
+        """Return how many occurrences were added to the text's cluster (1 for unseen texts)."""
+        item = self.item_ids.get(self.item_key(text))
+        return 1 if item is None else self.weight[self.find(item)]
+
+    def cluster_count(self):
+        return len({self.find(item) for item in range(len(self.parent))})
+
+def variation_counts(texts, threshold=SIMILARITY_THRESHOLD, creative_hashes=None):
+    """Map each text to the number of ads in its near-duplicate cluster.
+
+    creative_hashes optionally maps a text to perceptual hashes of its downloaded creatives, so ads
+    reusing the same image are grouped even when their copy differs.
+    """
+    occurrences = Counter(texts)
+    index = NearDuplicateIndex(threshold)
+    for text, count in occurrences.items():
+        index.add(text, count, (creative_hashes or {}).get(text, ()))
+    return {text: index.cluster_size(text) for text in occurrences}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate ad texts in a ranked ads CSV.")
+    parser.add_argument("input", help="CSV with an 'Ad Text' column (e.g. meta_ads_ranked.csv)")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    args = parser.parse_args()
+
+    with open(args.input, newline="", encoding="utf-8-sig") as f:
+        texts = [row["Ad Text"] for row in csv.DictReader(f) if row.get("Ad Text")]
+    index = NearDuplicateIndex(args.threshold)
+    for text in texts:
+        index.add(text)
+    clusters = {}
+    for text in dict.fromkeys(texts):
+        clusters.setdefault(index.cluster_of(text), []).append(text)
+    log.info(f"ℹ️ {len(texts)} ads, {len(set(texts))} distinct texts, {index.cluster_count()} near-duplicate clusters")
+    for members in sorted(clusters.values(), key=len, reverse=True):
+        if len(members) > 1:
+            log.info(f"🔗 {len(members)} variations:")
+            for text in members:
+                log.info(f"   - {text[:100]}")
@@ -0,0 +1,194 @@
+import json
+import re
+import time
+from datetime import datetime, timezone
+from run_metrics import get_logger, metrics
+from request_blocking import tally_network_event
+
+log = get_logger("network_capture")
+
+# SETTINGS
+AD_RESPONSE_URL_PATTERNS = ("/api/graphql/", "/ads/library/async/")
+POLL_INTERVAL = 0.25
+IDLE_TIMEOUT = 6  # Seconds without a new ad response before the library is treated as exhausted
+MAX_NETWORK_SCROLLS = 50
+
+SCRIPT_JSON_RE = re.compile(r'<script type="application/json"[^>]*>(.*?)</script>', re.S)
+
+def enable_performance_logging(options):
+    """Turn on Chrome performance logging so Network.* CDP events reach driver.get_log."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+def enable_network_domain(driver):
+    """Enable the CDP Network domain so response bodies can be fetched."""
+    driver.execute_cdp_cmd("Network.enable", {})
+
+def format_ad_date(timestamp):
+    """Format a unix timestamp the way the Ad Library renders dates."""
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime("%d %b %Y")
+
+def iter_json_documents(text):
+    """Yield every JSON document in a response body (handles for(;;) guards and newline-delimited batches)."""
+    text = text.strip()
+    if text.startswith("for (;;);"):
+        text = text[len("for (;;);"):]
+    decoder = json.JSONDecoder()
+    position = 0
+    while position < len(text):
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position >= len(text):
+            break
+        try:
+            document, position = decoder.raw_decode(text, position)
+        except ValueError:
+            newline = text.find("\n", position)
+            if newline == -1:
+                break
+            position = newline + 1
+            continue
+        yield document
+
+def iter_ad_nodes(document):
+    """Walk a decoded JSON document and yield every ad archive record in it."""
+    stack = [document]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "ad_archive_id" in node and isinstance(node.get("snapshot"), dict):
+                yield node
+                continue
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+def snapshot_text(snapshot):
+    """Return the ad body text from a snapshot, covering plain and markup bodies."""
+    body = snapshot.get("body") or {}
+    if isinstance(body, str):
+        return body
+    text = body.get("text") or (body.get("markup") or {}).get("__html") or ""
+    if not text:
+        for card in snapshot.get("cards") or []:
+            card_body = card.get("body") or ""
+            text = card_body.get("text", "") if isinstance(card_body, dict) else card_body
+            if text:
+                break
+    return re.sub(r'<[^>]+>', ' ', text) if "<" in text else text
+
+def decode_ad_record(node):
+    """Convert one Ad Library ad archive record into the raw ad dict used by scrape_ads."""
+    snapshot = node.get("snapshot") or {}
+    page_id = str(node.get("page_id") or snapshot.get("page_id") or "N/A")
+    page_name = node.get("page_name") or snapshot.get("page_name") or ""
+    image_urls = []
+    video_urls = []
+    for image in snapshot.get("images") or []:
+        url = image.get("original_image_url") or image.get("resized_image_url")
+        if url:
+            image_urls.append(url)
+    for video in snapshot.get("videos") or []:
+        url = video.get("video_hd_url") or video.get("video_sd_url")
+        if url:
+            video_urls.append(url)
+    for card in snapshot.get("cards") or []:
+        if card.get("original_image_url") or card.get("resized_image_url"):
+            image_urls.append(card.get("original_image_url") or card.get("resized_image_url"))
+        if card.get("video_hd_url") or card.get("video_sd_url"):
+            video_urls.append(card.get("video_hd_url") or card.get("video_sd_url"))
+
+    start_date = node.get("start_date")
+    end_date = node.get("end_date")
+    if start_date and end_date and not node.get("is_active", False):
+        active_time = f"{format_ad_date(start_date)} - {format_ad_date(end_date)}"
+    elif start_date:
+        active_time = f"Started running on {format_ad_date(start_date)}"
+    else:
+        active_time = "Unknown"
+
+    ad_text = snapshot_text(snapshot).replace("\n", " ").strip()
+    return {
+        # Keyed by page ID like the DOM extraction modes, so the same ad dedups and merges across modes
+        "Advertiser": page_id if page_id != "N/A" else page_name or "Unknown Advertiser",
+        "Ad Text": ad_text or "...",
+        "Ad Link": snapshot.get("page_profile_uri") or snapshot.get("link_url") or "",
+        "Active Time": active_time,
+        "Image URLs": [url for url in dict.fromkeys(image_urls) if not url.split("?")[0].endswith(".gif")],
+        "Video URLs": list(dict.fromkeys(video_urls)),
+        "Page ID": page_id,
+        "Ad Archive ID": str(node["ad_archive_id"]),
+        "Start Date": datetime.fromtimestamp(int(start_date), tz=timezone.utc).date().isoformat() if start_date else "",
+        "End Date": datetime.fromtimestamp(int(end_date), tz=timezone.utc).date().isoformat() if end_date else "",
+        "Collation Count": node.get("collation_count") or 1,
+        "Page Name": page_name
+    }
+
+def decode_ad_payload(text):
+    """Decode every ad record contained in a response body."""
+    records = []
+    for document in iter_json_documents(text):
+        records.extend(decode_ad_record(node) for node in iter_ad_nodes(document))
+    return records
+
+def decode_page_source(page_html):
+    """Decode the ads embedded as JSON in the initial page HTML (the first page is not fetched via XHR)."""
+    records = []
+    for payload in SCRIPT_JSON_RE.findall(page_html):
+        if "ad_archive_id" in payload:
+            records.extend(decode_ad_payload(payload))
+    return records
+
+def poll_ad_responses(driver, pending):
+    """Drain the performance log and yield decoded ads from every finished ad data response."""
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        method = message.get("method")
+        params = message.get("params", {})
+        tally_network_event(method, params)
+        if method == "Network.responseReceived":
+            url = params.get("response", {}).get("url", "")
+            if any(pattern in url for pattern in AD_RESPONSE_URL_PATTERNS):
+                pending[params["requestId"]] = url
+        elif method == "Network.loadingFinished" and params.get("requestId") in pending:
+            url = pending.pop(params["requestId"])
+            try:
+                body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": params["requestId"]})
+            except Exception as e:
+                log.warning(f"⚠️ Could not read response body for {url[:80]}: {e}")
+                continue
+            metrics.count("http_bytes_ad_responses", len(body.get("body", "")))
+            for record in decode_ad_payload(body.get("body", "")):
+                yield record
+        elif method == "Network.loadingFailed":
+            pending.pop(params.get("requestId"), None)
+
+def stream_network_ads(driver, max_scrolls=MAX_NETWORK_SCROLLS, idle_timeout=IDLE_TIMEOUT):
+    """Scroll the results page and yield each ad record as soon as its XHR response arrives."""
+    seen_ids = set()
+    pending = {}
+    for record in decode_page_source(driver.page_source):
+        if record["Ad Archive ID"] not in seen_ids:
+            seen_ids.add(record["Ad Archive ID"])
+            yield record
+    for i in range(max_scrolls):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        deadline = time.time() + idle_timeout
+        new_records = 0
+        while time.time() < deadline:
+            for record in poll_ad_responses(driver, pending):
+                if record["Ad Archive ID"] in seen_ids:
+                    continue
+                seen_ids.add(record["Ad Archive ID"])
+                new_records += 1
+                yield record
+            if new_records and not pending:
+                break
+            time.sleep(POLL_INTERVAL)
+        log.debug(f"📡 Scroll {i+1}/{max_scrolls}: captured {new_records} new ad record(s) ({len(seen_ids)} total)")
+        if not new_records:
+            log.info("ℹ️ No new ad responses. Library exhausted.")
+            break
@@ -0,0 +1,281 @@
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from run_metrics import get_logger, metrics
+
+log = get_logger("rate_limiter")
+
+# SETTINGS
+INITIAL_CONCURRENCY = 4  # Requests in flight per host before any feedback
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+DECREASE_FACTOR = 0.5  # Multiplicative decrease when a host throttles (429/503 or a block page)
+ERROR_WINDOW = 20  # Recent outcomes per host used for the error rate
+ERROR_RATE_LIMIT = 0.25  # Above this share of failed requests in the window the limit is cut as for throttling
+LATENCY_SLOWDOWN = 3.0  # Smoothed latency this many times the host's baseline counts as congestion
+BACKOFF_BASE = 0.5  # Seconds; doubled on every retry, with jitter
+BACKOFF_MAX = 60
+DEFAULT_RETRIES = 3
+JOB_RETRY_BUDGET = 10  # Retries shared by all requests of one job (e.g. every creative of an ad)
+THROTTLE_STATUS_CODES = {429, 503}
+
+class RetryableError(Exception):
+    """A request failure worth retrying; status and retry_after (seconds) come from the HTTP response if any."""
+
+    def __init__(self, message="", status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def throttled(self):
+        return self.status in THROTTLE_STATUS_CODES
+
+class ThrottledError(RetryableError):
+    """The remote side asked us to slow down (429, a block page, a translator quota error)."""
+
+    def __init__(self, message="", status=429, retry_after=None):
+        super().__init__(message, status, retry_after)
+
+    @property
+    def throttled(self):
+        return True
+
+class BudgetExceeded(Exception):
+    """A job ran out of retries or time."""
+
+def parse_retry_after(value):
+    """Return a Retry-After header in seconds, or None for missing or HTTP-date values."""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """Jittered exponential backoff for the given retry attempt (0-based)."""
+    return min(maximum, base * 2 ** attempt) * (0.5 + random.random())
+
+class JobBudget:
+    """Retry and time allowance shared by every request of one job."""
+
+    def __init__(self, retries=JOB_RETRY_BUDGET, seconds=None):
+        self.retries_left = retries
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """Seconds left before the deadline (None without one)."""
+        return None if self.deadline is None else max(self.deadline - time.monotonic(), 0.0)
+
+    def take_retry(self):
+        """Spend one retry; returns False once the job is out of retries or time."""
+        with self._lock:
+            if self.retries_left <= 0 or self.remaining() == 0:
+                return False
+            self.retries_left -= 1
+            return True
+
+class HostLimiter:
+    """AIMD concurrency limit for one host.
+
+    Every success raises the limit by 1/limit (about +1 per round of requests); throttling, a high error
+    rate or a latency spike halves it, and a throttled host also gets a cooldown before new requests start.
+    """
+
+    def __init__(self, host, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.host = host
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.outcomes = deque(maxlen=ERROR_WINDOW)
+        self.latency = None
+        self.baseline = None
+        self.consecutive_throttles = 0
+        self.last_decrease = 0.0
+        self.requests = 0
+        self.throttles = 0
+        self.errors = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Wait for a free slot and any cooldown to pass; returns the start time to pass to release.
+
+        Raises BudgetExceeded if timeout runs out first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                cooldown = self.cooldown_until - now
+                if cooldown <= 0 and self.in_flight < int(self.limit):
+                    break
+                wait = cooldown if cooldown > 0 else None
+                if deadline is not None:
+                    if now >= deadline:
+                        raise BudgetExceeded(f"Timed out waiting for a request slot on {self.host}")
+                    wait = min(wait, deadline - now) if wait is not None else deadline - now
+                self._cond.wait(wait)
+            self.in_flight += 1
+            self.requests += 1
+            return time.monotonic()
+
+    def release(self, started, latency, outcome="ok", retry_after=None):
+        """Free a slot and adjust the limit: outcome is "ok", "error", "throttle" or None (no signal)."""
+        with self._cond:
+            self.in_flight -= 1
+            # Requests already in flight when the limit was last cut fail together; react once per burst
+            fresh = started >= self.last_decrease
+            if outcome == "throttle":
+                self.throttles += 1
+                self.outcomes.append(False)
+                now = time.monotonic()
+                if fresh:
+                    self.consecutive_throttles += 1
+                    pause = retry_after if retry_after is not None else backoff_delay(self.consecutive_throttles - 1)
+                    self.cooldown_until = max(self.cooldown_until, now + pause)
+                    self._decrease(f"throttled, pausing {pause:.1f}s")
+                elif retry_after is not None:
+                    self.cooldown_until = max(self.cooldown_until, now + retry_after)
+            elif outcome == "error":
+                self.errors += 1
+                self.outcomes.append(False)
+                if fresh and len(self.outcomes) >= ERROR_WINDOW // 2 and self.outcomes.count(False) / len(self.outcomes) > ERROR_RATE_LIMIT:
+                    self._decrease("high error rate")
+            elif outcome == "ok":
+                self.outcomes.append(True)
+                self.consecutive_throttles = 0
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                # The baseline follows the best smoothed latency but drifts up so it can track a slower host
+                self.baseline = self.latency if self.baseline is None else min(self.baseline * 1.01, self.latency)
+                if self.latency > LATENCY_SLOWDOWN * self.baseline:
+                    if fresh:
+                        self._decrease(f"latency {self.latency:.2f}s vs {self.baseline:.2f}s baseline")
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self, reason):
+        self.last_decrease = time.monotonic()
+        old = self.limit
+        self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+        log.warning(f"🐢 {self.host}: {reason}; concurrency {int(old)} → {int(self.limit)}")
+
+    def snapshot(self):
+        with self._cond:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "requests": self.requests,
+                    "throttles": self.throttles, "errors": self.errors,
+                    "smoothed_latency_seconds": round(self.latency, 3) if self.latency is not None else None}
+
+class Attempt:
+    """Outcome of one request made under a slot; callers set outcome to None when a result says nothing about load.
+
+    latency overrides the slot's wall time as the congestion signal, e.g. time to first byte of a large download.
+    """
+
+    def __init__(self):
+        self.outcome = "ok"
+        self.retry_after = None
+        self.latency = None
+
+slot_local = threading.local()
+
+def current_attempt():
+    """Return the Attempt of the innermost slot held by this thread, or None outside any slot."""
+    attempts = getattr(slot_local, "attempts", None)
+    return attempts[-1] if attempts else None
+
+class AdaptiveScheduler:
+    """Per-host AIMD limiters with jittered exponential backoff, shared by navigation, downloads and translation."""
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, host):
+        """Return the limiter for a host name or URL."""
+        host = urlparse(host).netloc or host
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = HostLimiter(host, self.initial, self.minimum, self.maximum)
+            return self._limiters[host]
+
+    @contextmanager
+    def slot(self, host, timeout=None):
+        """Hold one request slot for a host; RetryableErrors raised inside are reported as errors or throttling."""
+        limiter = self.limiter(host)
+        started = limiter.acquire(timeout)
+        attempt = Attempt()
+        attempts = slot_local.__dict__.setdefault("attempts", [])
+        attempts.append(attempt)
+        start = time.perf_counter()
+        try:
+            yield attempt
+        except RetryableError as e:
+            attempt.outcome = "throttle" if e.throttled else "error"
+            attempt.retry_after = e.retry_after
+            raise
+        except BaseException:
+            attempt.outcome = None  # Not a transport problem (e.g. a 404 or a parse error)
+            raise
+        finally:
+            attempts.pop()
+            latency = attempt.latency if attempt.latency is not None else time.perf_counter() - start
+            limiter.release(started, latency, attempt.outcome, attempt.retry_after)
+
+    def call(self, host, fn, retries=DEFAULT_RETRIES, budget=None, label=None):
+        """Run fn() under the host's limit, retrying RetryableErrors with backoff within retries and the job budget.
+
+        Throttled attempts wait out the host cooldown (shared by every caller) instead of sleeping on their own,
+        falling back to backoff when the throttle left no cooldown in place.
+        """
+        label = label or host
+        for attempt in range(retries + 1):
+            try:
+                with self.slot(host, budget.remaining() if budget is not None else None):
+                    return fn()
+            except RetryableError as e:
+                metrics.count("rate_limit_throttles" if e.throttled else "rate_limit_errors")
+                if attempt == retries or (budget is not None and not budget.take_retry()):
+                    raise
+                metrics.count("rate_limit_retries")
+                # A throttle from a burst the limiter already reacted to may not have set a cooldown; back off anyway
+                if e.throttled and self.limiter(host).cooldown_until > time.monotonic():
+                    log.debug("ℹ️ Retrying %s after the host cooldown (%s)", label[:80], e)
+                    continue
+                delay = backoff_delay(attempt)
+                if budget is not None and budget.remaining() is not None:
+                    delay = min(delay, budget.remaining())
+                log.info(f"ℹ️ Retrying {label[:80]} in {delay:.1f}s ({e})")
+                time.sleep(delay)
+
+    def wait_for_host(self, host):
+        """Block until a throttled host's cooldown has passed, without taking a slot."""
+        limiter = self.limiter(host)
+        with limiter._cond:
+            while limiter.cooldown_until > time.monotonic():
+                limiter._cond.wait(limiter.cooldown_until - time.monotonic())
+
+    def snapshot(self):
+        """Current limit and counters per host, for the run report."""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.host: limiter.snapshot() for limiter in limiters}
+
+default_scheduler = None
+default_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Return the process-wide scheduler, so every caller sees the same per-host limits."""
+    global default_scheduler
+    with default_scheduler_lock:
+        if default_scheduler is None:
+            default_scheduler = AdaptiveScheduler()
+        return default_scheduler
@@ -0,0 +1,69 @@
+import json
+from run_metrics import get_logger, metrics
+
+log = get_logger("request_blocking")
+
+# SETTINGS
+# Chrome's setBlockedURLs patterns only support "*" wildcards. Media is matched by extension so the page's
+# own JS/CSS on the same CDN still loads; the DOM keeps every img/video src for download_media.
+BLOCKED_MEDIA_PATTERNS = ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.mp4*", "*.webm*", "*.m4a*", "*.m4v*"]
+BLOCKED_FONT_PATTERNS = ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*"]
+BLOCKED_SCRIPT_PATTERNS = ["*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+                           "*googlesyndication.com*", "*hotjar.com*", "*clarity.ms*"]
+BLOCKED_URL_PATTERNS = BLOCKED_MEDIA_PATTERNS + BLOCKED_FONT_PATTERNS + BLOCKED_SCRIPT_PATTERNS
+# Typical transfer size per blocked request by CDP resource type, used to estimate the bytes saved
+ESTIMATED_BYTES_BY_TYPE = {"Image": 60_000, "Media": 1_500_000, "Font": 40_000, "Script": 35_000}
+ESTIMATED_BYTES_OTHER = 10_000
+
+def enable_lean_logging(options):
+    """Log only Network.* events to the performance log, so blocked and finished requests can be tallied cheaply."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+    return options
+
+def enable_request_blocking(driver, patterns=None):
+    """Block heavy resources for every page the driver loads from now on."""
+    patterns = BLOCKED_URL_PATTERNS if patterns is None else patterns
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    driver._request_blocking = True
+    log.info(f"🚫 Blocking {len(patterns)} heavy resource pattern(s) (media, fonts, trackers).")
+    return driver
+
+def tally_network_event(method, params):
+    """Count bytes received and blocked requests (with their estimated size) from one Network.* event."""
+    if method == "Network.loadingFinished":
+        metrics.count("http_bytes_page", int(params.get("encodedDataLength") or 0))
+    elif method == "Network.loadingFailed" and params.get("blockedReason"):
+        resource_type = params.get("type", "Other")
+        metrics.count("blocked_requests")
+        metrics.count(f"blocked_requests_{resource_type.lower()}")
+        metrics.count("estimated_bytes_saved", ESTIMATED_BYTES_BY_TYPE.get(resource_type, ESTIMATED_BYTES_OTHER))
+
+def drain_network_log(driver):
+    """Tally the Network.* events buffered in the performance log of a request-blocking driver.
+
+    Drained after every scroll batch so the buffer stays small. Network capture mode reads the same log
+    itself and tallies events as it goes, so it never calls this.
+    """
+    if not getattr(driver, "_request_blocking", False):
+        return
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        log.debug("Could not read the performance log: %s", e)
+        return
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        tally_network_event(message.get("method"), message.get("params", {}))
+
+def report_blocked_requests():
+    """Log how many requests the lean profile blocked and roughly how many bytes that saved."""
+    counters = metrics.report()["counters"]
+    if not counters.get("blocked_requests"):
+        return
+    log.info(f"🚫 Blocked {counters['blocked_requests']} request(s), ~{counters.get('estimated_bytes_saved', 0) / 1e6:.1f} MB "
+             f"saved ({counters.get('http_bytes_page', 0) / 1e6:.1f} MB actually loaded)")
@@ -0,0 +1,141 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+# SETTINGS
+LOG_LEVEL = "INFO"  # "DEBUG" adds per-ad and per-call lines; "WARNING" keeps only problems
+RUN_REPORT_FILE = "run_report.json"
+
+class ConsoleHandler(logging.Handler):
+    """Print log records as plain lines, to whatever sys.stdout currently is (so redirect_stdout still works)."""
+
+    def emit(self, record):
+        try:
+            print(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+def get_logger(name):
+    """Return a module logger under the shared "scraper" logger, configuring console output once."""
+    root = logging.getLogger("scraper")
+    if not root.handlers:
+        handler = ConsoleHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return root.getChild(name)
+
+def set_log_level(level):
+    """Change the level of every scraper logger, e.g. set_log_level("DEBUG")."""
+    logging.getLogger("scraper").setLevel(level)
+
+class RunMetrics:
+    """Thread-safe stage timings, counters and WebDriver call stats for one run, saved as a JSON report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.timings = defaultdict(list)
+        self.counters = Counter()
+        self.driver_calls = Counter()
+        self.driver_seconds = Counter()
+        self.info = {}
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.timings[stage].append(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as one sample of a stage; nested and repeated stages are recorded separately."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_driver_call(self, command, seconds):
+        with self._lock:
+            self.driver_calls[command] += 1
+            self.driver_seconds[command] += seconds
+
+    def set_info(self, **info):
+        """Attach run details (keyword, country, extraction mode...) to the report."""
+        with self._lock:
+            self.info.update(info)
+
+    def reset(self):
+        """Start a new run, e.g. between jobs of a long-lived worker."""
+        with self._lock:
+            self.started = time.time()
+            self.timings.clear()
+            self.counters.clear()
+            self.driver_calls.clear()
+            self.driver_seconds.clear()
+            self.info.clear()
+
+    def report(self):
+        """Return the run report as a JSON-serializable dict."""
+        with self._lock:
+            stages = {}
+            for name, samples in self.timings.items():
+                ordered = sorted(samples)
+                stages[name] = {"count": len(samples), "total_seconds": round(sum(samples), 4),
+                                "avg_seconds": round(sum(samples) / len(samples), 4),
+                                "p95_seconds": round(ordered[int(len(ordered) * 0.95)] if len(ordered) > 1 else ordered[0], 4),
+                                "max_seconds": round(ordered[-1], 4)}
+            driver = {command: {"calls": calls, "total_seconds": round(self.driver_seconds[command], 4)}
+                      for command, calls in self.driver_calls.most_common()}
+            return {"started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                    "wall_seconds": round(time.time() - self.started, 3), **self.info, "stages": stages,
+                    "webdriver": {"round_trips": sum(self.driver_calls.values()), "commands": driver},
+                    "counters": dict(self.counters)}
+
+    def save(self, filename=RUN_REPORT_FILE):
+        """Write the run report to a JSON file and print a one-line summary."""
+        report = self.report()
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        slowest = sorted(report["stages"].items(), key=lambda item: item[1]["total_seconds"], reverse=True)[:3]
+        summary = ", ".join(f"{name} {stats['total_seconds']:.1f}s" for name, stats in slowest)
+        get_logger("metrics").info(f"🧾 Saved run report to {filename} ({report['webdriver']['round_trips']} WebDriver "
+                                   f"round-trip(s); slowest stages: {summary or 'none'})")
+        return report
+
+# Process-wide metrics shared by scrape.py, estimate_metrics.py and the media downloader
+metrics = RunMetrics()
+
+def timed(stage):
+    """Decorator that records every call of a function as a sample of stage."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metrics.stage(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def instrument_driver(driver):
+    """Count and time every WebDriver round-trip of a driver, including calls made through its elements."""
+    if getattr(driver, "_metrics_instrumented", False):
+        return driver
+    execute = driver.execute
+
+    def counted_execute(driver_command, params=None):
+        start = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            metrics.record_driver_call(driver_command, time.perf_counter() - start)
+    driver.execute = counted_execute
+    driver._metrics_instrumented = True
+    return driver
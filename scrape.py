@@ -1,28 +1,181 @@
 import time
+PROCESS_START = time.time()  # Startup budget is measured from the first line of the entry module
 import csv
+import logging
 import os
-import requests
 import re
 import shutil
-import glob
+import sys
 from datetime import datetime
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 import undetected_chromedriver as uc
 from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
-from estimate_metrics import run_estimation, DEFAULT_ACTIVE_DAYS
+from estimate_metrics import run_estimation, warm_up_classifier, DEFAULT_ACTIVE_DAYS
+from estimate_metrics import OUTPUT_FILE as METRICS_FILE, LOW_CONFIDENCE_FILE
+from ad_selectors import (AD_CARD_XPATH, ADVERTISER_XPATH, AD_LINK_XPATH, AD_TEXT_XPATH,
+                          ACTIVE_TIME_XPATH, IMAGE_XPATH, VIDEO_XPATH)
+from ad_parser import extract_page_id, build_raw_ad, parse_ads_from_html
+from ad_store import AdStore
+from ad_record import AdRecord, as_record, normalized_text_hash
+from near_duplicates import NearDuplicateIndex, variation_counts
+from creative_fingerprints import fingerprint_folder
+from media_downloader import MediaDownloader, download_media, get_extension_from_content_type, get_default_downloader
+from network_capture import enable_performance_logging, enable_network_domain, stream_network_ads
+from columnar_output import new_run_id, save_ads_parquet, save_metrics_parquet, load_ads_for_ranking
+from run_metrics import get_logger, metrics, instrument_driver, timed, RUN_REPORT_FILE
+from rate_limiter import get_scheduler, RetryableError, ThrottledError
+from request_blocking import enable_lean_logging, enable_request_blocking, drain_network_log, report_blocked_requests
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+log = get_logger("scrape")
 
 # SETTINGS
 KEYWORD = "Odint Consulting Services"
+AD_LIBRARY_URL = "https://www.facebook.com/ads/library/"  # benchmarks/mock_ad_library.py points this at a local server
 COUNTRY_CODE = "ALL"
-NUM_SCROLLS = 3  # Increased to ensure more ads load
+MAX_SCROLLS = 50  # Hard cap on scroll steps; scrolling stops earlier once the library is exhausted
+SCROLL_TIMEOUT = 8  # Seconds to wait for new ad cards after each scroll
+IDLE_SCROLL_LIMIT = 2  # Consecutive scrolls without new cards before the library is treated as exhausted
+TARGET_AD_COUNT = None  # Stop once this many ad cards have loaded (None = no target)
+RECYCLE_AD_NODES = False  # Collapse each extracted batch of ad cards so browser memory stays flat on long scrolls
 OUTPUT_FILE = "meta_ads_ranked.csv"
 MEDIA_FOLDER = "ad_media"
 DEBUG_LOG = "scrape_errors.csv"
+WARM_UP_CLASSIFIER = True  # Load the industry classifier in the background while the browser scrolls
+STARTUP_BUDGET_SECONDS = 20  # Warn when the first page load takes longer than this after process start
+USE_AD_STORE = True  # Persist every ad in ad_store.db so later runs only process new ads
+EXTRACTION_MODE = "js"  # "js" = one execute_script call, "html" = offline lxml parse of page_source, "xpath" = per-element WebDriver calls, "network" = decode the page's XHR responses
+SNAPSHOT_FOLDER = "page_snapshots"
+SAVE_SNAPSHOTS = False  # Archive page_source so ad_parser.py can re-parse it later without Chrome
+NEAR_DUPLICATE_VARIATIONS = True  # Count reworded copies of an ad text as variations (MinHash clustering) instead of exact matches only
+FINGERPRINT_CREATIVES = True  # After downloads, pHash new creatives into creative_index.db and report reused ones
+OUTPUT_FORMATS = ("csv", "parquet")  # "parquet" appends this run's ads and metrics to the columnar dataset in columnar_output.py
+BLOCK_HEAVY_RESOURCES = True  # Lean profile: skip image/video bodies, fonts and trackers while scrolling (src URLs stay in the DOM)
+NAVIGATION_RETRIES = 2  # Page load retries after a timeout or a rate-limit page; waits follow rate_limiter.py
+BLOCK_PAGE_MARKERS = ("temporarily blocked", "going too fast", "rate limit")  # Lowercase text of the Ad Library's throttling page
+SAVE_RUN_REPORT = True  # Write stage timings, WebDriver round-trips and byte counts to run_report.json
+
+# Walks every ad card with the same XPaths as extract_ad_data and returns all fields in one round-trip
+EXTRACT_ADS_JS = """
+const sel = arguments[0];
+const snapshot = (xpath, context) => {
+    const result = document.evaluate(xpath, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+    return nodes;
+};
+const text = (el) => (el.innerText || el.textContent || "");
+const src = (el) => el.getAttribute("src") === null ? null : (el.src || el.getAttribute("src"));
+return snapshot(sel.card, document).map((card) => {
+    try {
+        return {
+            advertiser_texts: snapshot(sel.advertiser, card).map(text),
+            ad_link: (snapshot(sel.link, card).map((a) => a.href || a.getAttribute("href"))[0]) || "",
+            ad_text: (snapshot(sel.text, card).map(text)[0]),
+            active_time: (snapshot(sel.active_time, card).map(text)[0]),
+            image_urls: snapshot(sel.image, card).map(src),
+            video_urls: snapshot(sel.video, card).map(src)
+        };
+    } catch (e) {
+        return {error: String(e), raw_html: (card.outerHTML || "").slice(0, 500)};
+    }
+});
+"""
+
+BLOCK_PAGE_JS = "return (document.title + ' ' + (document.body ? document.body.innerText.slice(0, 2000) : '')).toLowerCase();"
+
+# Scrolls once, then waits (via MutationObserver) until unseen ad cards appear or the timeout expires.
+# New cards are tagged with data-scrape-batch so each step only extracts what it added.
+SCROLL_STEP_JS = """
+const [cardXpath, batch, timeoutMs, done] = arguments;
+const markNewCards = () => {
+    const result = document.evaluate(cardXpath + "[not(@data-scrape-batch)]", document, null,
+                                     XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (let i = 0; i < result.snapshotLength; i++) result.snapshotItem(i).setAttribute("data-scrape-batch", batch);
+    return result.snapshotLength;
+};
+const atBottom = () => window.innerHeight + window.scrollY >= document.body.scrollHeight - 2;
+let found = markNewCards();
+window.scrollTo(0, document.body.scrollHeight);
+if (found) {
+    done({new: found, atBottom: atBottom()});
+    return;
+}
+let finished = false;
+let pending = null;
+const finish = () => {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done({new: found + markNewCards(), atBottom: atBottom()});
+};
+const observer = new MutationObserver(() => {
+    if (pending) return;
+    pending = setTimeout(() => {
+        pending = null;
+        found += markNewCards();
+        if (found) finish();
+    }, 100);
+});
+observer.observe(document.body, {childList: true, subtree: true});
+const timer = setTimeout(finish, timeoutMs);
+"""
+
+# Empties the innermost ad cards of a batch and drops their media so Chrome can free them.
+# Cards keep their height so the scroll position and infinite loading are unaffected.
+COLLAPSE_BATCH_JS = """
+const result = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+let collapsed = 0;
+for (let i = 0; i < result.snapshotLength; i++) {
+    const card = result.snapshotItem(i);
+    if (card.querySelector("[data-scrape-batch]:not([data-scrape-recycled])")) continue;
+    card.querySelectorAll("video").forEach((video) => {
+        video.pause();
+        video.removeAttribute("src");
+        video.querySelectorAll("source").forEach((source) => source.removeAttribute("src"));
+        video.load();
+    });
+    card.querySelectorAll("img").forEach((img) => img.removeAttribute("src"));
+    card.style.height = card.offsetHeight + "px";
+    card.replaceChildren();
+    card.setAttribute("data-scrape-recycled", "1");
+    collapsed++;
+}
+return collapsed;
+"""
+
+first_page_load_reported = False
 
-def init_driver():
+def report_first_page_load():
+    """Print time from process start to the first loaded results page, once per process."""
+    global first_page_load_reported
+    if first_page_load_reported:
+        return
+    first_page_load_reported = True
+    elapsed = time.time() - PROCESS_START
+    metrics.set_info(time_to_first_page_load=round(elapsed, 3))
+    if elapsed > STARTUP_BUDGET_SECONDS:
+        log.info(f"⏱️ Time to first page load: {elapsed:.2f}s (over the {STARTUP_BUDGET_SECONDS}s startup budget)")
+    else:
+        log.info(f"⏱️ Time to first page load: {elapsed:.2f}s")
+    return elapsed
+
+@timed("driver_init")
+def init_driver(capture_network=False, block_resources=BLOCK_HEAVY_RESOURCES):
     """Initialize undetected Chrome driver with specified options."""
     options = uc.ChromeOptions()
     options.add_argument("--no-sandbox")
@@ -30,19 +183,28 @@ def init_driver():
     options.add_argument("--window-size=1920,1080")
     options.add_argument("--headless")
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.7031.114 Safari/537.36")
+    if capture_network:
+        enable_performance_logging(options)
+    if block_resources:
+        enable_lean_logging(options)
     try:
-        driver = uc.Chrome(options=options, version_main=136)
+        driver = instrument_driver(uc.Chrome(options=options, version_main=136))
         driver.set_page_load_timeout(30)
-        print("✅ Chrome driver initialized successfully.")
+        if capture_network:
+            enable_network_domain(driver)
+            log.info("📡 Network capture enabled.")
+        if block_resources:
+            enable_request_blocking(driver)
+        log.info("✅ Chrome driver initialized successfully.")
         return driver
     except Exception as e:
-        print(f"⚠️ Error initializing Chrome driver: {e}")
+        log.warning(f"⚠️ Error initializing Chrome driver: {e}")
         raise
 
 def parse_active_time(active_time_text):
     """Parse active time text and return days active, defaulting to 1 day for invalid formats."""
     if not active_time_text or active_time_text == "Unknown":
-        print(f"⚠️ Empty or unknown active time. Defaulting to 1 day.")
+        log.debug("⚠️ Empty or unknown active time. Defaulting to 1 day.")
         return 1
     try:
         active_time_text = re.sub(r'http[s]?://\S+|www\.\S+', '', active_time_text).strip()
@@ -70,71 +232,12 @@ def parse_active_time(active_time_text):
                     days_active += hours / 24
             return max(days_active, 1)
         else:
-            print(f"⚠️ Invalid active time format: '{active_time_text[:50]}...'. Defaulting to 1 day.")
+            log.warning(f"⚠️ Invalid active time format: '{active_time_text[:50]}...'. Defaulting to 1 day.")
             return 1
     except Exception as e:
-        print(f"⚠️ Error parsing active time '{active_time_text[:50]}...': {e}. Defaulting to 1 day.")
+        log.warning(f"⚠️ Error parsing active time '{active_time_text[:50]}...': {e}. Defaulting to 1 day.")
         return 1
 
-def extract_page_id(ad_link):
-    """Extract page ID from ad link."""
-    if not ad_link:
-        return "N/A"
-    match = re.search(r'facebook\.com/(\d+)/', ad_link)
-    if match:
-        return match.group(1)
-    match = re.search(r'facebook\.com/([^/?]+)', ad_link)
-    if match:
-        return match.group(1)
-    return "N/A"
-
-def get_extension_from_content_type(content_type):
-    """Map content type to file extension."""
-    mime_to_ext = {
-        "image/jpeg": "jpg",
-        "image/png": "png",
-        "image/gif": "gif",
-        "video/mp4": "mp4",
-        "video/webm": "webm",
-        "video/ogg": "ogv",
-        "application/octet-stream": "bin"
-    }
-    content_type = content_type.lower()
-    for mime, ext in mime_to_ext.items():
-        if mime in content_type:
-            return ext
-    print(f"⚠️ Unknown Content-Type '{content_type}'. Defaulting to 'bin'.")
-    return "bin"
-
-def download_media(url, folder, filename_base, media_type="image"):
-    """Download media (image/video) and save to folder."""
-    try:
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-        response = requests.get(url, stream=True, timeout=10)
-        if response.status_code != 200:
-            print(f"⚠️ Failed to download media from {url}: Status code {response.status_code}")
-            return False
-        content_type = response.headers.get("Content-Type", "application/octet-stream")
-        ext = get_extension_from_content_type(content_type)
-        filename_base = "".join(c for c in filename_base if c.isalnum() or c in (' ', '_', '-')).strip().replace(' ', '_')
-        filename = f"{filename_base}.{ext}"
-        filepath = os.path.join(folder, filename)
-        counter = 1
-        while os.path.exists(filepath):
-            filename = f"{filename_base}_{counter}.{ext}"
-            filepath = os.path.join(folder, filename)
-            counter += 1
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        print(f"📥 Saved media: {filepath} (Content-Type: {content_type})")
-        return True
-    except Exception as e:
-        print(f"⚠️ Error downloading media from {url}: {e}")
-        return False
-
 def extract_ad_data(ad, index, advertiser_cache):
     """Extract data from a single ad element with retries for dynamic content."""
     try:
@@ -142,61 +245,37 @@ def extract_ad_data(ad, index, advertiser_cache):
         WebDriverWait(ad, 5).until(EC.presence_of_element_located((By.XPATH, './/span')))
         
         # Extract advertiser with broader selectors
-        advertiser_elems = ad.find_elements(By.XPATH, './/span[contains(@class, "x1lliihq") or contains(@class, "x193iq5w") or contains(@class, "page")] | .//a[contains(@href, "facebook.com") and not(contains(@href, "fbclid"))] | .//div[contains(@class, "advertiser")]')
-        advertiser = "Unknown Advertiser"
-        for elem in advertiser_elems:
-            text = elem.text.strip()
-            if text and len(text) > 2:
-                advertiser = text
-                break
+        advertiser_texts = [elem.text for elem in ad.find_elements(By.XPATH, ADVERTISER_XPATH)]
         
         # Extract ad link
-        ad_link_elems = ad.find_elements(By.XPATH, './/a[contains(@href, "facebook.com") or contains(@href, "fbclid")]')
+        ad_link_elems = ad.find_elements(By.XPATH, AD_LINK_XPATH)
         ad_link = ad_link_elems[0].get_attribute('href') if ad_link_elems else ""
         
-        # Extract page ID and update advertiser
-        page_id = extract_page_id(ad_link)
-        if page_id != "N/A":
-            advertiser = page_id
-            advertiser_cache[page_id] = advertiser
-        
-        # Fallback to cached advertiser
-        if advertiser == "Unknown Advertiser" and page_id in advertiser_cache:
-            advertiser = advertiser_cache[page_id]
-        
         # Extract ad text with broader selectors
-        ad_text_elems = ad.find_elements(By.XPATH, './/div[contains(@class, "body") or contains(@class, "text") or contains(@class, "content") or contains(@class, "_7jyr") or contains(@class, "description") or contains(@class, "ad-text")]')
-        ad_text = ad_text_elems[0].text.replace("\n", " ").strip() if ad_text_elems else "..."
+        ad_text_elems = ad.find_elements(By.XPATH, AD_TEXT_XPATH)
+        ad_text = ad_text_elems[0].text if ad_text_elems else None
         
         # Extract active time
-        active_time_elems = ad.find_elements(By.XPATH, './/span[contains(text(), "Started running on") or contains(text(), " - ")]')
-        active_time = active_time_elems[0].text if active_time_elems else "Unknown"
+        active_time_elems = ad.find_elements(By.XPATH, ACTIVE_TIME_XPATH)
+        active_time = active_time_elems[0].text if active_time_elems else None
         
         # Extract media with more robust selectors
-        image_elems = ad.find_elements(By.XPATH, './/img[@src] | .//div[contains(@style, "background-image")]')
-        image_urls = [img.get_attribute('src') for img in image_elems if img.get_attribute('src') and not img.get_attribute('src').endswith('.gif')]
-        video_elems = ad.find_elements(By.XPATH, './/video[@src] | .//source[@src]')
-        video_urls = [vid.get_attribute('src') for vid in video_elems if vid.get_attribute('src')]
-        
-        print(f"✔️ Parsed ad #{index}: {advertiser}")
-        print(f"   Text: {ad_text[:50]}...")
-        print(f"   Link: {ad_link}")
-        print(f"   Page ID: {page_id}")
-        print(f"   Active Time: {active_time} ({parse_active_time(active_time):.2f} days)")
-        print(f"   Images: {len(image_urls)} found")
-        print(f"   Videos: {len(video_urls)} found")
+        image_urls = [img.get_attribute('src') for img in ad.find_elements(By.XPATH, IMAGE_XPATH)]
+        video_urls = [vid.get_attribute('src') for vid in ad.find_elements(By.XPATH, VIDEO_XPATH)]
         
-        return {
-            "Advertiser": advertiser,
-            "Ad Text": ad_text,
-            "Ad Link": ad_link,
-            "Active Time": active_time,
-            "Image URLs": image_urls,
-            "Video URLs": video_urls,
-            "Page ID": page_id
-        }
+        ad_data = build_raw_ad(advertiser_texts, ad_link, ad_text, active_time, image_urls, video_urls, advertiser_cache)
+        if log.isEnabledFor(logging.DEBUG):
+            # Per-ad details are only formatted (and the active time only parsed) when debug logging is on
+            log.debug(f"✔️ Parsed ad #{index}: {ad_data['Advertiser']}\n"
+                      f"   Text: {ad_data['Ad Text'][:50]}...\n"
+                      f"   Link: {ad_data['Ad Link']}\n"
+                      f"   Page ID: {ad_data['Page ID']}\n"
+                      f"   Active Time: {ad_data['Active Time']} ({parse_active_time(ad_data['Active Time']):.2f} days)\n"
+                      f"   Images: {len(ad_data['Image URLs'])} found\n"
+                      f"   Videos: {len(ad_data['Video URLs'])} found")
+        return ad_data
     except Exception as e:
-        print(f"⚠️ Error collecting raw ad data for ad #{index}: {e}")
+        log.warning(f"⚠️ Error collecting raw ad data for ad #{index}: {e}")
         return {
             "Advertiser": "Unknown Advertiser",
             "Ad Text": "...",
@@ -209,207 +288,493 @@ def extract_ad_data(ad, index, advertiser_cache):
             "Raw HTML": ad.get_attribute("outerHTML")[:500] if ad else "N/A"
         }
 
-def scrape_ads(keyword, country="US"):
-    """Scrape ads from Meta Ad Library."""
-    driver = None
-    advertiser_cache = {}
+def extract_ads_via_js(driver, advertiser_cache, card_xpath=AD_CARD_XPATH, start_index=1):
+    """Extract every ad card on the page with a single execute_script round-trip."""
+    selectors = {
+        "card": card_xpath,
+        "advertiser": ADVERTISER_XPATH,
+        "link": AD_LINK_XPATH,
+        "text": AD_TEXT_XPATH,
+        "active_time": ACTIVE_TIME_XPATH,
+        "image": IMAGE_XPATH,
+        "video": VIDEO_XPATH
+    }
+    cards = driver.execute_script(EXTRACT_ADS_JS, selectors)
+    if cards is None:
+        raise ValueError("JS snapshot returned no result")
+    raw_ads = []
+    for index, card in enumerate(cards, start_index):
+        if card.get("error"):
+            log.warning(f"⚠️ Error collecting raw ad data for ad #{index}: {card['error']}")
+            raw_ads.append({
+                "Advertiser": "Unknown Advertiser",
+                "Ad Text": "...",
+                "Ad Link": "",
+                "Active Time": "Unknown",
+                "Image URLs": [],
+                "Video URLs": [],
+                "Page ID": "N/A",
+                "Error": card["error"],
+                "Raw HTML": card.get("raw_html", "N/A")
+            })
+            continue
+        ad_data = build_raw_ad(card.get("advertiser_texts") or [], card.get("ad_link"), card.get("ad_text"),
+                               card.get("active_time"), card.get("image_urls") or [], card.get("video_urls") or [],
+                               advertiser_cache)
+        log.debug("✔️ Parsed ad #%d: %s (%d images, %d videos)", index, ad_data["Advertiser"],
+                  len(ad_data["Image URLs"]), len(ad_data["Video URLs"]))
+        raw_ads.append(ad_data)
+    return raw_ads
+
+def extract_ads_via_xpath(driver, advertiser_cache, card_xpath=AD_CARD_XPATH, start_index=1):
+    """Extract ad cards element by element with WebDriver calls in a thread pool."""
+    ad_elements = driver.find_elements(By.XPATH, card_xpath)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return list(filter(None, executor.map(lambda x: extract_ad_data(x[0], x[1], advertiser_cache),
+                                              [(ad, i) for i, ad in enumerate(ad_elements, start_index)])))
+
+def scroll_for_new_ads(driver, max_scrolls=MAX_SCROLLS, timeout=SCROLL_TIMEOUT, target_count=TARGET_AD_COUNT):
+    """Scroll until the library is exhausted, yielding an XPath that selects each batch of newly loaded ad cards."""
+    driver.set_script_timeout(timeout + 10)
+    total_cards = 0
+    idle_scrolls = 0
+    for step in range(1, max_scrolls + 1):
+        # Each scroll fetches the next page of results, so it counts against the Ad Library's request limit, but its
+        # duration is mostly the MutationObserver wait for new cards, so only navigation timing drives the limit
+        with metrics.stage("scroll"), get_scheduler().slot(AD_LIBRARY_URL) as attempt:
+            attempt.outcome = None
+            result = driver.execute_async_script(SCROLL_STEP_JS, AD_CARD_XPATH, step, int(timeout * 1000))
+        new_cards = result["new"]
+        total_cards += new_cards
+        metrics.count("ad_cards_loaded", new_cards)
+        log.info(f"📜 Scroll {step}/{max_scrolls}: {new_cards} new ad card(s), {total_cards} total")
+        if new_cards:
+            idle_scrolls = 0
+            yield f'//div[@data-scrape-batch="{step}"]', new_cards
+            if target_count and total_cards >= target_count:
+                log.info(f"🎯 Reached target of {target_count} ad cards. Stopping scroll.")
+                return
+        else:
+            idle_scrolls += 1
+            if idle_scrolls >= IDLE_SCROLL_LIMIT or result["atBottom"]:
+                log.info("ℹ️ No new ads loaded. Stopping scroll.")
+                return
+    log.info(f"ℹ️ Reached scroll cap of {max_scrolls}.")
+
+def collapse_ad_batch(driver, batch_xpath):
+    """Collapse an extracted batch of ad cards in the page to release browser memory."""
+    try:
+        collapsed = driver.execute_script(COLLAPSE_BATCH_JS, batch_xpath)
+        log.info(f"♻️ Recycled {collapsed} processed ad card(s).")
+    except Exception as e:
+        log.warning(f"⚠️ Could not recycle ad cards: {e}")
+
+def process_tree_rss(pid):
+    """Return the resident memory in bytes of a process and all of its children."""
+    if psutil is None or pid is None:
+        return 0
+    try:
+        process = psutil.Process(pid)
+        processes = [process] + process.children(recursive=True)
+    except psutil.Error:
+        return 0
+    total = 0
+    for proc in processes:
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+def python_peak_rss():
+    """Return the peak resident memory of this Python process in bytes."""
+    if resource is None:
+        return process_tree_rss(os.getpid()) if psutil is not None else 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def sample_peak_rss(driver, peak_rss):
+    """Update the running peak RSS of the Python and Chrome processes."""
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid is None and getattr(driver, "service", None) is not None and driver.service.process is not None:
+        browser_pid = driver.service.process.pid
+    peak_rss["python"] = max(peak_rss["python"], python_peak_rss())
+    peak_rss["browser"] = max(peak_rss["browser"], process_tree_rss(browser_pid))
+
+def save_page_snapshot(page_html, keyword, country):
+    """Archive a page_source snapshot for later offline re-parsing."""
+    os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+    safe_keyword = "".join(c for c in keyword if c.isalnum() or c in (' ', '_', '-')).strip().replace(' ', '_')
+    filepath = os.path.join(SNAPSHOT_FOLDER, f"{safe_keyword}_{country}_{datetime.now():%Y%m%d_%H%M%S}.html")
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(page_html)
+    log.info(f"🗄️ Saved page snapshot to {filepath}")
+    return filepath
+
+def has_ad_text(ad_data):
+    """Check whether an ad has usable text for variation counting."""
+    return bool(ad_data["Ad Text"].strip()) and ad_data["Ad Text"] != "..."
+
+def filter_raw_ad(ad_data, index, seen_ads, variations, error_log):
+    """Validate and deduplicate one raw ad; returns an AdRecord, or None if it was skipped or logged as an error."""
+    ad_link = ad_data.get("Ad Link", "")
+    page_id = ad_data.get("Page ID", "N/A")
+    try:
+        ad_text = ad_data["Ad Text"].strip().lower()
+        # Skip ads with insufficient data
+        if not ad_text or ad_text == "..." or not ad_link or not (ad_data["Image URLs"] or ad_data["Video URLs"]):
+            log.debug("⚠️ Skipping ad #%d: Incomplete data (Text: %s, Link: %s, Media: %d images, %d videos)", index,
+                      ad_text[:50], ad_link, len(ad_data["Image URLs"]), len(ad_data["Video URLs"]))
+            error_log.append({
+                "Ad Index": index,
+                "Advertiser": ad_data["Advertiser"],
+                "Ad Text": ad_data["Ad Text"][:100],
+                "Ad Link": ad_link,
+                "Page ID": page_id,
+                "Active Time": ad_data["Active Time"][:100],
+                "Error": ad_data.get("Error", "Incomplete data"),
+                "Raw HTML": ad_data.get("Raw HTML", "N/A")
+            })
+            return None
+        # The hash stands in for the lowercased text, so seen_ads holds no second copy of every ad text
+        text_hash = normalized_text_hash(ad_data["Ad Text"])
+        ad_key = (page_id, text_hash, ad_link)
+        if ad_key in seen_ads:
+            return None
+        seen_ads.add(ad_key)
+        # Network capture adds exact dates, archive IDs and page names
+        return AdRecord(ad_data["Advertiser"], ad_data["Ad Text"], ad_link, page_id, ad_data["Active Time"],
+                        parse_active_time(ad_data["Active Time"]), variations, ad_data["Image URLs"], ad_data["Video URLs"],
+                        archive_id=ad_data.get("Ad Archive ID"), start_date=ad_data.get("Start Date"),
+                        end_date=ad_data.get("End Date"), collation_count=ad_data.get("Collation Count"),
+                        page_name=ad_data.get("Page Name") or None, text_hash=text_hash)
+    except Exception as e:
+        log.warning(f"⚠️ Error parsing ad #{index}: {e}")
+        error_log.append({
+            "Ad Index": index,
+            "Advertiser": ad_data["Advertiser"],
+            "Ad Text": ad_data["Ad Text"][:100],
+            "Ad Link": ad_link,
+            "Page ID": page_id,
+            "Active Time": ad_data["Active Time"][:100],
+            "Error": str(e),
+            "Raw HTML": ad_data.get("Raw HTML", "N/A")
+        })
+        return None
+
+def save_error_log(error_log, debug_log=DEBUG_LOG):
+    """Write problematic ads to the debug CSV."""
+    if not error_log:
+        return
+    with open(debug_log, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=["Ad Index", "Advertiser", "Ad Text", "Ad Link", "Page ID", "Active Time", "Error", "Raw HTML"])
+        writer.writeheader()
+        writer.writerows(error_log)
+    log.info(f"📁 Saved {len(error_log)} problematic ads to {debug_log}")
+
+@timed("dedup")
+def process_raw_ads(raw_ads, debug_log=DEBUG_LOG, store=None):
+    """Filter incomplete ads, deduplicate, count variations and log problematic ads."""
     error_log = []
+    ad_texts = [ad["Ad Text"] for ad in raw_ads if has_ad_text(ad)]
+    ad_frequency = variation_counts(ad_texts) if NEAR_DUPLICATE_VARIATIONS else Counter(ad_texts)
+    ads = []
+    seen_ads = set()
+    for index, ad_data in enumerate(raw_ads, start=1):
+        variations = ad_frequency.get(ad_data["Ad Text"], 1) if has_ad_text(ad_data) else 1
+        ad_entry = filter_raw_ad(ad_data, index, seen_ads, variations, error_log)
+        if ad_entry is not None:
+            ads.append(ad_entry)
+    save_error_log(error_log, debug_log)
+    metrics.count("ads_kept", len(ads))
+    metrics.count("ads_skipped", len(error_log))
+    if store is not None:
+        store.record_ads(ads)
+        report_store_summary(ads)
+    return ads
+
+def iter_network_ads(driver, error_log, variation_index, store=None):
+    """Filter, deduplicate and store each network-captured ad as soon as its response arrives, yielding AdRecords.
+
+    Ad Variations holds the cluster size seen so far; callers refresh it from variation_index once capture ends.
+    """
+    seen_ads = set()
+    for index, ad_data in enumerate(stream_network_ads(driver), start=1):
+        log.debug("📡 Captured ad #%d: %s (%s)", index, ad_data["Advertiser"], ad_data["Active Time"])
+        if has_ad_text(ad_data):
+            variation_index.add(ad_data["Ad Text"])
+        variations = variation_index.cluster_size(ad_data["Ad Text"]) if has_ad_text(ad_data) else 1
+        ad = filter_raw_ad(ad_data, index, seen_ads, variations, error_log)
+        if ad is None:
+            continue
+        if store is not None:
+            store.record_ads([ad])
+        yield ad
+
+def report_store_summary(ads):
+    """Log how many of the stored ads were new to the ad store."""
+    known = sum(1 for ad in ads if ad.seen_before)
+    log.info(f"🗃️ Ad store: {len(ads) - known} new ad(s), {known} already known.")
+
+def is_block_page(driver):
+    """Check whether the loaded page is the Ad Library's rate-limit page instead of results."""
+    text = driver.execute_script(BLOCK_PAGE_JS) or ""
+    return any(marker in text for marker in BLOCK_PAGE_MARKERS)
+
+def open_search_page(driver, keyword, country="US", extraction_mode=EXTRACTION_MODE):
+    """Load the Ad Library search results for a keyword/country and dismiss the cookie popup."""
+    search_url = (
+        f"{AD_LIBRARY_URL}?active_status=&ad_type=all"
+        f"&country={country}&q={keyword}&sort_data[direction]=desc&sort_data[mode]=relevancy_monthly_grouped&search_type=keyword_unordered"
+    )
+    log.info(f"🔍 Searching for ads with keyword: {keyword}")
+    if extraction_mode == "network":
+        driver.get_log("performance")  # Drop events left over from a previous job on a reused driver
+
+    def load():
+        try:
+            driver.get(search_url)
+            WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        except TimeoutException as e:
+            raise RetryableError(f"Page load timed out: {e.msg}")
+        if is_block_page(driver):
+            raise ThrottledError("Ad Library served a rate-limit page")
+
+    with metrics.stage("page_load"):
+        get_scheduler().call(AD_LIBRARY_URL, load, NAVIGATION_RETRIES, label=f"search for '{keyword}'")
+    log.info("✅ Page loaded successfully.")
+    report_first_page_load()
     try:
-        driver = init_driver()
-        search_url = (
-            f"https://www.facebook.com/ads/library/?active_status=&ad_type=all"
-            f"&country={country}&q={keyword}&sort_data[direction]=desc&sort_data[mode]=relevancy_monthly_grouped&search_type=keyword_unordered"
+        cookie_btn = WebDriverWait(driver, 5).until(
+            EC.element_to_be_clickable((By.XPATH, '//button[contains(text(), "Allow") or contains(text(), "Accept")]'))
         )
-        print(f"🔍 Searching for ads with keyword: {keyword}")
-        driver.get(search_url)
-        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        print("✅ Page loaded successfully.")
-        try:
-            cookie_btn = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH, '//button[contains(text(), "Allow") or contains(text(), "Accept")]'))
-            )
-            cookie_btn.click()
-            print("🍪 Accepted cookies.")
-            time.sleep(1)
-        except:
-            print("ℹ️ No cookie popup detected.")
-        last_ad_count = 0
-        for i in range(NUM_SCROLLS):
-            driver.execute_script("window.scrollBy(0, 1000);")
-            print(f"📜 Scrolling {i+1}/{NUM_SCROLLS}")
-            time.sleep(2)  # Increased delay for dynamic content
-            ad_elements = driver.find_elements(By.XPATH, '//div[.//span[contains(text(), "Sponsored")]]')
-            current_ad_count = len(ad_elements)
-            print(f"🔎 Found {current_ad_count} ad(s) after scroll {i+1}")
-            if current_ad_count == last_ad_count and i > 0:
-                print("ℹ️ No new ads loaded. Stopping scroll.")
-                break
-            last_ad_count = current_ad_count
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            raw_ads = list(filter(None, executor.map(lambda x: extract_ad_data(x[0], x[1], advertiser_cache), 
-                                                    [(ad, i) for i, ad in enumerate(ad_elements, 1)])))
-        ad_text_counts = Counter(ad["Ad Text"] for ad in raw_ads if ad["Ad Text"].strip() and ad["Ad Text"] != "...")
-        ad_frequency = {ad_text: count for ad_text, count in ad_text_counts.items()}
-        ads = []
-        seen_ads = set()
-        for index, ad_data in enumerate(raw_ads, start=1):
-            try:
-                ad_text = ad_data["Ad Text"].strip().lower()
-                ad_link = ad_data["Ad Link"]
-                page_id = ad_data["Page ID"]
-                # Skip ads with insufficient data
-                if not ad_text or ad_text == "..." or not ad_link or not (ad_data["Image URLs"] or ad_data["Video URLs"]):
-                    print(f"⚠️ Skipping ad #{index}: Incomplete data (Text: {ad_text[:50]}, Link: {ad_link}, Media: {len(ad_data['Image URLs'])} images, {len(ad_data['Video URLs'])} videos)")
-                    error_log.append({
-                        "Ad Index": index,
-                        "Advertiser": ad_data["Advertiser"],
-                        "Ad Text": ad_data["Ad Text"][:100],
-                        "Ad Link": ad_link,
-                        "Page ID": page_id,
-                        "Active Time": ad_data["Active Time"][:100],
-                        "Error": ad_data.get("Error", "Incomplete data"),
-                        "Raw HTML": ad_data.get("Raw HTML", "N/A")
-                    })
-                    continue
-                ad_key = (page_id, ad_text, ad_link)
-                if ad_key in seen_ads:
-                    continue
-                seen_ads.add(ad_key)
-                days_active = parse_active_time(ad_data["Active Time"])
-                variations = ad_frequency.get(ad_data["Ad Text"], 1) if ad_data["Ad Text"].strip() and ad_data["Ad Text"] != "..." else 1
-                ad_entry = {
-                    "Advertiser": ad_data["Advertiser"],
-                    "Ad Text": ad_data["Ad Text"],
-                    "Ad Link": ad_link,
-                    "Page ID": page_id,
-                    "Active Time": ad_data["Active Time"],
-                    "Days Active": days_active,
-                    "Ad Variations": variations,
-                    "Image URLs": ad_data["Image URLs"],
-                    "Video URLs": ad_data["Video URLs"]
-                }
-                ads.append(ad_entry)
-            except Exception as e:
-                print(f"⚠️ Error parsing ad #{index}: {e}")
-                error_log.append({
-                    "Ad Index": index,
-                    "Advertiser": ad_data["Advertiser"],
-                    "Ad Text": ad_data["Ad Text"][:100],
-                    "Ad Link": ad_link,
-                    "Page ID": page_id,
-                    "Active Time": ad_data["Active Time"][:100],
-                    "Error": str(e),
-                    "Raw HTML": ad_data.get("Raw HTML", "N/A")
-                })
-        if error_log:
-            with open(DEBUG_LOG, "w", newline="", encoding="utf-8-sig") as f:
-                writer = csv.DictWriter(f, fieldnames=["Ad Index", "Advertiser", "Ad Text", "Ad Link", "Page ID", "Active Time", "Error", "Raw HTML"])
-                writer.writeheader()
-                writer.writerows(error_log)
-            print(f"📁 Saved {len(error_log)} problematic ads to {DEBUG_LOG}")
+        cookie_btn.click()
+        log.info("🍪 Accepted cookies.")
+        time.sleep(1)
+    except:
+        log.info("ℹ️ No cookie popup detected.")
+
+def iter_raw_ad_batches(driver, extraction_mode=EXTRACTION_MODE, advertiser_cache=None, recycle_nodes=RECYCLE_AD_NODES,
+                        peak_rss=None, max_scrolls=MAX_SCROLLS):
+    """Scroll the results page and yield the raw ads extracted from each batch of newly loaded cards."""
+    advertiser_cache = {} if advertiser_cache is None else advertiser_cache
+    extracted = 0
+    for batch_xpath, new_cards in scroll_for_new_ads(driver, max_scrolls):
+        if extraction_mode == "html":
+            continue
+        batch = None
+        with metrics.stage("extraction"):
+            if extraction_mode == "js":
+                try:
+                    batch = extract_ads_via_js(driver, advertiser_cache, batch_xpath, extracted + 1)
+                except Exception as e:
+                    log.warning(f"⚠️ JS snapshot extraction failed: {e}. Falling back to XPath extraction.")
+            if batch is None:
+                batch = extract_ads_via_xpath(driver, advertiser_cache, batch_xpath, extracted + 1)
+        extracted += len(batch)
+        metrics.count("raw_ads_extracted", len(batch))
+        drain_network_log(driver)
+        if peak_rss is not None:
+            sample_peak_rss(driver, peak_rss)
+        if recycle_nodes:
+            collapse_ad_batch(driver, batch_xpath)
+        yield batch
+
+def scrape_page(driver, keyword, country="US", extraction_mode=EXTRACTION_MODE, recycle_nodes=RECYCLE_AD_NODES,
+                debug_log=DEBUG_LOG, store=None):
+    """Scrape ads for one keyword/country with an already running driver."""
+    advertiser_cache = {}
+    peak_rss = {"python": 0, "browser": 0}
+    open_search_page(driver, keyword, country, extraction_mode)
+    if extraction_mode == "network":
+        error_log = []
+        variation_index = NearDuplicateIndex(exact=not NEAR_DUPLICATE_VARIATIONS)
+        ads = list(iter_network_ads(driver, error_log, variation_index, store))
+        for ad in ads:
+            ad.variations = variation_index.cluster_size(ad.ad_text)
+        save_error_log(error_log, debug_log)
+        metrics.count("ads_kept", len(ads))
+        metrics.count("ads_skipped", len(error_log))
+        if store is not None:
+            report_store_summary(ads)
         return ads
+    raw_ads = []
+    for batch in iter_raw_ad_batches(driver, extraction_mode, advertiser_cache, recycle_nodes, peak_rss):
+        raw_ads.extend(batch)
+    if extraction_mode == "html" or SAVE_SNAPSHOTS:
+        page_html = driver.page_source
+        metrics.count("page_source_bytes", len(page_html.encode("utf-8")))
+        if SAVE_SNAPSHOTS:
+            save_page_snapshot(page_html, keyword, country)
+    if extraction_mode == "html":
+        try:
+            with metrics.stage("extraction"):
+                raw_ads = parse_ads_from_html(page_html, advertiser_cache)
+            log.info(f"⚡ Parsed {len(raw_ads)} ad(s) from the page snapshot.")
+        except Exception as e:
+            log.warning(f"⚠️ Offline HTML parsing failed: {e}. Falling back to XPath extraction.")
+            raw_ads = extract_ads_via_xpath(driver, advertiser_cache)
+    sample_peak_rss(driver, peak_rss)
+    drain_network_log(driver)
+    metrics.set_info(peak_rss_python_bytes=peak_rss["python"], peak_rss_browser_bytes=peak_rss["browser"])
+    if psutil is None:
+        log.info(f"🧠 Peak RSS: Python {peak_rss['python'] / 1e6:.1f} MB (install psutil to measure Chrome)")
+    else:
+        log.info(f"🧠 Peak RSS: Python {peak_rss['python'] / 1e6:.1f} MB, Chrome {peak_rss['browser'] / 1e6:.1f} MB")
+    return process_raw_ads(raw_ads, debug_log, store)
+
+def scrape_ads(keyword, country="US", extraction_mode=EXTRACTION_MODE, recycle_nodes=RECYCLE_AD_NODES,
+               debug_log=DEBUG_LOG, store=None):
+    """Scrape ads from Meta Ad Library."""
+    driver = None
+    try:
+        driver = init_driver(capture_network=extraction_mode == "network")
+        return scrape_page(driver, keyword, country, extraction_mode, recycle_nodes, debug_log, store)
     finally:
         if driver is not None:
             try:
                 time.sleep(1)
                 driver.quit()
-                print("✅ Driver closed successfully.")
+                log.info("✅ Driver closed successfully.")
             except Exception as e:
-                print(f"ℹ️ Non-critical error during driver cleanup: {e}. Continuing execution.")
+                log.info(f"ℹ️ Non-critical error during driver cleanup: {e}. Continuing execution.")
 
 def save_to_csv(data, filename):
     """Save ad data to CSV."""
     if not data:
-        print("⚠️ No data to save.")
+        log.warning("⚠️ No data to save.")
         return
-    csv_data = [{k: v for k, v in ad.items() if k not in ["Image URLs", "Video URLs"]} for ad in data]
-    for row in csv_data:
+    csv_data = []
+    for ad in data:
+        row = ad.to_dict() if isinstance(ad, AdRecord) else dict(ad)
+        row.pop("Image URLs", None)
+        row.pop("Video URLs", None)
         for key, value in row.items():
             if isinstance(value, str):
                 row[key] = value.replace('\n', ' ').replace('\r', ' ')
+        csv_data.append(row)
     try:
         with open(filename, "w", newline="", encoding="utf-8-sig") as f:
             writer = csv.DictWriter(f, fieldnames=csv_data[0].keys(), quoting=csv.QUOTE_MINIMAL)
             writer.writeheader()
             writer.writerows(csv_data)
-        print(f"📁 Saved {len(data)} ads to {filename}")
+        log.info(f"📁 Saved {len(data)} ads to {filename}")
     except Exception as e:
-        print(f"⚠️ Error saving to CSV: {e}")
+        log.warning(f"⚠️ Error saving to CSV: {e}")
 
-def download_all_media(ad, ad_index):
+def download_all_media(ad, ad_index, media_folder=MEDIA_FOLDER, downloader=None):
     """Download all media for an ad."""
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = []
-        for j, img_url in enumerate(ad["Image URLs"], 1):
-            filename_base = f"ad_{ad_index}_{ad['Advertiser']}_image_{j}"
-            futures.append(executor.submit(download_media, img_url, MEDIA_FOLDER, filename_base, "image"))
-        for j, vid_url in enumerate(ad["Video URLs"], 1):
-            filename_base = f"ad_{ad_index}_{ad['Advertiser']}_video_{j}"
-            futures.append(executor.submit(download_media, vid_url, MEDIA_FOLDER, filename_base, "video"))
-        for future in futures:
-            future.result()
-
-def show_top_5_ads(ads):
-    """Display and save media for top 5 ads based on hours active, ensuring all have media."""
-    if not ads:
-        print("⚠️ No ads to rank.")
-        return []
+    downloader = downloader or get_default_downloader()
+    futures = downloader.download_ad(ad, ad_index, media_folder)
+    return [path for path in (future.result() for future in futures) if path]
 
+def rank_top_ads(ads, top_k=5):
+    """Return the top_k distinct ads with media, ranked by hours active (set on each returned AdRecord)."""
+    ads = [as_record(ad) for ad in ads]
     for ad in ads:
-        days_active = ad["Days Active"] if ad["Days Active"] > 0 else DEFAULT_ACTIVE_DAYS
-        ad["Hours Active"] = days_active * 24
+        ad.hours_active = (ad.days_active if ad.days_active > 0 else DEFAULT_ACTIVE_DAYS) * 24
 
-    sorted_ads = sorted(ads, key=lambda x: x["Hours Active"], reverse=True)
+    sorted_ads = sorted(ads, key=lambda x: x.hours_active, reverse=True)
     top_ads = []
     seen_keys = set()
 
     for ad in sorted_ads:
-        ad_key = (ad["Ad Text"][:100], ad["Ad Link"], ad["Active Time"])
+        ad_key = (ad.ad_text[:100], ad.ad_link, ad.active_time)
         # Only include ads with at least one image or video
-        if ad_key not in seen_keys and (ad["Image URLs"] or ad["Video URLs"]):
+        if ad_key not in seen_keys and (ad.image_urls or ad.video_urls):
             top_ads.append(ad)
             seen_keys.add(ad_key)
-        if len(top_ads) == 5:
+        if len(top_ads) == top_k:
             break
+    return top_ads
+
+def show_top_5_ads(ads, media_folder=MEDIA_FOLDER, store=None, downloader=None):
+    """Display and save media for top 5 ads based on hours active, ensuring all have media.
 
+    With a downloader, media downloads are queued and run in the background; call downloader.close() to wait.
+    """
+    if not ads:
+        log.warning("⚠️ No ads to rank.")
+        return []
+
+    top_ads = rank_top_ads(ads, 5)
     if not top_ads:
-        print("⚠️ No valid ads with media to display after filtering.")
+        log.warning("⚠️ No valid ads with media to display after filtering.")
         return []
 
-    print("\n🏆 Top 5 Ads Based on Hours Active in Meta Ad Library:")
+    log.info("\n🏆 Top 5 Ads Based on Hours Active in Meta Ad Library:")
     for i, ad in enumerate(top_ads, 1):
-        print(f"{i}. Advertiser: {ad['Advertiser']}")
-        print(f"   Ad Text: {ad['Ad Text'][:100]}...")
-        print(f"   Ad Link: {ad['Ad Link']}")
-        print(f"   Page ID: {ad['Page ID']}")
-        print(f"   Active Time: {ad['Active Time']} ({ad['Hours Active']:.2f} hours active)")
-        print(f"   Ad Variations: {ad['Ad Variations']}")
-        print(f"   Images: {len(ad['Image URLs'])} found")
-        print(f"   Videos: {len(ad['Video URLs'])} found")
-        download_all_media(ad, i)
+        log.info(f"{i}. Advertiser: {ad.advertiser}")
+        log.info(f"   Ad Text: {ad.ad_text[:100]}...")
+        log.info(f"   Ad Link: {ad.ad_link}")
+        log.info(f"   Page ID: {ad.page_id}")
+        log.info(f"   Active Time: {ad.active_time} ({ad.hours_active:.2f} hours active)")
+        log.info(f"   Ad Variations: {ad.variations}")
+        log.info(f"   Images: {len(ad.image_urls)} found")
+        log.info(f"   Videos: {len(ad.video_urls)} found")
+        media_paths = store.get_media_paths(ad) if store is not None and ad.seen_before else None
+        if media_paths:
+            log.info(f"   Media already downloaded: {len(media_paths)} file(s)")
+            continue
+        if downloader is not None:
+            on_done = (lambda paths, ad=ad: store.save_media_paths(ad, paths) if paths else None) if store is not None else None
+            downloader.download_ad(ad, i, media_folder, on_done)
+            continue
+        media_paths = download_all_media(ad, i, media_folder)
+        if store is not None and media_paths:
+            store.save_media_paths(ad, media_paths)
     
     return top_ads
 
 if __name__ == "__main__":
-    if os.path.exists(MEDIA_FOLDER):
+    # Media of stored ads is reused across runs, so the folder is only cleared without a store
+    if os.path.exists(MEDIA_FOLDER) and not USE_AD_STORE:
         try:
             shutil.rmtree(MEDIA_FOLDER)
-            print(f"🗑️ Cleared {MEDIA_FOLDER} folder.")
+            log.info(f"🗑️ Cleared {MEDIA_FOLDER} folder.")
         except Exception as e:
-            print(f"⚠️ Error clearing {MEDIA_FOLDER} folder: {e}")
+            log.warning(f"⚠️ Error clearing {MEDIA_FOLDER} folder: {e}")
     os.makedirs(MEDIA_FOLDER, exist_ok=True)
-    print(f"📁 Created empty {MEDIA_FOLDER} folder.")
+    log.info(f"📁 Using {MEDIA_FOLDER} folder.")
 
-    csv_files = glob.glob("*.csv")
+    # Only clear this run's own outputs so checkpoints from job_runner.py and other runs survive
+    csv_files = [f for f in (OUTPUT_FILE, DEBUG_LOG, METRICS_FILE, LOW_CONFIDENCE_FILE) if os.path.exists(f)]
     for csv_file in csv_files:
         try:
             os.remove(csv_file)
-            print(f"🗑️ Deleted CSV file: {csv_file}")
+            log.info(f"🗑️ Deleted CSV file: {csv_file}")
         except Exception as e:
-            print(f"⚠️ Error deleting CSV file {csv_file}: {e}")
+            log.warning(f"⚠️ Error deleting CSV file {csv_file}: {e}")
 
-    ad_data = scrape_ads(KEYWORD, COUNTRY_CODE)
-    save_to_csv(ad_data, OUTPUT_FILE)
-    top_5_ads = show_top_5_ads(ad_data)
-    print("\n📊 Running ad metrics estimation...")
-    run_estimation(top_5_ads)
\ No newline at end of file
+    if WARM_UP_CLASSIFIER:
+        warm_up_classifier()
+    store = AdStore() if USE_AD_STORE else None
+    metrics.set_info(keyword=KEYWORD, country=COUNTRY_CODE, extraction_mode=EXTRACTION_MODE)
+    ad_data = scrape_ads(KEYWORD, COUNTRY_CODE, store=store)
+    run_id = new_run_id()
+    if "csv" in OUTPUT_FORMATS:
+        save_to_csv(ad_data, OUTPUT_FILE)
+    parquet_saved = False
+    if "parquet" in OUTPUT_FORMATS:
+        try:
+            parquet_saved = save_ads_parquet(ad_data, KEYWORD, COUNTRY_CODE, run_id) is not None
+        except ImportError as e:
+            log.warning(f"⚠️ Skipping Parquet output: {e}")
+    if parquet_saved:
+        # Ranking only needs a few columns, so read back just those from this run's partition
+        ad_data = load_ads_for_ranking(KEYWORD, COUNTRY_CODE, run_id)
+    downloader = MediaDownloader()
+    top_5_ads = show_top_5_ads(ad_data, store=store, downloader=downloader)
+    log.info("\n📊 Running ad metrics estimation...")
+    estimates = run_estimation(top_5_ads, store=store)
+    if parquet_saved:
+        save_metrics_parquet(estimates, KEYWORD, COUNTRY_CODE, run_id)
+    with metrics.stage("downloads_wait"):
+        downloader.close()
+    if FINGERPRINT_CREATIVES:
+        with metrics.stage("fingerprinting"):
+            fingerprint_folder(MEDIA_FOLDER)
+    if SAVE_RUN_REPORT:
+        report_blocked_requests()
+        metrics.set_info(rate_limits=get_scheduler().snapshot())
+        metrics.save(RUN_REPORT_FILE)
\ No newline at end of file
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import estimate_metrics as estimator
+from ad_record import as_record
+from browser_pool import BrowserPool
+from rate_limiter import get_scheduler
+from run_metrics import get_logger, set_log_level, metrics
+from scrape import rank_top_ads, EXTRACTION_MODE, MAX_SCROLLS, COUNTRY_CODE
+from stream_pipeline import run_streaming_pipeline, MICRO_BATCH_SIZE
+
+log = get_logger("scrape_daemon")
+
+# SETTINGS
+DAEMON_HOST = "127.0.0.1"  # Loopback only: the API has no authentication
+DAEMON_PORT = 8787
+DAEMON_POOL_SIZE = 2  # Warm Chrome instances, and so the number of scrape jobs run at once; further jobs wait for a driver
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 100
+MAX_SCROLL_DEPTH = 200
+MAX_REQUEST_BYTES = 5_000_000
+JOB_OUTPUT_FOLDER = "daemon_jobs"  # Per-job CSV outputs, so concurrent jobs never write the same file
+COUNTRY_RE = re.compile(r"^(ALL|[A-Z]{2})$")
+
+class BadRequest(ValueError):
+    """A job request with missing or invalid parameters."""
+
+def parse_json_body(raw):
+    try:
+        body = json.loads(raw or b"{}")
+    except ValueError as e:
+        raise BadRequest(f"Invalid JSON: {e}")
+    if not isinstance(body, dict):
+        raise BadRequest("Request body must be a JSON object")
+    return body
+
+def int_param(body, name, default, minimum, maximum):
+    value = body.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= maximum:
+        raise BadRequest(f"{name} must be an integer between {minimum} and {maximum}")
+    return value
+
+def parse_scrape_job(body):
+    """Validate a /scrape request: keyword (required), country, max_scrolls and top_k."""
+    keyword = body.get("keyword")
+    if not isinstance(keyword, str) or not keyword.strip() or len(keyword) > 200:
+        raise BadRequest("keyword must be a non-empty string of at most 200 characters")
+    country = str(body.get("country", COUNTRY_CODE)).strip().upper()
+    if not COUNTRY_RE.match(country):
+        raise BadRequest("country must be a two-letter country code or ALL")
+    return {"keyword": keyword.strip(), "country": country,
+            "max_scrolls": int_param(body, "max_scrolls", MAX_SCROLLS, 1, MAX_SCROLL_DEPTH),
+            "top_k": int_param(body, "top_k", DEFAULT_TOP_K, 1, MAX_TOP_K)}
+
+def parse_estimate_job(body):
+    """Validate an /estimate request: either a list of ad rows, or a keyword/country/top_k to load from the dataset."""
+    if "ads" not in body:
+        return parse_scrape_job(body)
+    if not isinstance(body["ads"], list):
+        raise BadRequest("ads must be a list of ad rows")
+    try:
+        return {"ads": [as_record(ad) for ad in body["ads"]]}
+    except (KeyError, TypeError, ValueError) as e:
+        raise BadRequest(f"Invalid ad row: {e}")
+
+def json_default(value):
+    """Serialize numpy scalars and anything else json does not know as plain values."""
+    return value.item() if hasattr(value, "item") else str(value)
+
+class NdjsonStream:
+    """Writes one JSON event per line to a client; a disconnected client stops the output, not the job."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.connected = True
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = (json.dumps(event, default=json_default, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if not self.connected:
+                return
+            try:
+                self.wfile.write(line)
+                self.wfile.flush()
+            except OSError:
+                self.connected = False
+                log.warning("⚠️ Client disconnected; finishing the job without streaming.")
+
+class ScrapeDaemon:
+    """Keeps warm Chrome drivers and the loaded classifier in memory and serves scrape/estimate jobs over local HTTP.
+
+    POST /scrape streams {"event": "ad"} lines as ads are classified, then the top-K ads and a "done" summary.
+    POST /estimate estimates metrics for posted ads (or the latest stored run of a keyword).
+    GET /health and GET /metrics report pool, classifier and run counters.
+    """
+
+    def __init__(self, host=DAEMON_HOST, port=DAEMON_PORT, pool_size=DAEMON_POOL_SIZE, extraction_mode=EXTRACTION_MODE,
+                 output_folder=JOB_OUTPUT_FOLDER):
+        self.pool = BrowserPool(pool_size, capture_network=extraction_mode == "network")
+        self.extraction_mode = extraction_mode
+        self.output_folder = output_folder
+        self.started = time.time()
+        self.jobs_running = 0
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self._lock = threading.Lock()
+        os.makedirs(output_folder, exist_ok=True)
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+
+    def warm_up(self, drivers=None):
+        """Load the classifier and launch drivers up front, so no job pays the cold start."""
+        start = time.time()
+        classifier_thread = estimator.warm_up_classifier()
+        drivers = self.pool.size if drivers is None else min(drivers, self.pool.size)
+        launched = []
+        try:
+            for _ in range(drivers):
+                launched.append(self.pool.acquire())
+        except Exception as e:
+            log.warning(f"⚠️ Could not pre-launch a Chrome driver: {e}. Jobs will launch drivers on demand.")
+        for driver in launched:
+            self.pool.release(driver)
+        classifier_thread.join()
+        log.info(f"🔥 Warmed up {len(launched)} driver(s) and the classifier in {time.time() - start:.1f}s.")
+
+    def job_files(self, job_id):
+        """Per-job output filenames inside the daemon's output folder."""
+        return {name: os.path.join(self.output_folder, f"{job_id}_{name}.csv")
+                for name in ("stream", "ads", "metrics", "errors", "low_confidence")}
+
+    def run_scrape(self, job, stream):
+        """Scrape one job on a pooled driver, streaming classified ads as they arrive."""
+        job_id = uuid.uuid4().hex[:12]
+        files = self.job_files(job_id)
+        start = time.perf_counter()
+        stream.emit({"event": "accepted", "job": job_id, **job})
+        driver = self.pool.acquire()
+        queued = time.perf_counter() - start
+        log.info(f"🚀 Job {job_id}: {job['keyword']!r} in {job['country']}, {job['max_scrolls']} scroll(s), "
+                 f"top {job['top_k']} (waited {queued:.2f}s for a driver)")
+        streamed = 0
+
+        def on_result(row):
+            nonlocal streamed
+            streamed += 1
+            stream.emit({"event": "ad", "job": job_id, "row": row})
+
+        broken = False
+        try:
+            ads = run_streaming_pipeline(job["keyword"], job["country"], self.extraction_mode, files["stream"],
+                                         MICRO_BATCH_SIZE, driver=driver, on_result=on_result, output_file=files["ads"],
+                                         metrics_file=files["metrics"], debug_log=files["errors"],
+                                         max_scrolls=job["max_scrolls"], low_confidence_file=files["low_confidence"])
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.pool.release(driver, broken)
+        top_ads = rank_top_ads(ads, job["top_k"])
+        stream.emit({"event": "top", "job": job_id,
+                     "ads": [dict(ad.to_dict(), **{"Hours Active": ad.hours_active}) for ad in top_ads]})
+        stream.emit({"event": "done", "job": job_id, "ads": len(ads), "streamed": streamed,
+                     "queue_seconds": round(queued, 3), "seconds": round(time.perf_counter() - start, 3),
+                     "files": {name: path for name, path in files.items() if os.path.exists(path)}})
+
+    def run_estimate(self, job, stream):
+        """Estimate metrics for posted ads, or for the top_k ads of a keyword's latest stored run."""
+        job_id = uuid.uuid4().hex[:12]
+        start = time.perf_counter()
+        if "ads" in job:
+            ads = job["ads"]
+        else:
+            from columnar_output import load_ads_for_ranking, latest_run_id, ADS_TABLE
+            run_id = latest_run_id(ADS_TABLE, job["keyword"], job["country"])
+            if run_id is None:
+                raise ValueError(f"No stored run for {job['keyword']!r} in {job['country']}")
+            ads = rank_top_ads(load_ads_for_ranking(job["keyword"], job["country"], run_id), job["top_k"])
+        stream.emit({"event": "accepted", "job": job_id, "ads": len(ads)})
+        results = estimator.estimate_metrics(ads, self.job_files(job_id)["low_confidence"])
+        for row in results:
+            stream.emit({"event": "metric", "job": job_id, "row": row})
+        stream.emit({"event": "done", "job": job_id, "estimates": len(results),
+                     "seconds": round(time.perf_counter() - start, 3)})
+
+    def health(self):
+        with self._lock:
+            jobs = {"running": self.jobs_running, "done": self.jobs_done, "failed": self.jobs_failed}
+        return {"status": "ok", "uptime_seconds": round(time.time() - self.started, 1), "extraction_mode": self.extraction_mode,
+                "pool": self.pool.snapshot(), "classifier_loaded": estimator.classifier_loaded,
+                "classifier_ready": estimator.classifier is not None, "jobs": jobs}
+
+    def run_job(self, handler, name, body):
+        """Run a job for a request handler, turning bad parameters into a 400 before any output is streamed."""
+        try:
+            body = parse_json_body(body)
+            job = parse_scrape_job(body) if name == "scrape" else parse_estimate_job(body)
+        except BadRequest as e:
+            handler.respond_json(400, {"error": str(e)})
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.end_headers()
+        stream = NdjsonStream(handler.wfile)
+        with self._lock:
+            self.jobs_running += 1
+        try:
+            if name == "scrape":
+                self.run_scrape(job, stream)
+            else:
+                self.run_estimate(job, stream)
+        except Exception as e:
+            log.warning(f"⚠️ {name.capitalize()} job failed: {e}")
+            stream.emit({"event": "error", "error": str(e)})
+            failed = True
+        else:
+            failed = False
+        with self._lock:
+            self.jobs_running -= 1
+            if failed:
+                self.jobs_failed += 1
+            else:
+                self.jobs_done += 1
+
+    def make_handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/health":
+                    self.respond_json(200, daemon.health())
+                elif path == "/metrics":
+                    self.respond_json(200, dict(metrics.report(), rate_limits=get_scheduler().snapshot()))
+                else:
+                    self.respond_json(404, {"error": "Not found"})
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                if path not in ("/scrape", "/estimate"):
+                    self.respond_json(404, {"error": "Not found"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_REQUEST_BYTES:
+                    self.respond_json(413, {"error": f"Request body over {MAX_REQUEST_BYTES} bytes"})
+                    return
+                daemon.run_job(self, path[1:], self.rfile.read(length))
+
+            def respond_json(self, status, body):
+                data = json.dumps(body, default=json_default).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                log.debug("%s %s", self.address_string(), format % args)
+
+        return Handler
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def serve_forever(self):
+        log.info(f"🛰️ Scrape daemon listening on {self.url} (Ctrl+C to stop)")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.server.server_close()
+        self.pool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve scrape and estimate jobs from warm browsers and a loaded classifier over a local HTTP API.",
+        epilog=f"Example: curl -N -X POST http://{DAEMON_HOST}:{DAEMON_PORT}/scrape "
+               "-d '{\"keyword\": \"Fermented durian\", \"country\": \"US\", \"max_scrolls\": 10, \"top_k\": 5}'")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    parser.add_argument("--pool-size", type=int, default=DAEMON_POOL_SIZE, help="Number of warm Chrome instances")
+    parser.add_argument("--warm-drivers", type=int, default=None, help="Drivers to launch at startup (default: pool size)")
+    parser.add_argument("--mode", default=EXTRACTION_MODE, choices=["js", "xpath", "network"], help="Extraction mode")
+    parser.add_argument("--output-folder", default=JOB_OUTPUT_FOLDER, help="Folder for per-job CSV outputs")
+    parser.add_argument("--log-level", default=None, help="DEBUG, INFO or WARNING (default from run_metrics.LOG_LEVEL)")
+    args = parser.parse_args()
+
+    if args.log_level:
+        set_log_level(args.log_level.upper())
+    daemon = ScrapeDaemon(args.host, args.port, args.pool_size, args.mode, args.output_folder)
+    daemon.warm_up(args.warm_drivers)
+    daemon.serve_forever()
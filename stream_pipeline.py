@@ -0,0 +1,243 @@
+import argparse
+import csv
+import os
+import queue
+import threading
+import time
+from scrape import (init_driver, open_search_page, iter_raw_ad_batches, filter_raw_ad, has_ad_text, save_error_log,
+                    save_to_csv, EXTRACTION_MODE, RECYCLE_AD_NODES, OUTPUT_FILE, DEBUG_LOG, OUTPUT_FORMATS,
+                    NEAR_DUPLICATE_VARIATIONS, MAX_SCROLLS)
+from network_capture import stream_network_ads
+from estimate_metrics import predict_industry, save_metrics_to_csv, OUTPUT_FILE as METRICS_FILE, LOW_CONFIDENCE_FILE
+from metrics_engine import estimate_metrics_columnar
+from near_duplicates import NearDuplicateIndex
+from columnar_output import new_run_id, save_ads_parquet, save_metrics_parquet
+from run_metrics import get_logger
+
+log = get_logger("stream_pipeline")
+
+# SETTINGS
+STREAM_OUTPUT_FILE = "meta_ads_stream.csv"
+MICRO_BATCH_SIZE = 16
+BATCH_WAIT_SECONDS = 2.0  # Flush a partial micro-batch when no new ad arrives within this time
+QUEUE_SIZE = 1000
+PUT_POLL_SECONDS = 0.5  # How often a producer blocked on a full queue checks whether the consumer has stopped
+STREAM_FIELDS = ["Advertiser", "Ad Text", "Ad Link", "Page ID", "Active Time", "Days Active", "Ad Variations",
+                 "Industry", "Confidence", "CPC", "CTR", "Conversion Rate", "Estimated Spend (INR)",
+                 "Estimated Reach", "ROAS", "Note"]
+
+END_OF_STREAM = object()
+
+class CsvAppender:
+    """Appends rows to a CSV file batch by batch, writing the header only for a new file."""
+
+    def __init__(self, filename, fieldnames):
+        self.filename = filename
+        new_file = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self.file = open(filename, "a", newline="", encoding="utf-8-sig" if new_file else "utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames, extrasaction="ignore", quoting=csv.QUOTE_MINIMAL)
+        if new_file:
+            self.writer.writeheader()
+        self.rows = 0
+
+    def append(self, rows):
+        for row in rows:
+            self.writer.writerow({key: value.replace('\n', ' ').replace('\r', ' ') if isinstance(value, str) else value
+                                  for key, value in row.items()})
+        self.file.flush()
+        self.rows += len(rows)
+
+    def close(self):
+        self.file.close()
+
+def put_until_stopped(out_queue, item, stop):
+    """Put an item on a bounded queue, giving up once stop is set; returns whether the item was queued."""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=PUT_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def produce_raw_ads(out_queue, keyword, country, extraction_mode=EXTRACTION_MODE, recycle_nodes=RECYCLE_AD_NODES, driver=None,
+                    max_scrolls=MAX_SCROLLS, stop=None):
+    """Scrape in the background, putting each raw ad on the queue as soon as it is extracted.
+
+    Stops scraping once stop is set, so a consumer that fails never leaves the producer blocked on a full queue.
+    """
+    stop = stop or threading.Event()
+    own_driver = driver is None
+    try:
+        if own_driver:
+            driver = init_driver(capture_network=extraction_mode == "network")
+        if extraction_mode == "html":
+            log.info("ℹ️ HTML mode parses one final snapshot and cannot stream. Using JS extraction instead.")
+            extraction_mode = "js"
+        open_search_page(driver, keyword, country, extraction_mode)
+        if extraction_mode == "network":
+            for ad_data in stream_network_ads(driver, max_scrolls):
+                if not put_until_stopped(out_queue, ad_data, stop):
+                    return
+        else:
+            for batch in iter_raw_ad_batches(driver, extraction_mode, recycle_nodes=recycle_nodes, max_scrolls=max_scrolls):
+                for ad_data in batch:
+                    if not put_until_stopped(out_queue, ad_data, stop):
+                        return
+                if stop.is_set():
+                    return
+    except Exception as e:
+        log.warning(f"⚠️ Scraping stopped early: {e}")
+        put_until_stopped(out_queue, e, stop)
+    finally:
+        put_until_stopped(out_queue, END_OF_STREAM, stop)
+        if own_driver and driver is not None:
+            try:
+                driver.quit()
+                log.info("✅ Driver closed successfully.")
+            except Exception as e:
+                log.info(f"ℹ️ Non-critical error during driver cleanup: {e}. Continuing execution.")
+
+def iter_micro_batches(in_queue, batch_size=MICRO_BATCH_SIZE, wait_seconds=BATCH_WAIT_SECONDS):
+    """Group queued items into micro-batches, flushing early when the producer pauses.
+
+    An exception put on the queue by the producer is re-raised once the ads queued before it are yielded.
+    """
+    batch = []
+    error = None
+    while True:
+        try:
+            item = in_queue.get(timeout=wait_seconds if batch else None)
+        except queue.Empty:
+            yield batch
+            batch = []
+            continue
+        if item is END_OF_STREAM:
+            break
+        if isinstance(item, Exception):
+            error = item
+            continue
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+    if error is not None:
+        raise error
+
+def run_streaming_pipeline(keyword, country="US", extraction_mode=EXTRACTION_MODE, stream_file=STREAM_OUTPUT_FILE,
+                           batch_size=MICRO_BATCH_SIZE, store=None, driver=None, on_result=None,
+                           output_file=OUTPUT_FILE, metrics_file=METRICS_FILE, debug_log=DEBUG_LOG, max_scrolls=MAX_SCROLLS,
+                           low_confidence_file=LOW_CONFIDENCE_FILE):
+    """Scrape, filter, classify and estimate ads in micro-batches, appending each result to CSV as it is ready.
+
+    Scraping runs in a background thread so classification overlaps with scrolling. Rows in stream_file
+    carry the variation count seen so far; once scraping ends the final ranked ads and metrics CSVs are
+    written with complete variation counts. on_result(row) is called for every streamed row. If scraping
+    fails, the rows already streamed stay in stream_file and the scraping error is raised. The producer has
+    always stopped using the driver by the time this returns or raises.
+    """
+    start = time.time()
+    raw_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    producer = threading.Thread(target=produce_raw_ads, args=(raw_queue, keyword, country, extraction_mode),
+                                kwargs={"driver": driver, "max_scrolls": max_scrolls, "stop": stop},
+                                name="scrape-producer", daemon=True)
+    producer.start()
+
+    appender = CsvAppender(stream_file, STREAM_FIELDS)
+    variation_index = NearDuplicateIndex(exact=not NEAR_DUPLICATE_VARIATIONS)
+    seen_ads = set()
+    seen_metric_keys = set()
+    error_log = []
+    ads = []
+    classified = []
+    raw_index = 0
+    first_result_at = None
+    try:
+        for raw_batch in iter_micro_batches(raw_queue, batch_size):
+            batch = []
+            for ad_data in raw_batch:
+                raw_index += 1
+                if has_ad_text(ad_data):
+                    variation_index.add(ad_data["Ad Text"])
+                variations = variation_index.cluster_size(ad_data["Ad Text"]) if has_ad_text(ad_data) else 1
+                ad_entry = filter_raw_ad(ad_data, raw_index, seen_ads, variations, error_log)
+                if ad_entry is not None:
+                    batch.append(ad_entry)
+            if not batch:
+                continue
+            if store is not None:
+                store.record_ads(batch)
+            ads.extend(batch)
+
+            eligible = []
+            for ad in batch:
+                metric_key = (ad.advertiser, ad.ad_text[:100])
+                if ad.advertiser == "Unknown Advertiser" or metric_key in seen_metric_keys:
+                    continue
+                seen_metric_keys.add(metric_key)
+                eligible.append(ad)
+            if not eligible:
+                continue
+            infos = predict_industry([ad.ad_text for ad in eligible], [ad.advertiser for ad in eligible])
+            metrics = estimate_metrics_columnar(eligible, infos)
+            rows = []
+            for ad, info, metric in zip(eligible, infos, metrics):
+                row = {key: ad[key] for key in STREAM_FIELDS if key in ad}
+                row.update(metric)
+                row["Confidence"] = round(info["Confidence"], 4)
+                rows.append(row)
+                classified.append((ad, info))
+            appender.append(rows)
+            if first_result_at is None:
+                first_result_at = time.time() - start
+                log.info(f"⏱️ Time to first result: {first_result_at:.2f}s")
+            log.info(f"🚰 Streamed {len(rows)} ad(s) to {stream_file} ({appender.rows} total)")
+            if on_result is not None:
+                for row in rows:
+                    on_result(row)
+    finally:
+        appender.close()
+        stop.set()
+        while True:
+            try:
+                raw_queue.get_nowait()
+            except queue.Empty:
+                break
+        producer.join()
+
+    # Final outputs with complete variation counts
+    for ad in ads:
+        ad.variations = variation_index.cluster_size(ad.ad_text) if has_ad_text(ad) else 1
+    save_error_log(error_log, debug_log)
+    metrics = estimate_metrics_columnar([ad for ad, _ in classified], [info for _, info in classified],
+                                        low_confidence_file=low_confidence_file if "csv" in OUTPUT_FORMATS else None)
+    if "csv" in OUTPUT_FORMATS:
+        save_to_csv(ads, output_file)
+        save_metrics_to_csv(metrics, metrics_file)
+    if "parquet" in OUTPUT_FORMATS:
+        run_id = new_run_id()
+        try:
+            save_ads_parquet(ads, keyword, country, run_id)
+            save_metrics_parquet(metrics, keyword, country, run_id)
+        except ImportError as e:
+            log.warning(f"⚠️ Skipping Parquet output: {e}")
+    log.info(f"ℹ️ Streaming pipeline finished in {time.time() - start:.1f}s: {len(ads)} ad(s), {len(classified)} estimate(s).")
+    return ads
+
+if __name__ == "__main__":
+    from scrape import KEYWORD, COUNTRY_CODE
+    parser = argparse.ArgumentParser(description="Stream ads from the Ad Library through classification and metrics to CSV.")
+    parser.add_argument("--keyword", default=KEYWORD)
+    parser.add_argument("--country", default=COUNTRY_CODE)
+    parser.add_argument("--mode", default=EXTRACTION_MODE, choices=["js", "xpath", "network"], help="Extraction mode")
+    parser.add_argument("--batch-size", type=int, default=MICRO_BATCH_SIZE, help="Ads per classification micro-batch")
+    parser.add_argument("--output", default=STREAM_OUTPUT_FILE, help="CSV file rows are appended to")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        os.remove(args.output)
+        log.info(f"🗑️ Deleted {args.output}")
+    run_streaming_pipeline(args.keyword, args.country, args.mode, args.output, args.batch_size)
@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from ad_record import AdRecord
+from columnar_output import (ADS_TABLE, load_ads_for_estimation, load_ads_for_ranking, read_rows, save_ads_parquet,
+                             table_schema)
+
+def sample_ads():
+    return [
+        AdRecord("Acme Corp", "Incorporate your company in a day.", "https://example.com/a", "101", "Started running on Mar 1",
+                 5.25, 3, ["https://cdn.example.com/1.jpg", "https://cdn.example.com/2.jpg"], [], archive_id="A1",
+                 start_date="2024-03-01", end_date="2024-03-06", collation_count=2,
+                 page_name="Acme Corp", seen_before=True),
+        AdRecord("Beta Ltd", "Fresh durian delivered.", "https://example.com/b", "202", "Active 6 hours",
+                 0.25, 1, [], ["https://cdn.example.com/v.mp4"], seen_before=False),
+    ]
+
+def test_ads_round_trip_keeps_every_field(tmp_path):
+    ads = sample_ads()
+    save_ads_parquet(ads, "durian", "US", "run1", root=str(tmp_path))
+    reloaded = [AdRecord.from_dict(row) for row in read_rows(ADS_TABLE, root=str(tmp_path))]
+    reloaded.sort(key=lambda ad: ad.page_id)
+    assert len(reloaded) == len(ads)
+    for written, read in zip(ads, reloaded):
+        for field in table_schema(ADS_TABLE).names:
+            assert read.get(field) == written.get(field), field
+
+@pytest.mark.parametrize("loader", [load_ads_for_ranking, load_ads_for_estimation])
+def test_projections_keep_fractional_days_and_seen_before(tmp_path, loader):
+    save_ads_parquet(sample_ads(), "durian", "US", "run1", root=str(tmp_path))
+    reloaded = sorted(loader("durian", "US", "run1", root=str(tmp_path)), key=lambda ad: ad.page_id)
+    assert [ad.days_active for ad in reloaded] == [5.25, 0.25]
+    assert [ad.seen_before for ad in reloaded] == [True, False]
@@ -0,0 +1,66 @@
+import csv
+import json
+import os
+
+from near_duplicates import NearDuplicateIndex, variation_counts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def ranked_ad_texts():
+    with open(os.path.join(ROOT, "meta_ads_ranked.csv"), newline="", encoding="utf-8-sig") as f:
+        return list(dict.fromkeys(row["Ad Text"] for row in csv.DictReader(f)))
+
+def test_reworded_australia_ads_are_one_cluster():
+    texts = ranked_ad_texts()
+    incorporate = next(text for text in texts if text.startswith("Incorporate in Australia"))
+    start = next(text for text in texts if text.startswith("Start Your Business in Australia"))
+    counts = variation_counts([incorporate, start])
+    assert counts == {incorporate: 2, start: 2}
+
+def test_unrelated_ranked_ads_stay_separate():
+    texts = ranked_ad_texts()
+    index = NearDuplicateIndex()
+    for text in texts:
+        index.add(text)
+    australia = {index.cluster_of(text) for text in texts if "Australia" in text}
+    others = {index.cluster_of(text) for text in texts if "Australia" not in text}
+    assert len(australia) == 1
+    assert len(others) == len([text for text in texts if "Australia" not in text])
+    assert not australia & others
+
+def test_fixture_seed_ads_stay_separate():
+    with open(os.path.join(ROOT, "benchmarks", "fixtures", "ad_library_cards.json"), encoding="utf-8") as f:
+        texts = list(dict.fromkeys(card["text"] for card in json.load(f)))
+    index = NearDuplicateIndex()
+    for text in texts:
+        index.add(text)
+    assert index.cluster_count() == len(texts)
+
+def test_distinct_ads_from_one_advertiser_stay_separate():
+    footer = " 📞 Limited slots left – Book your consultation now with Odint Consulting!"
+    texts = [
+        "Register your trademark in India in 7 days! ✅ Brand name search included ✅ Government fees covered "
+        "✅ Dedicated legal expert for your filing" + footer,
+        "GST returns filed on time, every month! ✅ Monthly GST filing for your business ✅ Input tax credit "
+        "reconciliation ✅ Dedicated accountant for your company" + footer,
+        "Set up your company in Dubai! 🇦🇪 ✅ 100% foreign ownership ✅ 0% personal income tax ✅ Residence visa "
+        "for you and your family" + footer,
+        "Need a virtual CFO for your startup? ✅ Monthly MIS reports ✅ Cash flow planning and fundraising support "
+        "✅ Dedicated finance expert for your business" + footer,
+        "Private Limited company registration in India in 10 days! ✅ Name approval and incorporation certificate "
+        "✅ PAN, TAN and GST registration ✅ Dedicated expert for your company" + footer,
+    ]
+    texts += [text for text in ranked_ad_texts() if "Australia" in text]
+    index = NearDuplicateIndex()
+    for text in texts:
+        index.add(text)
+    assert index.cluster_count() == 6
+
+def test_clusters_do_not_chain_through_intermediate_texts():
+    words = [f"word{i}" for i in range(16)]
+    first, middle, last = " ".join(words[:10]), " ".join(words[3:13]), " ".join(words[6:16])
+    index = NearDuplicateIndex()
+    for text in (first, middle, last):
+        index.add(text)
+    assert index.cluster_of(middle) == index.cluster_of(first)
+    assert index.cluster_of(last) != index.cluster_of(first)
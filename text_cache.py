@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from run_metrics import get_logger
+
+log = get_logger("text_cache")
+
+# SETTINGS
+TEXT_CACHE_DB = "text_cache.db"
+TEXT_CACHE_MAX_ENTRIES = 200000
+EVICT_EVERY = 1000  # Writes between eviction checks
+TOUCH_INTERVAL = 3600  # Seconds; a hit on an entry accessed more recently than this does not refresh its access time
+TOUCH_FLUSH_EVERY = 500  # Access-time updates buffered before they are written in one transaction
+
+def normalize_text(text):
+    """Normalize text for cache keys: Unicode NFKC, collapsed whitespace, case-folded."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip().casefold()
+
+def text_cache_key(text, advertiser="", version=""):
+    """Hash normalized text with the advertiser and model/version it was processed with."""
+    return hashlib.sha256("\x1f".join([normalize_text(text), advertiser or "", version]).encode("utf-8")).hexdigest()
+
+class TextCache:
+    """Disk-backed cache of language detection, translation and classification results.
+
+    Entries are namespaced ("detect", "translate", "classify") and keyed by text_cache_key. The SQLite
+    database runs in WAL mode with a busy timeout so concurrent worker processes can share one file, and
+    the least recently used entries are evicted once max_entries is exceeded. Hits only record their access
+    time in memory; the buffered times are written in batches with the next write, eviction or close().
+    """
+
+    def __init__(self, path=TEXT_CACHE_DB, max_entries=TEXT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touched = {}
+        self.hits = {}
+        self.misses = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, value TEXT, "
+                          "last_access REAL, PRIMARY KEY (namespace, key))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self.conn.commit()
+
+    def get(self, namespace, text, advertiser="", version=""):
+        """Return the cached value for a text, or None on a miss."""
+        key = text_cache_key(text, advertiser, version)
+        with self._lock:
+            row = self.conn.execute("SELECT value, last_access FROM entries WHERE namespace = ? AND key = ?",
+                                    (namespace, key)).fetchone()
+            if row is None:
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                return None
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+            now = time.time()
+            if now - (row[1] or 0) > TOUCH_INTERVAL:
+                self._touched[(namespace, key)] = now
+                if len(self._touched) >= TOUCH_FLUSH_EVERY:
+                    self._flush_touches()
+                    self.conn.commit()
+        return json.loads(row[0])
+
+    def _flush_touches(self):
+        """Write buffered access times (caller holds the lock and commits)."""
+        if self._touched:
+            self.conn.executemany("UPDATE entries SET last_access = MAX(last_access, ?) WHERE namespace = ? AND key = ?",
+                                  [(at, namespace, key) for (namespace, key), at in self._touched.items()])
+            self._touched.clear()
+
+    def set(self, namespace, text, value, advertiser="", version=""):
+        """Store a JSON-serializable value for a text."""
+        key = text_cache_key(text, advertiser, version)
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO entries (namespace, key, value, last_access) VALUES (?, ?, ?, ?)",
+                              (namespace, key, json.dumps(value), time.time()))
+            self._flush_touches()
+            self.conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries beyond max_entries (caller holds the lock)."""
+        self._flush_touches()
+        count = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute("DELETE FROM entries WHERE rowid IN "
+                              "(SELECT rowid FROM entries ORDER BY last_access LIMIT ?)", (excess,))
+            self.conn.commit()
+            log.info(f"🧹 Evicted {excess} text cache entries.")
+        return max(excess, 0)
+
+    def report(self):
+        """Log hit/miss counters per namespace."""
+        for namespace in sorted(set(self.hits) | set(self.misses)):
+            hits = self.hits.get(namespace, 0)
+            misses = self.misses.get(namespace, 0)
+            log.info(f"🗂️ Text cache [{namespace}]: {hits} hit(s), {misses} miss(es) ({hits / (hits + misses):.0%} hit rate)")
+
+    def close(self):
+        """Write buffered access times and close the database."""
+        with self._lock:
+            self._flush_touches()
+            self.conn.commit()
+        self.conn.close()